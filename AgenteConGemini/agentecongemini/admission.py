@@ -0,0 +1,148 @@
+"""
+Control de admisión para los endpoints de chat.
+Limita las consultas que se procesan a la vez, mantiene una cola de espera
+acotada con plazo máximo y rechaza rápido (429/503 con Retry-After) cuando el
+agente está saturado. Opcionalmente separa las consultas de lectura de las que
+modifican datos en carriles distintos, para que las lecturas rápidas no
+esperen detrás de escrituras lentas.
+"""
+import asyncio
+import math
+import os
+from typing import Any, Dict
+
+# ==================== CONFIGURACIÓN ====================
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "16"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+ADMISSION_SEPARATE_LANES = os.getenv("ADMISSION_SEPARATE_LANES", "false").lower() in ("1", "true", "yes")
+ADMISSION_WRITE_MAX_CONCURRENCY = int(os.getenv("ADMISSION_WRITE_MAX_CONCURRENCY", "4"))
+ADMISSION_WRITE_MAX_QUEUE = int(os.getenv("ADMISSION_WRITE_MAX_QUEUE", "16"))
+
+LANE_DEFAULT = "default"
+LANE_READ = "read"
+LANE_WRITE = "write"
+
+# ==================== CARRILES ====================
+
+class AdmissionRejected(Exception):
+    """La consulta no fue admitida (cola llena o plazo de espera agotado)"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Lane:
+    """
+    Carril de admisión: hasta `max_concurrency` consultas en proceso y hasta
+    `max_queue` esperando un máximo de `queue_timeout` segundos.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._avg_service_time = 1.0
+
+    def _retry_after(self) -> int:
+        """Segundos estimados hasta que haya hueco, según el tiempo medio de servicio"""
+        pending = self.waiting + 1
+        return max(1, math.ceil(self._avg_service_time * pending / self.max_concurrency))
+
+    async def acquire(self):
+        """
+        Espera un hueco en el carril.
+
+        Raises:
+            AdmissionRejected: 429 si la cola está llena, 503 si se agota el plazo de espera
+        """
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected(
+                    429,
+                    "El agente está saturado, intenta de nuevo en unos segundos",
+                    self._retry_after()
+                )
+
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise AdmissionRejected(
+                    503,
+                    f"La consulta esperó más de {self.queue_timeout}s en cola",
+                    self._retry_after()
+                ) from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.active += 1
+        self.admitted += 1
+
+    def release(self, service_time: float = 0.0):
+        """Libera el hueco y actualiza el tiempo medio de servicio"""
+        self.active -= 1
+        self._semaphore.release()
+        if service_time > 0:
+            self._avg_service_time = 0.9 * self._avg_service_time + 0.1 * service_time
+
+    def stats(self) -> Dict[str, Any]:
+        """Ocupación, profundidad de cola y rechazos del carril"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "queue_depth_peak": self.peak_waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_service_seconds": self._avg_service_time,
+        }
+
+
+class AdmissionController:
+    """Reparte las consultas entre carriles (uno compartido o lectura/escritura)"""
+
+    def __init__(self, separate_lanes: bool = ADMISSION_SEPARATE_LANES):
+        self.separate_lanes = separate_lanes
+        if separate_lanes:
+            self.lanes = {
+                LANE_READ: Lane(LANE_READ, ADMISSION_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT),
+                LANE_WRITE: Lane(LANE_WRITE, ADMISSION_WRITE_MAX_CONCURRENCY, ADMISSION_WRITE_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT),
+            }
+        else:
+            self.lanes = {
+                LANE_DEFAULT: Lane(LANE_DEFAULT, ADMISSION_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT),
+            }
+
+    def lane(self, mutating: bool) -> Lane:
+        """Carril para una consulta según si (probablemente) modifica datos"""
+        if not self.separate_lanes:
+            return self.lanes[LANE_DEFAULT]
+        return self.lanes[LANE_WRITE if mutating else LANE_READ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas por carril"""
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+
+admission = AdmissionController()
@@ -2,27 +2,87 @@
 API REST para el Agente IA
 Proporciona endpoints HTTP para interactuar con el agente sin afectar la CLI existente.
 """
+import asyncio
+import json
 import os
-from typing import Optional
-from fastapi import FastAPI, HTTPException
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Set, TypeVar
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
+from pydantic_core import to_json
+from starlette.routing import Match
 import uvicorn
 
 # Importar la función silenciosa para la API
-from .client import execute_query_silent
+from .client import execute_agent_query, execute_query_silent, preload_gemini, stream_query
+from .admission import AdmissionRejected, Lane, admission
+from .auth import get_auth
+from .cache import get_cache_stats
+from .coalesce import get_coalescing_stats
+from .deadline import DEADLINE_HEADER, DeadlineExceeded, parse_deadline, run_with_deadline
+from .executor import start_tool_transport, stop_tool_transport
+from .gateway import close_gateway_client, get_gateway_pool_stats
+from .jobs import Job, JobRejected, jobs
+from .metrics import (
+    REQUEST_DURATION,
+    MESSAGES_TOTAL,
+    REQUESTS_IN_FLIGHT,
+    REQUESTS_TOTAL,
+    gauge_lines,
+    register_collector,
+    render_metrics,
+)
+from .names import name_index
+from .pool import get_session_pool
+from .resilience import get_breaker_stats
+from .tracing import REQUEST_ID_HEADER, extract_context, shutdown_tracing, start_span
+from .router import is_mutating_query, route_stats
+from .sessions import Session, get_session
+
+T = TypeVar("T")
+
+try:
+    import orjson
+except ImportError:  # opcional: sin orjson se usa el serializador de pydantic-core
+    orjson = None
 
 # ==================== MODELOS ====================
 
 class ChatRequest(BaseModel):
     """Modelo para solicitudes de chat"""
     message: str = Field(..., description="Mensaje del usuario", min_length=1)
+    multi_step: bool = Field(
+        False,
+        description="Usar el agente multi-paso (varias herramientas y pasos por mensaje)"
+    )
+    session_id: Optional[str] = Field(
+        None,
+        description="Sesión de conversación; sin ella (o si expiró) se crea una nueva",
+        max_length=128
+    )
 
 class ChatResponse(BaseModel):
     """Modelo para respuestas de chat"""
     response: str = Field(..., description="Respuesta del agente")
     success: bool = Field(..., description="Indica si la operación fue exitosa")
     error: Optional[str] = Field(None, description="Mensaje de error si ocurrió alguno")
+    session_id: Optional[str] = Field(None, description="Sesión a enviar en los mensajes siguientes")
+
+class JobResponse(BaseModel):
+    """Estado de un trabajo asíncrono"""
+    job_id: str = Field(..., description="ID del trabajo")
+    status: str = Field(..., description="queued, running, succeeded, failed o cancelled")
+    session_id: str = Field(..., description="Sesión a enviar en los mensajes siguientes")
+    created_at: float = Field(..., description="Creación (epoch, segundos)")
+    started_at: Optional[float] = Field(None, description="Inicio de la ejecución (epoch, segundos)")
+    finished_at: Optional[float] = Field(None, description="Fin de la ejecución (epoch, segundos)")
+    response: Optional[str] = Field(None, description="Respuesta del agente, cuando termina con éxito")
+    success: Optional[bool] = Field(None, description="Indica si la operación fue exitosa")
+    error: Optional[str] = Field(None, description="Mensaje de error si falló o se canceló")
+    events: Optional[List[Dict[str, Any]]] = Field(None, description="Eventos de progreso más recientes")
 
 class HealthResponse(BaseModel):
     """Modelo para el health check"""
@@ -30,28 +90,172 @@ class HealthResponse(BaseModel):
     message: str
     api_key_configured: bool
 
+def encode_json(content: Any) -> bytes:
+    """JSON compacto en UTF-8 con orjson si está instalado, si no con pydantic-core"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return to_json(content)
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta JSON con un codificador rápido (orjson si está instalado, si no
+    pydantic-core) en lugar de `json.dumps`. Genera UTF-8 compacto.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return encode_json(content)
+
 # ==================== APLICACIÓN FASTAPI ====================
 
+# Cabecera con el ID de sesión en las respuestas en streaming
+SESSION_ID_HEADER = "X-Session-ID"
+
+# Cargar el proveedor de Gemini en segundo plano al arrancar (si no, lo paga la
+# primera consulta que llegue al LLM)
+GEMINI_PRELOAD = os.getenv("GEMINI_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Prepara el transporte de herramientas al iniciar la API (pool de sesiones
+    MCP en modo stdio) y lo libera al apagarla.
+    """
+    preload = asyncio.create_task(preload_gemini()) if GEMINI_PRELOAD else None
+    await start_tool_transport()
+    jobs.start()
+    yield
+    await jobs.stop()
+    if preload is not None and not preload.done():
+        await asyncio.gather(preload, return_exceptions=True)
+    await stop_tool_transport()
+    await get_auth().close()
+    await close_gateway_client()
+    await shutdown_tracing()
+
 app = FastAPI(
     title="Agente IA - API REST",
     description="API para interactuar con el agente de gestión de tareas usando Gemini",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Orígenes del frontend React (CORS y WebSocket)
+ALLOWED_ORIGINS = [
+    "http://localhost:5173",
+    "http://127.0.0.1:5173",
+    "http://localhost:3000",
+    "http://127.0.0.1:3000"
+]
+
 # Configurar CORS para permitir conexión desde React
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:5173",
-        "http://127.0.0.1:5173",
-        "http://localhost:3000",
-        "http://127.0.0.1:3000"
-    ],
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[REQUEST_ID_HEADER, SESSION_ID_HEADER],
 )
 
+# ==================== MÉTRICAS ====================
+
+def route_label(request: Request) -> str:
+    """Plantilla de la ruta que atiende la petición (evita crear una serie por URL)"""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "other")
+    return "other"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Cuenta peticiones en curso, duración y código de respuesta por endpoint"""
+    endpoint = route_label(request)
+    started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+        REQUESTS_TOTAL.inc(endpoint=endpoint, status=status)
+        REQUEST_DURATION.observe(time.perf_counter() - started, endpoint=endpoint)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Abre el span raíz de la petición. Respeta `traceparent` y `X-Request-ID`
+    entrantes y devuelve el request ID en la cabecera `X-Request-ID`.
+    """
+    parent = extract_context(request.headers)
+    with start_span(
+        f"{request.method} {route_label(request)}",
+        parent=parent,
+        **{"http.method": request.method, "http.path": request.url.path}
+    ) as span:
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.status = "error"
+        response.headers[REQUEST_ID_HEADER] = span.request_id
+        return response
+
+def collect_runtime_metrics() -> Iterator[str]:
+    """Gauges de los pools, la admisión y los circuit breakers en el momento de exportar"""
+    pool = get_session_pool()
+    if pool is not None:
+        pool_stats = pool.stats()
+        yield from gauge_lines(
+            "agent_mcp_sessions",
+            "Sesiones del pool MCP por estado",
+            [({"state": state}, pool_stats[state]) for state in ("alive", "in_use", "available")]
+        )
+
+    gateway_stats = get_gateway_pool_stats()
+    if gateway_stats is not None:
+        yield from gauge_lines(
+            "agent_gateway_requests_in_flight",
+            "Peticiones en curso al API Gateway desde este proceso",
+            [({}, gateway_stats["requests_in_flight"])]
+        )
+        yield from gauge_lines(
+            "agent_gateway_connections",
+            "Conexiones del pool HTTP al API Gateway por estado",
+            [({"state": "active"}, gateway_stats["connections_active"]),
+             ({"state": "idle"}, gateway_stats["connections_idle"])]
+        )
+
+    job_stats = jobs.stats()
+    yield from gauge_lines(
+        "agent_jobs",
+        "Trabajos asíncronos en cola o en ejecución",
+        [({"state": state}, job_stats[state]) for state in ("queued", "running")]
+    )
+
+    lanes = admission.stats()
+    yield from gauge_lines(
+        "agent_admission_active",
+        "Mensajes de chat en proceso por carril de admisión",
+        [({"lane": name}, lane["active"]) for name, lane in lanes.items()]
+    )
+    yield from gauge_lines(
+        "agent_admission_queue_depth",
+        "Mensajes de chat esperando en cola por carril de admisión",
+        [({"lane": name}, lane["queue_depth"]) for name, lane in lanes.items()]
+    )
+
+    yield from gauge_lines(
+        "agent_circuit_open",
+        "1 si el circuito del servicio está abierto o a prueba",
+        [({"upstream": name}, 0 if breaker["state"] == "closed" else 1)
+         for name, breaker in get_breaker_stats().items()]
+    )
+
+register_collector(collect_runtime_metrics)
+
 # ==================== ENDPOINTS ====================
 
 @app.get("/api/health", response_model=HealthResponse)
@@ -67,22 +271,154 @@ async def health_check():
         api_key_configured=api_key_present
     )
 
+async def admit(message: str) -> Lane:
+    """
+    Reserva un hueco de procesamiento para el mensaje en su carril de admisión.
+    
+    Returns:
+        El carril reservado (hay que liberarlo con `lane.release()`)
+        
+    Raises:
+        HTTPException: 429 o 503 con cabecera Retry-After si el agente está saturado
+    """
+    lane = admission.lane(is_mutating_query(message))
+    try:
+        await lane.acquire()
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    return lane
+
+# ==================== PLAZO Y DESCONEXIÓN ====================
+
+class ClientDisconnected(Exception):
+    """El cliente cerró la conexión antes de recibir la respuesta"""
+
+def request_deadline(headers: Any) -> Optional[float]:
+    """Plazo de la consulta: cabecera X-Request-Timeout o REQUEST_DEADLINE"""
+    return parse_deadline(headers.get(DEADLINE_HEADER))
+
+async def wait_for_disconnect(request: Request):
+    """Espera a que el cliente cierre la conexión (el cuerpo ya se leyó)"""
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+async def run_request(http_request: Request, fn: Callable[[], Awaitable[T]]) -> T:
+    """
+    Ejecuta la consulta con el plazo de la petición y la cancela en cuanto
+    el cliente se desconecta, sin esperar a Gemini ni a las herramientas.
+
+    Raises:
+        DeadlineExceeded: Si vence el plazo
+        ClientDisconnected: Si el cliente cerró la conexión
+    """
+    query = asyncio.create_task(run_with_deadline(request_deadline(http_request.headers), fn))
+    disconnect = asyncio.create_task(wait_for_disconnect(http_request))
+    try:
+        await asyncio.wait({query, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        if not query.done():
+            query.cancel()
+            await asyncio.gather(query, return_exceptions=True)
+    if query.cancelled():
+        raise ClientDisconnected()
+    return query.result()
+
+async def events_with_deadline(seconds: Optional[float], source: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Eventos de una consulta producidos en una tarea aparte con su plazo. Si
+    el plazo vence se emite un evento `error`; si el consumidor se va
+    (cliente desconectado) la tarea se cancela. La cola admite un solo
+    evento, así que un consumidor lento (cola de envío del WebSocket, buffer
+    SSE) frena al productor en lugar de acumular eventos en memoria.
+    """
+    queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=1)
+
+    async def pump():
+        async for event in source:
+            await queue.put(event)
+
+    async def produce():
+        try:
+            await run_with_deadline(seconds, pump)
+        except Exception as e:
+            await queue.put({"event": "error", "error": f"Error procesando consulta: {e}"})
+        await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (event := await queue.get()) is not None:
+            yield event
+    finally:
+        if not producer.done():
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+@app.get("/api/stats")
+async def stats():
+    """
+    Métricas internas del agente en este proceso: pool de sesiones MCP,
+    pool de conexiones al API Gateway, cachés, agrupación de lecturas,
+    índice de nombres, rutas de selección de herramienta (router, caché o LLM), control de
+    admisión, trabajos asíncronos, conexiones WebSocket, circuit breakers y
+    autenticación.
+
+    En modo stdio las llamadas de herramientas al gateway ocurren en los
+    subprocesos MCP, por lo que el pool HTTP, la caché de lecturas y el
+    índice de nombres de este proceso solo reflejan el tráfico hecho desde
+    la API (modo inprocess).
+    """
+    pool = get_session_pool()
+    return {
+        "mcp_pool": pool.stats() if pool else None,
+        "gateway_pool": get_gateway_pool_stats(),
+        "caches": get_cache_stats(),
+        "coalescing": get_coalescing_stats(),
+        "names": name_index.stats(),
+        "routing": route_stats.stats(),
+        "admission": admission.stats(),
+        "jobs": jobs.stats(),
+        "websocket": {
+            "connections": len(ws_connections),
+            "queries_in_flight": sum(len(connection.queries) for connection in ws_connections),
+        },
+        "breakers": get_breaker_stats(),
+        "auth": {"logins": get_auth().logins},
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Métricas en formato de texto de Prometheus: latencia por endpoint, por fase
+    (gemini, mcp_spawn, mcp_initialize, mcp_acquire, token_login, gateway_http)
+    y por herramienta, errores por tipo y peticiones en curso.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
     """
     Procesa una consulta del usuario usando el agente IA.
     
     El agente analiza la consulta con Gemini, selecciona la herramienta apropiada
-    y ejecuta la acción correspondiente en el task-service.
+    y ejecuta la acción correspondiente en el task-service. La consulta tiene
+    un plazo (cabecera X-Request-Timeout o REQUEST_DEADLINE) y se cancela si
+    vence o si el cliente se desconecta.
     
     Args:
         request: Objeto con el mensaje del usuario
+        http_request: Petición HTTP (cabecera de plazo y desconexión)
         
     Returns:
         ChatResponse con la respuesta del agente
         
     Raises:
-        HTTPException: Si ocurre un error durante el procesamiento
+        HTTPException: Si ocurre un error durante el procesamiento, o 429/503
+            si el agente está saturado
     """
     # Validar que existe la API key
     if not os.getenv("GOOGLE_API_KEY"):
@@ -91,32 +427,455 @@ async def chat_endpoint(request: ChatRequest):
             detail="GOOGLE_API_KEY no configurada. Verifica el archivo .env"
         )
     
+    lane = await admit(request.message)
+    started = time.perf_counter()
+    session = get_session(request.session_id)
     try:
         # Usar la función silenciosa para evitar prints en consola
         # Esta función retorna el resultado sin imprimir logs
-        result = await execute_query_silent(request.message)
+        execute = execute_agent_query if request.multi_step else execute_query_silent
+        result = await run_request(http_request, lambda: execute(request.message, session))
         
-        # Convertir el resultado a string si es necesario
-        response_text = str(result) if result else "Operación completada exitosamente"
+        # El cliente ya devuelve el texto del resultado (JSON de la herramienta)
+        response_text = result or "Operación completada exitosamente"
+        MESSAGES_TOTAL.inc(outcome="success", error_type="")
         
         return ChatResponse(
             response=response_text,
             success=True,
-            error=None
+            error=None,
+            session_id=session.id
         )
         
+    except DeadlineExceeded as e:
+        MESSAGES_TOTAL.inc(outcome="error", error_type="DeadlineExceeded")
+        return ChatResponse(
+            response=f"Lo siento, la consulta tardó demasiado: {str(e)}",
+            success=False,
+            error=f"Error procesando consulta: {str(e)}",
+            session_id=session.id
+        )
+    except ClientDisconnected:
+        # Nadie leerá la respuesta: solo se cuenta
+        MESSAGES_TOTAL.inc(outcome="error", error_type="ClientDisconnected")
+        return ChatResponse(response="", success=False, error="Cliente desconectado", session_id=session.id)
     except Exception as e:
         # Log del error para debugging
         error_message = f"Error procesando consulta: {str(e)}"
         print(f"❌ {error_message}")
+        # El error original viaja como causa de la excepción envolvente
+        MESSAGES_TOTAL.inc(outcome="error", error_type=type(e.__cause__ or e).__name__)
         
         # Retornar error en lugar de lanzar excepción HTTP
         # Esto permite que el frontend maneje el error de manera más elegante
         return ChatResponse(
             response=f"Lo siento, ocurrió un error al procesar tu solicitud: {str(e)}",
             success=False,
-            error=error_message
+            error=error_message,
+            session_id=session.id
+        )
+    finally:
+        lane.release(time.perf_counter() - started)
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Formatea un evento del agente como mensaje Server-Sent Events"""
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    return f"event: {event['event']}\ndata: {data}\n\n"
+
+def count_message(event: Dict[str, Any]) -> bool:
+    """
+    Cuenta en MESSAGES_TOTAL el evento final (done o error) de una consulta
+    en streaming, igual que /api/chat. Retorna si el evento era final.
+    """
+    if event["event"] == "done":
+        if event.get("success", True):
+            MESSAGES_TOTAL.inc(outcome="success", error_type="")
+        else:
+            MESSAGES_TOTAL.inc(outcome="error", error_type="ToolExecutionError")
+        return True
+    if event["event"] == "error":
+        MESSAGES_TOTAL.inc(outcome="error", error_type="")
+        return True
+    return False
+
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que llama a `on_close` al terminar pase lo que pase:
+    también si el cliente se desconecta o el envío falla antes de que el
+    cuerpo empiece a iterarse (y su `finally` nunca llegue a ejecutarse).
+    """
+
+    def __init__(self, content: AsyncIterator[str], on_close: Callable[[], None], **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """
+    Versión en streaming de /api/chat usando Server-Sent Events.
+    
+    Emite un evento por fase (analyzing, tool_selected, tool_executing),
+    los fragmentos de texto de Gemini (token) cuando no se usa herramienta,
+    los bloques del resultado (partial) y un evento final (done o error).
+    Con el mismo plazo que /api/chat; si el cliente se desconecta la
+    consulta se cancela.
+    
+    Args:
+        request: Objeto con el mensaje del usuario
+        http_request: Petición HTTP (cabecera de plazo)
+        
+    Returns:
+        StreamingResponse con media type text/event-stream y la sesión en la
+        cabecera X-Session-ID
+    """
+    if not os.getenv("GOOGLE_API_KEY"):
+        raise HTTPException(
+            status_code=500,
+            detail="GOOGLE_API_KEY no configurada. Verifica el archivo .env"
         )
+    
+    session = get_session(request.session_id)
+    seconds = request_deadline(http_request.headers)
+    lane = await admit(request.message)
+    started = time.perf_counter()
+    finished = False
+    
+    async def events() -> AsyncIterator[str]:
+        nonlocal finished
+        async for event in events_with_deadline(seconds, stream_query(request.message, session)):
+            finished = count_message(event) or finished
+            yield format_sse(event)
+    
+    def close():
+        # El carril se libera aquí y no en el generador, que puede no llegar a empezar
+        lane.release(time.perf_counter() - started)
+        if not finished:
+            MESSAGES_TOTAL.inc(outcome="error", error_type="ClientDisconnected")
+    
+    return ReleasingStreamingResponse(
+        events(),
+        on_close=close,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Evitar que nginx acumule la respuesta antes de enviarla
+            "X-Accel-Buffering": "no",
+            SESSION_ID_HEADER: session.id
+        }
+    )
+
+# ==================== TRABAJOS ====================
+
+def job_or_404(job_id: str) -> Job:
+    """Raises HTTPException 404 si el trabajo no existe o ya expiró"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado")
+    return job
+
+@app.post("/api/jobs", response_model=JobResponse, status_code=202)
+async def create_job(request: ChatRequest, response: Response):
+    """
+    Encola una consulta y responde al momento con el ID del trabajo, sin
+    esperar a Gemini ni a las herramientas. Pensado para operaciones largas
+    o en lote que superarían el timeout del cliente o del proxy.
+
+    El resultado se consulta en GET /api/jobs/{id} o se sigue en
+    GET /api/jobs/{id}/events.
+
+    Raises:
+        HTTPException: 429 con Retry-After si la cola de trabajos está llena
+    """
+    if not os.getenv("GOOGLE_API_KEY"):
+        raise HTTPException(
+            status_code=500,
+            detail="GOOGLE_API_KEY no configurada. Verifica el archivo .env"
+        )
+    
+    try:
+        job = jobs.submit(request.message, request.multi_step, request.session_id)
+    except JobRejected as e:
+        raise HTTPException(status_code=429, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return JobResponse(**job.summary())
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, events: bool = False):
+    """
+    Estado de un trabajo y, al terminar, su respuesta. Con `events=true`
+    incluye los eventos de progreso más recientes.
+    """
+    job = job_or_404(job_id)
+    return JobResponse(**job.summary(), events=list(job.events) if events else None)
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Progreso de un trabajo con Server-Sent Events: los mismos eventos que
+    /api/chat/stream (salvo done/error) más `running` y un evento final `job`
+    con el estado del trabajo. Cada evento lleva un `seq`; para reanudar tras
+    una desconexión se envía el último recibido en la cabecera Last-Event-ID.
+    """
+    job = job_or_404(job_id)
+    try:
+        after = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        after = 0
+
+    async def events() -> AsyncIterator[str]:
+        async for event in job.follow(after):
+            yield f"id: {event['seq']}\n" + format_sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.delete("/api/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """
+    Cancela un trabajo en cola o en curso. Un trabajo ya terminado se
+    devuelve tal cual (su estado indica cómo terminó).
+    """
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado")
+    return JobResponse(**job.summary())
+
+# ==================== WEBSOCKET ====================
+
+# Consultas en curso a la vez por conexión de /ws/chat
+WS_MAX_IN_FLIGHT = int(os.getenv("WS_MAX_IN_FLIGHT", "4"))
+# Eventos pendientes de enviar por conexión antes de frenar las consultas
+WS_SEND_QUEUE = int(os.getenv("WS_SEND_QUEUE", "64"))
+
+# Conexiones abiertas de /ws/chat en este proceso
+ws_connections: Set["ChatConnection"] = set()
+
+class ChatConnection:
+    """
+    Una conexión de /ws/chat. Atiende varias consultas a la vez, cada una con
+    el `id` que elige el cliente. Los eventos de todas salen por una única cola
+    de envío acotada: si el cliente lee más despacio de lo que llegan, las
+    consultas esperan a que haya hueco (backpressure) en lugar de acumular
+    memoria.
+
+    Las respuestas a los mensajes del cliente (pong, cancelaciones, errores)
+    van por una cola de control aparte que se envía primero y nunca bloquea
+    al lector, así que una cancelación se procesa aunque la cola de eventos
+    esté llena.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.outbox: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=max(1, WS_SEND_QUEUE))
+        self.control: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=max(1, WS_SEND_QUEUE))
+        self._pending = asyncio.Event()
+        self.queries: Dict[str, "asyncio.Task[None]"] = {}
+        # Sesión de la conexión: la comparten los mensajes que no indican otra
+        self.session: Optional[Session] = None
+
+    async def send(self, event: Dict[str, Any]):
+        """Encola un evento de una consulta; espera si la cola de envío está llena"""
+        await self.outbox.put(event)
+        self._pending.set()
+
+    def reply(self, event: Dict[str, Any]):
+        """
+        Encola una respuesta de control sin esperar.
+
+        Raises:
+            asyncio.QueueFull: Si el cliente lleva WS_SEND_QUEUE respuestas sin leer
+        """
+        self.control.put_nowait(event)
+        self._pending.set()
+
+    def discard_queued(self, query_id: str):
+        """Quita de la cola de envío los eventos pendientes de una consulta"""
+        kept = []
+        while not self.outbox.empty():
+            event = self.outbox.get_nowait()
+            if event.get("id") != query_id:
+                kept.append(event)
+        for event in kept:
+            self.outbox.put_nowait(event)
+
+    async def sender(self):
+        while True:
+            if self.control.empty() and self.outbox.empty():
+                self._pending.clear()
+                await self._pending.wait()
+                continue
+            queue = self.control if not self.control.empty() else self.outbox
+            await self.websocket.send_text(encode_json(queue.get_nowait()).decode())
+
+    async def receiver(self):
+        while True:
+            raw = await self.websocket.receive_text()
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                self.reply({"event": "error", "error": "El mensaje no es JSON válido"})
+                continue
+            if not isinstance(message, dict):
+                self.reply({"event": "error", "error": "El mensaje debe ser un objeto JSON"})
+                continue
+            self.handle(message)
+
+    async def serve(self):
+        """
+        Lee mensajes hasta que el cliente se desconecta (o deja de poder recibir)
+        y cancela lo que quede en curso.
+        """
+        sender = asyncio.create_task(self.sender())
+        receiver = asyncio.create_task(self.receiver())
+        ws_connections.add(self)
+        try:
+            # Si el envío falla el lector no lo notaría: se vigilan ambos
+            done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    task.result()
+                except WebSocketDisconnect:
+                    pass
+                except asyncio.QueueFull:
+                    await self.websocket.close(code=1008, reason="El cliente no lee las respuestas")
+        finally:
+            ws_connections.discard(self)
+            for task in self.queries.values():
+                task.cancel()
+            sender.cancel()
+            receiver.cancel()
+            await asyncio.gather(sender, receiver, *self.queries.values(), return_exceptions=True)
+
+    def handle(self, message: Dict[str, Any]):
+        """
+        Mensajes del cliente:
+        - `{"type": "chat", "id": "...", "message": "...", "multi_step": false, "session_id": null}`
+        - `{"type": "cancel", "id": "..."}`
+        - `{"type": "ping"}`
+        """
+        kind = message.get("type", "chat")
+        query_id = str(message.get("id", ""))
+        if kind == "ping":
+            self.reply({"event": "pong"})
+        elif kind == "cancel":
+            task = self.queries.pop(query_id, None)
+            if task is None:
+                self.reply({"id": query_id, "event": "error", "error": "No hay ninguna consulta en curso con ese id"})
+                return
+            task.cancel()
+            # `cancelled` es siempre el último evento de la consulta
+            self.discard_queued(query_id)
+            self.reply({"id": query_id, "event": "cancelled"})
+        elif kind == "chat":
+            self.start(query_id, message)
+        else:
+            self.reply({"id": query_id, "event": "error", "error": f"Tipo de mensaje desconocido: {kind}"})
+
+    def start(self, query_id: str, message: Dict[str, Any]):
+        if not query_id:
+            self.reply({"event": "error", "error": "Cada consulta necesita un id"})
+            return
+        if query_id in self.queries:
+            self.reply({"id": query_id, "event": "error", "error": "Ya hay una consulta en curso con ese id"})
+            return
+        if len(self.queries) >= WS_MAX_IN_FLIGHT:
+            self.reply({
+                "id": query_id,
+                "event": "error",
+                "error": f"Demasiadas consultas en curso en esta conexión (máximo {WS_MAX_IN_FLIGHT})",
+                "status": 429
+            })
+            return
+        try:
+            request = ChatRequest.model_validate(message)
+        except ValidationError as e:
+            self.reply({"id": query_id, "event": "error", "error": str(e)})
+            return
+
+        if self.session is None or (request.session_id and request.session_id != self.session.id):
+            self.session = get_session(request.session_id)
+        self.queries[query_id] = asyncio.create_task(self.run(query_id, request, self.session))
+
+    async def run(self, query_id: str, request: ChatRequest, session: Session):
+        """Procesa una consulta con el mismo pipeline que /api/chat/stream"""
+        try:
+            lane = admission.lane(is_mutating_query(request.message))
+            try:
+                await lane.acquire()
+            except AdmissionRejected as e:
+                await self.send({
+                    "id": query_id,
+                    "event": "error",
+                    "error": e.detail,
+                    "status": e.status_code,
+                    "retry_after": e.retry_after
+                })
+                return
+
+            started = time.perf_counter()
+            try:
+                await self.send({"id": query_id, "event": "accepted", "session_id": session.id})
+                deadline = request_deadline(self.websocket.headers)
+                async for event in events_with_deadline(deadline, query_events(request, session)):
+                    count_message(event)
+                    await self.send({"id": query_id, **event})
+            finally:
+                lane.release(time.perf_counter() - started)
+        finally:
+            if self.queries.get(query_id) is asyncio.current_task():
+                del self.queries[query_id]
+
+async def query_events(request: ChatRequest, session: Session) -> AsyncIterator[Dict[str, Any]]:
+    """Eventos de una consulta: los de `stream_query` o, con multi_step, el resultado del agente"""
+    if not request.multi_step:
+        async for event in stream_query(request.message, session):
+            yield event
+        return
+
+    yield {"event": "analyzing"}
+    try:
+        result = await execute_agent_query(request.message, session)
+    except Exception as e:
+        yield {"event": "error", "error": str(e)}
+        return
+    yield {"event": "done", "response": result or "Operación completada exitosamente", "success": True}
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Chat por WebSocket: una conexión persistente por cliente en lugar de una
+    petición HTTP por mensaje. Varias consultas pueden estar en curso a la vez
+    (cada una con su `id`); sus eventos son los de /api/chat/stream más
+    `accepted` (con la sesión) y `cancelled`, y cada uno lleva el `id` de la
+    consulta. Los mensajes sin `session_id` usan la sesión de la conexión.
+    Cada consulta tiene el plazo de la cabecera X-Request-Timeout del
+    handshake (o REQUEST_DEADLINE).
+    """
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in ALLOWED_ORIGINS:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    if not os.getenv("GOOGLE_API_KEY"):
+        await websocket.send_text(encode_json({
+            "event": "error",
+            "error": "GOOGLE_API_KEY no configurada. Verifica el archivo .env"
+        }).decode())
+        await websocket.close(code=1011)
+        return
+
+    await ChatConnection(websocket).serve()
 
 @app.get("/")
 async def root():
@@ -130,6 +889,11 @@ async def root():
         "endpoints": {
             "health": "/api/health",
             "chat": "/api/chat (POST)",
+            "chat_stream": "/api/chat/stream (POST, SSE)",
+            "jobs": "/api/jobs (POST), /api/jobs/{id} (GET, DELETE), /api/jobs/{id}/events (SSE)",
+            "chat_ws": "/ws/chat (WebSocket)",
+            "stats": "/api/stats",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
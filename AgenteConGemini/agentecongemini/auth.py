@@ -1,66 +1,347 @@
 """
 Sistema de autenticación del agente IA.
 Genera y mantiene tokens JWT para autenticarse como admin.
+
+El token se comparte entre procesos mediante un archivo de caché, de modo que
+los subprocesos del servidor MCP y los workers de la API reutilizan el mismo
+JWT en lugar de hacer login en cada consulta.
 """
+import asyncio
+import base64
+import json
 import os
+import sys
+import tempfile
 import httpx
-from typing import Optional
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Optional, Tuple
 from datetime import datetime, timedelta
+from .gateway import API_GATEWAY_URL, get_gateway_client
+from .metrics import track_phase
+from .tracing import inject_headers, start_span
+from .resilience import GATEWAY_RETRY_ATTEMPTS, call_with_retry, gateway_breaker, is_gateway_failure
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+# ==================== CONFIGURACIÓN ====================
+
+# Archivo compartido con el token (vacío desactiva la caché entre procesos)
+TOKEN_CACHE_PATH = os.getenv(
+    "AGENT_TOKEN_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "agentecongemini-token.json")
+)
+# Margen antes de la expiración en el que el token se considera vencido
+TOKEN_REFRESH_MARGIN = timedelta(seconds=int(os.getenv("AGENT_TOKEN_REFRESH_MARGIN", "300")))
+# Renovar el token en segundo plano antes de que expire
+TOKEN_BACKGROUND_REFRESH = os.getenv("AGENT_TOKEN_BACKGROUND_REFRESH", "true").lower() in ("1", "true", "yes")
+# Duración asumida si el JWT no trae el claim `exp`
+DEFAULT_TOKEN_LIFETIME = timedelta(hours=23)
+# Fracción máxima de la vida del token que puede ocupar el margen (JWT de vida corta)
+TOKEN_REFRESH_MAX_FRACTION = 0.25
+# Espera mínima entre renovaciones en segundo plano
+TOKEN_MIN_REFRESH_INTERVAL = 10.0
+# Espera entre intentos de tomar el bloqueo del almacén de tokens
+TOKEN_LOCK_POLL_INTERVAL = 0.05
+
+def decode_token_time(token: str, claim: str) -> Optional[datetime]:
+    """
+    Lee un claim de fecha (`exp`, `iat`) del JWT sin verificar la firma.
+    Retorna None si el token no tiene el formato esperado.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return datetime.fromtimestamp(int(claims[claim]))
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+def decode_token_expiry(token: str) -> Optional[datetime]:
+    """Lee el claim `exp` del JWT sin verificar la firma"""
+    return decode_token_time(token, "exp")
+
+@lru_cache(maxsize=16)
+def refresh_margin(token: str, expires_at: datetime, margin: timedelta = TOKEN_REFRESH_MARGIN) -> timedelta:
+    """
+    Margen de renovación acotado a una fracción de la vida del token: con un
+    JWT más corto que el margen, el token nunca se consideraría válido.
+    """
+    issued_at = decode_token_time(token, "iat")
+    if issued_at is None:
+        return margin
+    return min(margin, (expires_at - issued_at) * TOKEN_REFRESH_MAX_FRACTION)
+
+# ==================== CACHÉ COMPARTIDA ====================
+
+class TokenStore:
+    """Almacén de tokens en un archivo compartido entre procesos"""
+
+    def __init__(self, path: str = TOKEN_CACHE_PATH):
+        self.path = path
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def load(self, key: str) -> Optional[Tuple[str, datetime]]:
+        """Retorna (token, expira_en) guardado para la clave, si existe"""
+        if not self.enabled:
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entry = json.load(f).get(key)
+            if not entry:
+                return None
+            return entry["token"], datetime.fromtimestamp(entry["expires_at"])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def save(self, key: str, token: str, expires_at: datetime):
+        """Guarda el token de forma atómica (escritura a temporal + rename)"""
+        if not self.enabled:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                data = {}
+        except (OSError, ValueError):
+            data = {}
+
+        data[key] = {"token": token, "expires_at": expires_at.timestamp()}
+
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".agent-token-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    @asynccontextmanager
+    async def locked(self) -> AsyncIterator[None]:
+        """Bloqueo exclusivo entre procesos para que solo uno haga login"""
+        if not self.enabled or fcntl is None:
+            yield
+            return
+
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Sin bloquear ni usar hilos: si la espera se cancela, ningún hilo
+            # sigue dentro de flock con un descriptor que se va a cerrar
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(TOKEN_LOCK_POLL_INTERVAL)
+            yield
+        finally:
+            # Cerrar el descriptor libera el bloqueo
+            os.close(fd)
+
+# ==================== AUTENTICACIÓN ====================
+
+class AuthenticationError(Exception):
+    """
+    El agente no pudo obtener un token.
+    `status_code` es el código HTTP del login si el gateway respondió
+    (401/403 = credenciales rechazadas), o None si no se pudo contactar.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
 
 class AgentAuth:
     """Maneja la autenticación del agente como admin"""
-    
-    def __init__(self):
+
+    def __init__(self, store: Optional[TokenStore] = None):
         self.token: Optional[str] = None
         self.token_expires_at: Optional[datetime] = None
-        self.api_gateway_url = os.getenv("API_GATEWAY_URL", "http://api-gateway:4000")
+        self.api_gateway_url = API_GATEWAY_URL
         self.admin_email = os.getenv("ADMIN_EMAIL", "admin@test.com")
         self.admin_password = os.getenv("ADMIN_PASSWORD", "admin123")
-        
+        self.store = store or TokenStore()
+        self.logins = 0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def _store_key(self) -> str:
+        return f"{self.api_gateway_url}|{self.admin_email}"
+
+    def _is_valid(self, margin: timedelta = TOKEN_REFRESH_MARGIN) -> bool:
+        """Indica si el token en memoria sigue vigente con el margen dado (acotado a su vida)"""
+        if not self.token or not self.token_expires_at:
+            return False
+        return datetime.now() < self.token_expires_at - refresh_margin(self.token, self.token_expires_at, margin)
+
+    def _load_from_store(self) -> bool:
+        """Carga el token de la caché compartida si es válido"""
+        cached = self.store.load(self._store_key)
+        if not cached:
+            return False
+        self.token, self.token_expires_at = cached
+        return self._is_valid()
+
     async def get_token(self) -> str:
         """
         Obtiene un token JWT válido.
         Si el token actual es válido, lo retorna.
-        Si no existe o expiró, solicita uno nuevo.
+        Si no existe o expiró, solicita uno nuevo (una sola vez aunque haya
+        varias llamadas concurrentes esperando).
         """
         # Si tenemos token y aún es válido, retornarlo
-        if self.token and self.token_expires_at:
-            if datetime.now() < self.token_expires_at - timedelta(minutes=5):
+        if self._is_valid():
+            return self.token
+
+        async with self._lock:
+            # Otra corrutina pudo renovarlo mientras esperábamos el lock
+            if self._is_valid() or self._load_from_store():
+                self._schedule_refresh()
+                return self.token
+
+            # Necesitamos un nuevo token
+            await self._refresh()
+        return self.token
+
+    async def renew_rejected_token(self, rejected: str) -> str:
+        """
+        Obtiene un token nuevo cuando el gateway rechazó `rejected` con 401
+        (por ejemplo, si se revocó o se reinició el servicio de autenticación).
+        Si otra corrutina u otro proceso ya lo renovó, reutiliza ese token.
+        """
+        async with self._lock:
+            if self.token != rejected and self._is_valid():
                 return self.token
-        
-        # Necesitamos un nuevo token
-        await self._login()
+            await self._refresh(rejected=rejected)
         return self.token
-    
+
+    async def _refresh(self, margin: timedelta = TOKEN_REFRESH_MARGIN, rejected: Optional[str] = None):
+        """Renueva el token coordinándose con otros procesos a través de la caché"""
+        async with self.store.locked():
+            # Otro proceso pudo renovarlo mientras esperábamos el bloqueo
+            cached = self.store.load(self._store_key)
+            if cached and cached[0] != rejected and datetime.now() < cached[1] - refresh_margin(*cached, margin):
+                self.token, self.token_expires_at = cached
+            else:
+                await self._login()
+                self.store.save(self._store_key, self.token, self.token_expires_at)
+        self._schedule_refresh()
+
     async def _login(self):
-        """Realiza login como admin y obtiene JWT"""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.api_gateway_url}/api/auth/login",
-                    json={
-                        "email": self.admin_email,
-                        "password": self.admin_password
-                    },
-                    timeout=10.0
+        """
+        Realiza login como admin y obtiene JWT.
+        El login se reintenta ante fallos transitorios del gateway.
+
+        Raises:
+            AuthenticationError: Si el login falla o la respuesta no trae token
+        """
+        async def post_login() -> httpx.Response:
+            client = get_gateway_client()
+            response = await client.post(
+                f"{self.api_gateway_url}/api/auth/login",
+                json={
+                    "email": self.admin_email,
+                    "password": self.admin_password
+                },
+                headers=inject_headers({}),
+                timeout=10.0
+            )
+            response.raise_for_status()
+            return response
+
+        try:
+            with track_phase("token_login"), start_span("token_login"):
+                response = await call_with_retry(
+                    post_login,
+                    breaker=gateway_breaker,
+                    attempts=GATEWAY_RETRY_ATTEMPTS,
+                    retryable=is_gateway_failure,
+                    phase="token_login"
                 )
-                response.raise_for_status()
-                
-                data = response.json()
-                self.token = data.get("token")
-                
-                # JWT expira en 24 horas por defecto
-                # Guardamos el tiempo de expiración
-                self.token_expires_at = datetime.now() + timedelta(hours=23)
-                
-            except httpx.HTTPError as e:
-                raise Exception(f"Error autenticando agente: {str(e)}")
-    
+        except httpx.HTTPStatusError as e:
+            raise AuthenticationError(
+                f"Error autenticando agente: el gateway respondió {e.response.status_code}",
+                status_code=e.response.status_code
+            ) from e
+        except httpx.HTTPError as e:
+            raise AuthenticationError(f"Error autenticando agente: {str(e)}") from e
+
+        try:
+            token = response.json().get("token")
+        except (ValueError, AttributeError):
+            token = None
+        if not token:
+            raise AuthenticationError(
+                "Error autenticando agente: respuesta de login sin token",
+                status_code=response.status_code
+            )
+
+        self.token = token
+        self.logins += 1
+
+        # Usar la expiración real del JWT (claim `exp`)
+        self.token_expires_at = decode_token_expiry(token) or datetime.now() + DEFAULT_TOKEN_LIFETIME
+
+    def _schedule_refresh(self):
+        """Programa la renovación en segundo plano antes de que el token expire"""
+        if not TOKEN_BACKGROUND_REFRESH:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._refresh_task = loop.create_task(self._refresh_loop(), name="agent-token-refresh")
+
+    async def _refresh_loop(self):
+        """
+        Renueva el token cuando entra en el doble del margen de expiración
+        (acotado a la vida del token), con una espera mínima entre vueltas
+        para no encadenar logins si el gateway emite tokens muy cortos.
+        """
+        renew_margin = TOKEN_REFRESH_MARGIN * 2
+        while self.token is not None and self.token_expires_at is not None:
+            margin = refresh_margin(self.token, self.token_expires_at, renew_margin)
+            delay = (self.token_expires_at - margin - datetime.now()).total_seconds()
+            await asyncio.sleep(max(delay, TOKEN_MIN_REFRESH_INTERVAL))
+            try:
+                async with self._lock:
+                    if not self._is_valid(renew_margin):
+                        await self._refresh(renew_margin)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # stderr: en el servidor MCP stdout es el canal JSON-RPC
+                print(f"⚠️  Renovación del token fallida: {e}", file=sys.stderr)
+                await asyncio.sleep(30)
+
+    async def close(self):
+        """Detiene la renovación en segundo plano"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
     def get_auth_headers(self) -> dict:
         """Retorna headers con el token de autorización"""
         if not self.token:
             raise Exception("No hay token disponible. Llama a get_token() primero.")
-        
+
         return {
             "Authorization": f"Bearer {self.token}"
         }
@@ -0,0 +1,380 @@
+"""
+Cachés en memoria del agente.
+- TTLCache: caché LRU con expiración por entrada (TTL), límite de memoria
+  aproximado y contadores de aciertos, fallos y desalojos.
+- SharedInvalidation: aviso entre procesos de que hubo escrituras, para que
+  las cachés de los demás procesos (otras sesiones del pool MCP) se vacíen.
+- QueryCache: caché de consultas en lenguaje natural con búsqueda por
+  similitud de n-gramas, para reutilizar la herramienta elegida por el LLM.
+"""
+import os
+import re
+import tempfile
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+# Cachés creadas en este proceso, por nombre (para /api/stats)
+_registry: Dict[str, Any] = {}
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Estadísticas de todas las cachés registradas en este proceso"""
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at")
+
+    def __init__(self, value: Any, size: int, expires_at: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class TTLCache:
+    """
+    Caché LRU con TTL y límite de tamaño.
+
+    Cada entrada guarda un tamaño aproximado en bytes (por ejemplo, el tamaño del
+    cuerpo HTTP del que proviene). Cuando se supera `max_entries` o `max_bytes`
+    se desalojan las entradas menos usadas recientemente.
+
+    Las invalidaciones incrementan un contador de generación: un valor leído antes
+    de una invalidación no se guarda si se pasa la generación con la que empezó
+    la lectura (evita repoblar la caché con datos obsoletos).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_entries: int = 512,
+        max_bytes: int = 16 * 1024 * 1024
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        _registry[name] = self
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retorna el valor vigente para la clave, o `default`"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, size: int = 0, generation: Optional[int] = None):
+        """
+        Guarda un valor.
+
+        Args:
+            key: Clave de la entrada
+            value: Valor a guardar (no debe mutarse después)
+            size: Tamaño aproximado en bytes
+            generation: Generación observada al iniciar la lectura; si hubo
+                invalidaciones desde entonces, el valor se descarta
+        """
+        if not self.enabled or size > self.max_bytes:
+            return
+        if generation is not None and generation != self.generation:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = _Entry(value, size, time.monotonic() + self.ttl)
+        self._bytes += size
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, *keys: Hashable):
+        """Elimina las claves indicadas"""
+        self.generation += 1
+        for key in keys:
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_prefix(self, prefix: str):
+        """Elimina todas las claves de texto que empiezan por `prefix`"""
+        self.generation += 1
+        for key in [k for k in self._entries if isinstance(k, str) and k.startswith(prefix)]:
+            self._remove(key)
+            self.invalidations += 1
+
+    def clear(self):
+        """Vacía la caché"""
+        self.generation += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores y ocupación de la caché"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+class SharedInvalidation:
+    """
+    Marca compartida entre procesos en un archivo: cada escritura lo reemplaza
+    (un inodo nuevo) y los demás procesos, al ver que cambió, vacían su caché.
+    Así una lectura en otra sesión del pool MCP no devuelve datos anteriores
+    a una escritura hecha por otra. Con `path` vacío no hace nada.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.published = 0
+        self.observed = 0
+        self._seen = self._stamp()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _stamp(self) -> Optional[Tuple[int, int]]:
+        if not self.enabled:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def publish(self):
+        """Avisa a los demás procesos de que hubo una escritura"""
+        if not self.enabled:
+            return
+        directory = os.path.dirname(self.path) or "."
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".agent-cache-")
+            stat = os.fstat(fd)
+            os.close(fd)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            return
+        # La marca propia no vacía la caché de este proceso (ya invalidó lo justo)
+        self._seen = (stat.st_ino, stat.st_mtime_ns)
+        self.published += 1
+
+    def changed(self) -> bool:
+        """True si otro proceso publicó una escritura desde la última comprobación"""
+        stamp = self._stamp()
+        if stamp == self._seen:
+            return False
+        self._seen = stamp
+        self.observed += 1
+        return True
+
+
+# ==================== CACHÉ DE CONSULTAS ====================
+
+def normalize_query(query: str, lowercase: bool = True) -> str:
+    """Minúsculas (opcional), sin acentos, sin puntuación y con espacios simples"""
+    text = unicodedata.normalize("NFKD", query.lower() if lowercase else query)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s-]", " ", text)
+    return " ".join(text.split())
+
+def _ngrams(text: str, n: int = 3) -> FrozenSet[str]:
+    padded = f" {text} "
+    return frozenset(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+
+def _entities(text: str) -> FrozenSet[str]:
+    """Palabras con dígitos (IDs, números): deben coincidir exactamente"""
+    return frozenset(word for word in text.split() if any(ch.isdigit() for ch in word))
+
+def _arg_words(tool_args: Dict[str, Any]) -> Optional[Tuple[Tuple[str, ...], ...]]:
+    """
+    Palabras normalizadas de cada argumento de texto o número (también dentro
+    de listas). None si algún argumento no se puede comprobar contra el texto
+    de una consulta (booleanos, objetos...).
+    """
+    pending: List[Any] = list(tool_args.values())
+    words: List[Tuple[str, ...]] = []
+    while pending:
+        value = pending.pop()
+        if isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif isinstance(value, str) or (isinstance(value, (int, float)) and not isinstance(value, bool)):
+            normalized = tuple(normalize_query(str(value)).split())
+            if normalized:
+                words.append(normalized)
+        else:
+            return None
+    return tuple(words)
+
+def _contains_words(words: List[str], run: Tuple[str, ...]) -> bool:
+    """Si `run` aparece como secuencia contigua de palabras completas en `words`"""
+    size = len(run)
+    return any(tuple(words[i:i + size]) == run for i in range(len(words) - size + 1))
+
+
+class _QueryEntry:
+    __slots__ = ("tool_class", "tool_args", "ngrams", "entities", "arg_words", "expires_at")
+
+    def __init__(self, tool_class: str, tool_args: Dict[str, Any], ngrams: FrozenSet[str],
+                 entities: FrozenSet[str], expires_at: float):
+        self.tool_class = tool_class
+        self.tool_args = tool_args
+        self.ngrams = ngrams
+        self.entities = entities
+        self.arg_words = _arg_words(tool_args)
+        self.expires_at = expires_at
+
+
+class QueryCache:
+    """
+    Caché de selección de herramientas por consulta.
+
+    Guarda, para cada consulta normalizada, la clase de herramienta y los
+    argumentos que eligió el LLM. Una consulta nueva reutiliza una entrada si
+    su texto normalizado es idéntico o si la similitud de Jaccard entre sus
+    trigramas de caracteres supera `similarity`. Para que un casi-duplicado sea
+    válido, además:
+    - las palabras con dígitos (IDs) deben ser las mismas, y
+    - todos los argumentos guardados deben aparecer en la consulta nueva como
+      palabras completas y seguidas ("web" no vale para "website"); las
+      entradas con argumentos que no son texto ni números solo se reutilizan
+      con la consulta idéntica.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 256, similarity: float = 0.9):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._entries: "OrderedDict[str, _QueryEntry]" = OrderedDict()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _registry[name] = self
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, query: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Retorna (clase_herramienta, argumentos) para la consulta, o None"""
+        if not self.enabled:
+            return None
+
+        key = normalize_query(query)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.tool_class, dict(entry.tool_args)
+            del self._entries[key]
+
+        if self.similarity < 1.0:
+            match = self._find_similar(key, now)
+            if match is not None:
+                self.hits += 1
+                self.similar_hits += 1
+                return match.tool_class, dict(match.tool_args)
+
+        self.misses += 1
+        return None
+
+    def set(self, query: str, tool_class: str, tool_args: Dict[str, Any]):
+        """Guarda la herramienta elegida para la consulta"""
+        if not self.enabled:
+            return
+
+        key = normalize_query(query)
+        self._entries.pop(key, None)
+        self._entries[key] = _QueryEntry(
+            tool_class, dict(tool_args), _ngrams(key), _entities(key), time.monotonic() + self.ttl
+        )
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Vacía la caché"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores y ocupación de la caché"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "similarity": self.similarity,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def _find_similar(self, key: str, now: float) -> Optional[_QueryEntry]:
+        ngrams = _ngrams(key)
+        entities = _entities(key)
+        words = key.split()
+        best: Optional[_QueryEntry] = None
+        best_score = self.similarity
+
+        for entry in list(self._entries.values()):
+            if entry.expires_at <= now or entry.entities != entities or entry.arg_words is None:
+                continue
+            union = len(ngrams | entry.ngrams)
+            score = len(ngrams & entry.ngrams) / union if union else 0.0
+            if score < best_score:
+                continue
+            # Los argumentos guardados tienen que salir literalmente de la consulta nueva
+            if all(_contains_words(words, run) for run in entry.arg_words):
+                best, best_score = entry, score
+
+        return best
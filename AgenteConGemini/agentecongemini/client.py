@@ -1,29 +1,49 @@
 import asyncio
+import json
 import sys
 import os
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Literal, Optional
-from mirascope.core import google, prompt_template, BaseTool
-from pydantic import BaseModel, Field
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Literal, Optional
+from pydantic import BaseModel, Field, ValidationError
 from mcp.client.session import ClientSession
 from mcp.client.stdio import StdioServerParameters, stdio_client
+from .cache import QueryCache
+from .compaction import CHARS_PER_TOKEN, compact_blocks
+from .deadline import DeadlineExceeded, time_left
+from .executor import call_tool
+from .metrics import track_phase
+from .tracing import start_span
+from .resilience import call_gemini, gemini_breaker, is_gemini_failure
+from .router import TOOL_GROUPS, classify_tool_group, route_query, route_stats, tool_group_classes
+from .sessions import Session, save_session
 
 # ==================== HERRAMIENTAS PARA GEMINI ====================
+# Se definen como modelos de pydantic para no cargar mirascope (y google-genai,
+# ~0.6 s) al importar el módulo; `get_llm_tools()` las convierte en herramientas
+# de mirascope la primera vez que se llama a Gemini.
 
-class GetAllProjectsTool(BaseTool):
+class ListOptions(BaseModel):
+    """Paginación y campos de los listados (por defecto, todo)"""
+    limit: int = Field(description="Máximo de elementos a devolver (0 = todos)", default=0)
+    offset: int = Field(description="Elementos a saltar desde el inicio", default=0)
+    fields: List[str] = Field(description="Campos a incluir (vacío = todos), p. ej. name, status", default=[])
+
+class GetAllProjectsTool(ListOptions):
     """Obtiene todos los proyectos disponibles"""
     
     def call(self) -> str:
         return "get_all_projects"
 
-class GetProjectByIdTool(BaseTool):
+class GetProjectByIdTool(BaseModel):
     """Obtiene un proyecto específico por su ID"""
-    project_id: str = Field(description="ID del proyecto a buscar")
+    project_id: str = Field(description="ID o nombre del proyecto a buscar")
     
     def call(self) -> str:
         return f"get_project_by_id:{self.project_id}"
 
-class CreateProjectTool(BaseTool):
+class CreateProjectTool(BaseModel):
     """Crea un nuevo proyecto"""
     name: str = Field(description="Nombre del proyecto")
     description: str = Field(description="Descripción del proyecto")
@@ -32,9 +52,9 @@ class CreateProjectTool(BaseTool):
     def call(self) -> str:
         return f"create_project:{self.name}"
 
-class UpdateProjectTool(BaseTool):
+class UpdateProjectTool(BaseModel):
     """Actualiza un proyecto existente"""
-    project_id: str = Field(description="ID del proyecto")
+    project_id: str = Field(description="ID o nombre del proyecto")
     name: str = Field(description="Nuevo nombre del proyecto", default="")
     description: str = Field(description="Nueva descripción", default="")
     client_name: str = Field(description="Nuevo nombre del cliente", default="")
@@ -42,90 +62,131 @@ class UpdateProjectTool(BaseTool):
     def call(self) -> str:
         return f"update_project:{self.project_id}"
 
-class DeleteProjectTool(BaseTool):
+class DeleteProjectTool(BaseModel):
     """Elimina un proyecto"""
-    project_id: str = Field(description="ID del proyecto a eliminar")
+    project_id: str = Field(description="ID o nombre exacto del proyecto a eliminar")
     
     def call(self) -> str:
         return f"delete_project:{self.project_id}"
 
-class GetTasksByProjectTool(BaseTool):
+class GetTasksByProjectTool(ListOptions):
     """Obtiene todas las tareas de un proyecto"""
-    project_id: str = Field(description="ID del proyecto")
+    project_id: str = Field(description="ID o nombre del proyecto")
     
     def call(self) -> str:
         return f"get_tasks_by_project:{self.project_id}"
 
-class GetTaskByIdTool(BaseTool):
+class GetTaskByIdTool(BaseModel):
     """Obtiene una tarea específica"""
-    project_id: str = Field(description="ID del proyecto")
-    task_id: str = Field(description="ID de la tarea")
+    project_id: str = Field(description="ID o nombre del proyecto")
+    task_id: str = Field(description="ID o nombre de la tarea")
     
     def call(self) -> str:
         return f"get_task_by_id:{self.project_id}:{self.task_id}"
 
-class CreateTaskTool(BaseTool):
+class CreateTaskTool(BaseModel):
     """Crea una nueva tarea en un proyecto"""
-    project_id: str = Field(description="ID del proyecto")
+    project_id: str = Field(description="ID o nombre del proyecto")
     name: str = Field(description="Nombre de la tarea")
     description: str = Field(description="Descripción de la tarea", default="")
     
     def call(self) -> str:
         return f"create_task:{self.project_id}:{self.name}"
 
-class UpdateTaskTool(BaseTool):
+class UpdateTaskTool(BaseModel):
     """Actualiza una tarea existente"""
-    project_id: str = Field(description="ID del proyecto")
-    task_id: str = Field(description="ID de la tarea")
+    project_id: str = Field(description="ID o nombre del proyecto")
+    task_id: str = Field(description="ID o nombre de la tarea")
     name: str = Field(description="Nuevo nombre", default="")
     description: str = Field(description="Nueva descripción", default="")
     
     def call(self) -> str:
         return f"update_task:{self.project_id}:{self.task_id}"
 
-class UpdateTaskStatusTool(BaseTool):
+class UpdateTaskStatusTool(BaseModel):
     """Actualiza el estado de una tarea"""
-    project_id: str = Field(description="ID del proyecto")
-    task_id: str = Field(description="ID de la tarea")
+    project_id: str = Field(description="ID o nombre del proyecto")
+    task_id: str = Field(description="ID o nombre de la tarea")
     status: Literal["pending", "onHold", "inProgress", "underReview", "completed"] = Field(description="Nuevo estado")
     
     def call(self) -> str:
         return f"update_task_status:{self.project_id}:{self.task_id}:{self.status}"
 
-class DeleteTaskTool(BaseTool):
+class DeleteTaskTool(BaseModel):
     """Elimina una tarea"""
-    project_id: str = Field(description="ID del proyecto")
-    task_id: str = Field(description="ID de la tarea")
+    project_id: str = Field(description="ID o nombre del proyecto")
+    task_id: str = Field(description="ID o nombre de la tarea")
     
     def call(self) -> str:
         return f"delete_task:{self.project_id}:{self.task_id}"
 
-class GetNotesByTaskTool(BaseTool):
+class GetNotesByTaskTool(ListOptions):
     """Obtiene todas las notas de una tarea"""
-    project_id: str = Field(description="ID del proyecto")
-    task_id: str = Field(description="ID de la tarea")
+    project_id: str = Field(description="ID o nombre del proyecto")
+    task_id: str = Field(description="ID o nombre de la tarea")
     
     def call(self) -> str:
         return f"get_notes_by_task:{self.project_id}:{self.task_id}"
 
-class CreateNoteTool(BaseTool):
+class CreateNoteTool(BaseModel):
     """Crea una nota en una tarea"""
-    project_id: str = Field(description="ID del proyecto")
-    task_id: str = Field(description="ID de la tarea")
+    project_id: str = Field(description="ID o nombre del proyecto")
+    task_id: str = Field(description="ID o nombre de la tarea")
     content: str = Field(description="Contenido de la nota")
     
     def call(self) -> str:
         return f"create_note:{self.project_id}:{self.task_id}"
 
-class DeleteNoteTool(BaseTool):
+class DeleteNoteTool(BaseModel):
     """Elimina una nota"""
-    project_id: str = Field(description="ID del proyecto")
-    task_id: str = Field(description="ID de la tarea")
+    project_id: str = Field(description="ID o nombre del proyecto")
+    task_id: str = Field(description="ID o nombre de la tarea")
     note_id: str = Field(description="ID de la nota")
     
     def call(self) -> str:
         return f"delete_note:{self.project_id}:{self.task_id}:{self.note_id}"
 
+# ==================== HERRAMIENTAS EN LOTE ====================
+
+TaskStatus = Literal["pending", "onHold", "inProgress", "underReview", "completed"]
+
+class TaskInput(BaseModel):
+    """Datos de una tarea a crear"""
+    name: str = Field(description="Nombre de la tarea")
+    description: str = Field(description="Descripción de la tarea", default="")
+
+class CreateTasksTool(BaseModel):
+    """Crea varias tareas en un proyecto de una sola vez"""
+    project_id: str = Field(description="ID o nombre del proyecto")
+    tasks: List[TaskInput] = Field(description="Tareas a crear")
+    
+    def call(self) -> str:
+        return f"create_tasks:{self.project_id}:{len(self.tasks)}"
+
+class UpdateTaskStatusesTool(BaseModel):
+    """Actualiza el estado de varias tareas de un proyecto de una sola vez"""
+    project_id: str = Field(description="ID o nombre del proyecto")
+    task_ids: List[str] = Field(description="IDs o nombres de las tareas")
+    status: TaskStatus = Field(description="Nuevo estado")
+    
+    def call(self) -> str:
+        return f"update_task_statuses:{self.project_id}:{self.status}"
+
+class GetTasksForProjectsTool(BaseModel):
+    """Obtiene las tareas de varios proyectos de una sola vez"""
+    project_ids: List[str] = Field(description="IDs o nombres de los proyectos")
+    
+    def call(self) -> str:
+        return f"get_tasks_for_projects:{len(self.project_ids)}"
+
+class GetNotesForTasksTool(BaseModel):
+    """Obtiene las notas de varias tareas de un proyecto de una sola vez"""
+    project_id: str = Field(description="ID o nombre del proyecto")
+    task_ids: List[str] = Field(description="IDs o nombres de las tareas")
+    
+    def call(self) -> str:
+        return f"get_notes_for_tasks:{self.project_id}:{len(self.task_ids)}"
+
 # ==================== MAPEO DE HERRAMIENTAS ====================
 TOOL_NAME_MAP = {
     "GetAllProjectsTool": "get_all_projects",
@@ -142,12 +203,26 @@ TOOL_NAME_MAP = {
     "GetNotesByTaskTool": "get_notes_by_task",
     "CreateNoteTool": "create_note",
     "DeleteNoteTool": "delete_note",
+    "CreateTasksTool": "create_tasks",
+    "UpdateTaskStatusesTool": "update_task_statuses",
+    "GetTasksForProjectsTool": "get_tasks_for_projects",
+    "GetNotesForTasksTool": "get_notes_for_tasks",
 }
 
-# ✅ Función async con decorador
-@google.call(
-    model="gemini-2.0-flash-exp",
-    tools=[
+# Herramientas de solo lectura: las únicas cuya selección puede reutilizarse
+READ_ONLY_TOOLS = {
+    "GetAllProjectsTool",
+    "GetProjectByIdTool",
+    "GetTasksByProjectTool",
+    "GetTaskByIdTool",
+    "GetNotesByTaskTool",
+    "GetTasksForProjectsTool",
+    "GetNotesForTasksTool",
+}
+
+TOOL_CLASSES = {
+    tool_class.__name__: tool_class
+    for tool_class in (
         GetAllProjectsTool,
         GetProjectByIdTool,
         CreateProjectTool,
@@ -162,16 +237,278 @@ TOOL_NAME_MAP = {
         GetNotesByTaskTool,
         CreateNoteTool,
         DeleteNoteTool,
-    ]
+        CreateTasksTool,
+        UpdateTaskStatusesTool,
+        GetTasksForProjectsTool,
+        GetNotesForTasksTool,
+    )
+}
+
+# ==================== CARGA DIFERIDA DE GEMINI ====================
+
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+
+@lru_cache(maxsize=None)
+def get_llm_tools() -> Dict[str, type]:
+    """
+    Herramientas de mirascope para Gemini por nombre de clase, construidas una
+    sola vez a partir de TOOL_CLASSES. Mantienen el nombre de la clase y
+    heredan del modelo original.
+    """
+    from mirascope.core import BaseTool
+
+    # mirascope regenera el esquema de cada herramienta en cada llamada a
+    # Gemini; los esquemas no cambian, así que se calculan una vez por proveedor
+    schemas: Dict[tuple, Any] = {}
+
+    class AgentTool(BaseTool):
+        @classmethod
+        def tool_schema(cls):
+            provider = next(
+                base for base in cls.__mro__
+                if issubclass(base, BaseTool) and not issubclass(base, AgentTool)
+            )
+            key = (cls.__name__, provider)
+            if key not in schemas:
+                schemas[key] = super().tool_schema()
+            return schemas[key]
+
+    return {name: AgentTool.type_from_base_model_type(model) for name, model in TOOL_CLASSES.items()}
+
+def group_tool_names(group: Optional[str] = None) -> List[str]:
+    """Herramientas de un grupo (ver router.TOOL_GROUPS) en el orden de TOOL_CLASSES; None = todas"""
+    names = tool_group_classes(group)
+    return [name for name in TOOL_CLASSES if names is None or name in names]
+
+@lru_cache(maxsize=None)
+def tool_schema_tokens(group: Optional[str] = None) -> int:
+    """Tokens aproximados de los esquemas de herramientas que se envían a Gemini"""
+    chars = sum(len(json.dumps(TOOL_CLASSES[name].model_json_schema())) for name in group_tool_names(group))
+    return chars // CHARS_PER_TOKEN
+
+@lru_cache(maxsize=None)
+def get_gemini_calls(group: Optional[str] = None) -> Dict[str, Callable]:
+    """
+    Llamadas a Gemini con las herramientas del grupo (None = todas). Se
+    construyen una vez por grupo en el primer uso, para que importar el
+    cliente (y arrancar la API) no cargue mirascope ni google-genai.
+    """
+    from mirascope.core import google, prompt_template
+
+    llm_tools = get_llm_tools()
+    tools = [llm_tools[name] for name in group_tool_names(group)]
+
+    @google.call(model=GEMINI_MODEL, tools=tools)
+    @prompt_template(ANALYZE_PROMPT)
+    async def analyze_query(query: str, context: str): ...
+
+    @google.call(model=GEMINI_MODEL, tools=tools, stream=True)
+    @prompt_template(ANALYZE_PROMPT)
+    async def analyze_query_stream(query: str, context: str): ...
+
+    @google.call(model=GEMINI_MODEL, tools=tools)
+    @prompt_template(AGENT_PROMPT)
+    async def agent_step(query: str, history: list, context: str): ...
+
+    return {
+        "analyze_query": analyze_query,
+        "analyze_query_stream": analyze_query_stream,
+        "agent_step": agent_step,
+    }
+
+async def preload_gemini():
+    """Carga el proveedor de Gemini en segundo plano (para que no lo pague la primera consulta)"""
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(get_gemini_calls)
+        for group in TOOL_GROUPS:
+            await asyncio.to_thread(get_gemini_calls, group)
+    except Exception as e:
+        print(f"⚠️  No se pudo precargar el proveedor de Gemini: {e}")
+        return
+    print(f"✅ Proveedor de Gemini cargado en {time.perf_counter() - started:.2f}s")
+
+# ==================== CACHÉ DE CONSULTAS ====================
+
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))
+# 1.0 = solo consultas idénticas tras normalizar
+QUERY_CACHE_SIMILARITY = float(os.getenv("QUERY_CACHE_SIMILARITY", "0.9"))
+
+query_cache = QueryCache(
+    "query_tools",
+    ttl=QUERY_CACHE_TTL,
+    max_entries=QUERY_CACHE_MAX_ENTRIES,
+    similarity=QUERY_CACHE_SIMILARITY
 )
-@prompt_template("Usuario: {query}\n\nAnaliza la consulta y usa la herramienta apropiada para gestionar proyectos, tareas y notas.")
-async def analyze_query(query: str): ...
+
+class QueryPlan(BaseModel):
+    """Resultado del análisis de una consulta: herramienta a ejecutar o respuesta directa"""
+    tool_class: Optional[str] = None
+    tool_args: Dict[str, Any] = Field(default_factory=dict)
+    content: Optional[str] = None
+    source: str = "llm"
+
+    @property
+    def tool_name(self) -> Optional[str]:
+        return TOOL_NAME_MAP.get(self.tool_class) if self.tool_class else None
+
+ANALYZE_PROMPT = "{context}Usuario: {query}\n\nAnaliza la consulta y usa la herramienta apropiada para gestionar proyectos, tareas y notas."
+
+def session_context(session: Optional[Session]) -> str:
+    """Bloque de contexto de la conversación para el prompt ("" sin historial)"""
+    context = session.context() if session is not None else ""
+    return f"Contexto de la conversación:\n{context}\n\n" if context else ""
+
+async def analyze_query(query: str, context: str = "", group: Optional[str] = None):
+    """Pide a Gemini la herramienta adecuada para la consulta (entre las del grupo; None = todas)"""
+    return await get_gemini_calls(group)["analyze_query"](query, context)
+
+async def analyze_query_stream(query: str, context: str = "", group: Optional[str] = None):
+    """Misma consulta en modo streaming: emite el texto de Gemini a medida que llega"""
+    return await get_gemini_calls(group)["analyze_query_stream"](query, context)
+
+def tool_group_attempts(query: str) -> List[Optional[str]]:
+    """
+    Grupos de herramientas con los que se consulta a Gemini, en orden: el del
+    clasificador local y, si con él no elige ninguna herramienta, todas (None).
+    """
+    group = classify_tool_group(query)
+    return [group, None] if group is not None else [None]
+
+def record_tool_group(group: Optional[str], started: float, first_attempt: bool):
+    """Cuenta la llamada a Gemini con su grupo, latencia y tokens de esquemas enviados"""
+    route_stats.record_tool_group(
+        group,
+        time.perf_counter() - started,
+        tool_schema_tokens(group),
+        # Lo que se habría enviado con todas las herramientas, una vez por consulta
+        tool_schema_tokens() if first_attempt else 0
+    )
+
+async def analyze_with_tool_groups(query: str, context: str = ""):
+    """
+    Pide a Gemini la herramienta enviando solo los esquemas del grupo de la
+    consulta; si con ese subconjunto no elige ninguna, repite con todas.
+    """
+    for attempt, group in enumerate(tool_group_attempts(query)):
+        started = time.perf_counter()
+        response = await call_gemini(lambda: analyze_query(query, context, group))
+        record_tool_group(group, started, first_attempt=attempt == 0)
+        if response.tool:
+            break
+    return response
+
+def plan_locally(query: str, started: float, use_cache: bool = True) -> Optional[QueryPlan]:
+    """
+    Intenta resolver la consulta sin LLM:
+    1. Router determinista para comandos simples
+    2. Caché de consultas equivalentes ya vistas (solo herramientas de lectura)
+
+    Con historial de conversación no se usa la caché de consultas: la misma
+    frase ("muéstrame sus tareas") puede referirse a otra entidad.
+    """
+    routed = route_query(query)
+    if routed is not None:
+        rule, tool_class, tool_args = routed
+        try:
+            # Validar los argumentos con el mismo modelo que usaría Gemini
+            TOOL_CLASSES[tool_class].model_validate(tool_args)
+        except ValidationError:
+            pass
+        else:
+            route = f"router:{rule}"
+            route_stats.record(route, time.perf_counter() - started)
+            return QueryPlan(tool_class=tool_class, tool_args=tool_args, source=route)
+
+    cached = query_cache.get(query) if use_cache else None
+    if cached is not None:
+        tool_class, tool_args = cached
+        route_stats.record("cache", time.perf_counter() - started)
+        return QueryPlan(tool_class=tool_class, tool_args=tool_args, source="cache")
+
+    return None
+
+def plan_from_tool(query: str, tool: BaseModel, use_cache: bool = True) -> QueryPlan:
+    """Convierte la herramienta elegida por Gemini en un plan (y la cachea si es de lectura)"""
+    tool_class = type(tool).__name__
+    tool_args = tool.model_dump(exclude_unset=True)
+    if use_cache and tool_class in READ_ONLY_TOOLS:
+        query_cache.set(query, tool_class, tool_args)
+    return QueryPlan(tool_class=tool_class, tool_args=tool_args)
+
+async def plan_query(query: str, context: str = "") -> QueryPlan:
+    """
+    Decide qué herramienta usar para la consulta, de la opción más barata a la
+    más cara: router, caché de consultas y, por último, Gemini.
+
+    Args:
+        query: Consulta del usuario
+        context: Contexto de la conversación (ver `session_context`)
+    """
+    started = time.perf_counter()
+    plan = plan_locally(query, started, use_cache=not context)
+    if plan is not None:
+        return plan
+
+    response = await analyze_with_tool_groups(query, context)
+    route_stats.record("llm", time.perf_counter() - started)
+    if not response.tool:
+        return QueryPlan(content=response.content)
+    return plan_from_tool(query, response.tool, use_cache=not context)
+
+def record_turn(session: Optional[Session], query: str, response: str, plan: Optional[QueryPlan] = None):
+    """Añade el turno a la sesión (si la hay) y la guarda"""
+    if session is None:
+        return
+    session.add_turn(
+        query,
+        response,
+        plan.tool_name if plan is not None else None,
+        plan.tool_args if plan is not None else None
+    )
+    save_session(session)
+
+# ==================== AGENTE MULTI-PASO ====================
+
+# Límites del bucle del agente para que siga acotado bajo carga
+AGENT_MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", "5"))
+AGENT_STEP_TIMEOUT = float(os.getenv("AGENT_STEP_TIMEOUT", "30"))
+AGENT_TOTAL_BUDGET = float(os.getenv("AGENT_TOTAL_BUDGET", "90"))
+AGENT_TOOL_CONCURRENCY = int(os.getenv("AGENT_TOOL_CONCURRENCY", "4"))
+
+AGENT_PROMPT = """
+SYSTEM:
+Eres un agente de gestión de proyectos, tareas y notas.
+Usa las herramientas necesarias para responder. Si necesitas varias consultas
+independientes, pide todas las herramientas a la vez.
+Cuando tengas la información suficiente, responde al usuario en español con un resumen claro.
+{context}
+MESSAGES: {history}
+USER: {query}
+"""
+
+async def agent_step(query: str, history: list, context: str = ""):
+    """Un paso del agente multi-paso con el historial de la conversación"""
+    return await get_gemini_calls()["agent_step"](query, history, context)
+
+def content_blocks(content: List[Any]) -> Iterator[str]:
+    """Bloques de texto de un resultado MCP, recortados al presupuesto de tokens"""
+    return compact_blocks(block.text for block in content if getattr(block, "text", None) is not None)
+
+def content_to_text(content: List[Any]) -> str:
+    """Une los bloques de texto de un resultado MCP (compactado si es muy grande)"""
+    return "\n".join(content_blocks(content))
+
+
+class ToolExecutionError(Exception):
+    """La herramienta devolvió un resultado con `isError`"""
 
 async def execute_query(query: str):
     try:
         # Analizar query con Gemini
         print(f"🤔 Analizando con Gemini: '{query}'")
-        response = await analyze_query(query)
+        response = await call_gemini(lambda: analyze_query(query))
         
         # Si no hay tool call, solo responder
         if not response.tool:
@@ -223,50 +560,206 @@ async def execute_query(query: str):
         raise  # Re-lanzar para que la API pueda manejarlo
 
 
-async def execute_query_silent(query: str):
+async def execute_query_silent(query: str, session: Optional[Session] = None):
     """
     Versión silenciosa de execute_query para uso en API REST.
     No imprime en consola, solo retorna el resultado o lanza excepciones.
     
     Args:
         query: Consulta del usuario en lenguaje natural
+        session: Sesión de conversación (contexto para Gemini; se le añade el turno)
         
     Returns:
         str: Respuesta del agente (contenido de texto o JSON)
         
     Raises:
-        Exception: Si ocurre algún error durante el procesamiento
+        DeadlineExceeded: Si vence el plazo de la consulta
+        Exception: Si ocurre algún error durante el procesamiento (con un
+            ToolExecutionError como causa si falló la herramienta)
     """
     try:
-        # Analizar query con Gemini (sin prints)
-        response = await analyze_query(query)
-        
-        # Si no hay tool call, solo responder
-        if not response.tool:
-            return response.content
-        
-        # Extraer información de la herramienta
-        tool_class_name = type(response.tool).__name__
-        tool_name = TOOL_NAME_MAP.get(tool_class_name)
-        
-        if not tool_name:
-            raise ValueError(f"Herramienta no encontrada: {tool_class_name}")
-        
-        tool_args = response.tool.model_dump(exclude_unset=True)
-        
-        # Conectar al servidor MCP y ejecutar
-        server_params = StdioServerParameters(
-            command=sys.executable,
-            args=["-m", "agentecongemini.server"],
-            env=None
-        )
-        
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                result = await session.call_tool(tool_name, tool_args)
-                return result.content
+        with start_span("agent.query") as span:
+            # Analizar query (caché de consultas o Gemini, sin prints)
+            plan = await plan_query(query, session_context(session))
+            span.set_attribute("plan.source", plan.source)
+            
+            # Si no hay tool call, solo responder
+            if not plan.tool_class:
+                record_turn(session, query, plan.content or "")
+                return plan.content
+            
+            # Extraer información de la herramienta
+            tool_name = plan.tool_name
+            
+            if not tool_name:
+                raise ValueError(f"Herramienta no encontrada: {plan.tool_class}")
+            
+            # Ejecutar con el transporte configurado (MCP stdio o en proceso)
+            result = await call_tool(tool_name, plan.tool_args)
+            response = content_to_text(result.content)
+            record_turn(session, query, response, plan)
+            if result.isError:
+                raise ToolExecutionError(response)
+            return response
                     
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         # Re-lanzar con información del error
-        raise Exception(f"Error procesando consulta: {str(e)}") from e
\ No newline at end of file
+        raise Exception(f"Error procesando consulta: {str(e)}") from e
+
+
+async def stream_query(query: str, session: Optional[Session] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Versión en streaming de execute_query_silent para la API REST.
+    Emite eventos a medida que avanza cada fase:
+
+    - analyzing: se empieza a analizar la consulta
+    - token: fragmento de texto de Gemini (cuando no usa herramienta)
+    - tool_selected: herramienta elegida, argumentos y origen (router, cache, llm)
+    - tool_executing: la herramienta se está ejecutando
+    - partial: un bloque del resultado de la herramienta
+    - done: respuesta final completa
+    - error: la consulta falló
+
+    Args:
+        query: Consulta del usuario en lenguaje natural
+        session: Sesión de conversación (contexto para Gemini; se le añade el turno)
+    """
+    try:
+        with start_span("agent.stream_query") as span:
+            yield {"event": "analyzing"}
+            started = time.perf_counter()
+            context = session_context(session)
+            plan = plan_locally(query, started, use_cache=not context)
+            span.set_attribute("plan.source", plan.source if plan else "llm")
+
+            if plan is None:
+                tool = None
+                for attempt, group in enumerate(tool_group_attempts(query)):
+                    group_started = time.perf_counter()
+                    # Fuera del breaker: un plazo vencido no es un fallo de Gemini
+                    time_left("gemini")
+                    # Sin reintentos: el texto ya emitido no se puede retirar
+                    with track_phase("gemini"), start_span("gemini.stream", **{"tools.group": group or "all"}):
+                        async with gemini_breaker.guard(is_gemini_failure):
+                            stream = await analyze_query_stream(query, context, group)
+                            async for chunk, chunk_tool in stream:
+                                if chunk_tool is not None:
+                                    tool = chunk_tool
+                                    break
+                                # Con un subconjunto el texto se retiene: si no elige
+                                # herramienta se descarta y se repite con todas
+                                if chunk.content and group is None:
+                                    yield {"event": "token", "text": chunk.content}
+                    record_tool_group(group, group_started, first_attempt=attempt == 0)
+                    if tool is not None:
+                        break
+                route_stats.record("llm", time.perf_counter() - started)
+
+                if tool is None:
+                    record_turn(session, query, stream.content)
+                    yield {"event": "done", "response": stream.content, "success": True}
+                    return
+                plan = plan_from_tool(query, tool, use_cache=not context)
+
+            tool_name = plan.tool_name
+            if not tool_name:
+                raise ValueError(f"Herramienta no encontrada: {plan.tool_class}")
+
+            yield {"event": "tool_selected", "tool": tool_name, "args": plan.tool_args, "source": plan.source}
+            yield {"event": "tool_executing", "tool": tool_name}
+
+            result = await call_tool(tool_name, plan.tool_args)
+            texts = []
+            for text in content_blocks(result.content):
+                texts.append(text)
+                yield {"event": "partial", "text": text}
+
+            response = "\n".join(texts) or "Operación completada exitosamente"
+            record_turn(session, query, response, plan)
+            yield {"event": "done", "response": response, "success": not result.isError}
+
+    except Exception as e:
+        yield {"event": "error", "error": f"Error procesando consulta: {str(e)}"}
+
+
+
+async def run_agent_tool(tool: BaseModel, semaphore: asyncio.Semaphore) -> str:
+    """Ejecuta una herramienta pedida por el agente y devuelve su salida como texto"""
+    tool_class_name = type(tool).__name__
+    tool_name = TOOL_NAME_MAP.get(tool_class_name)
+    if not tool_name:
+        return f"Error: herramienta no encontrada: {tool_class_name}"
+
+    async with semaphore:
+        try:
+            result = await asyncio.wait_for(
+                call_tool(tool_name, tool.model_dump(exclude_unset=True)),
+                timeout=AGENT_STEP_TIMEOUT
+            )
+        except DeadlineExceeded:
+            raise
+        except asyncio.TimeoutError:
+            return f"Error: la herramienta {tool_name} superó {AGENT_STEP_TIMEOUT}s"
+        except Exception as e:
+            return f"Error ejecutando {tool_name}: {str(e)}"
+
+    return content_to_text(result.content) or "Operación completada exitosamente"
+
+async def execute_agent_query(query: str, session: Optional[Session] = None) -> str:
+    """
+    Agente multi-paso para la API REST.
+
+    Envía la consulta a Gemini y, mientras el modelo pida herramientas, las
+    ejecuta (las llamadas independientes de un mismo paso en paralelo) y le
+    devuelve los resultados para que continúe. El bucle está acotado por
+    AGENT_MAX_STEPS pasos, AGENT_STEP_TIMEOUT segundos por paso y
+    AGENT_TOTAL_BUDGET segundos en total.
+
+    Args:
+        query: Consulta del usuario en lenguaje natural
+        session: Sesión de conversación (contexto para Gemini; se le añade el turno)
+
+    Returns:
+        str: Respuesta final del agente
+
+    Raises:
+        DeadlineExceeded: Si vence el plazo de la consulta
+        Exception: Si ocurre algún error o se agota el presupuesto de tiempo
+    """
+    semaphore = asyncio.Semaphore(AGENT_TOOL_CONCURRENCY)
+    history: list = []
+    context = session_context(session)
+
+    try:
+        with start_span("agent.multi_step"):
+            async with asyncio.timeout(AGENT_TOTAL_BUDGET):
+                response = await call_gemini(lambda: agent_step(query, history, context), timeout=AGENT_STEP_TIMEOUT)
+                history += [response.user_message_param, response.message_param]
+
+                for _ in range(AGENT_MAX_STEPS):
+                    tools = response.tools
+                    if not tools:
+                        break
+
+                    outputs = await asyncio.gather(*(run_agent_tool(tool, semaphore) for tool in tools))
+                    history += response.tool_message_params(list(zip(tools, outputs)))
+
+                    response = await call_gemini(lambda: agent_step("", history, context), timeout=AGENT_STEP_TIMEOUT)
+                    history.append(response.message_param)
+
+                answer = response.content
+                if response.tools:
+                    answer = (answer + "\n\n" if answer else "") + (
+                        f"(Se alcanzó el límite de {AGENT_MAX_STEPS} pasos del agente)"
+                    )
+                record_turn(session, query, answer)
+                return answer
+
+    except DeadlineExceeded:
+        raise
+    except TimeoutError:
+        raise Exception("Error procesando consulta: el agente superó el tiempo límite") from None
+    except Exception as e:
+        raise Exception(f"Error procesando consulta: {str(e)}") from e
@@ -0,0 +1,96 @@
+"""
+Agrupación (single-flight) de peticiones idénticas en curso.
+Si varias corrutinas piden a la vez la misma lectura, solo la primera llega al
+API Gateway; las demás esperan y comparten su resultado ya parseado.
+
+La llamada compartida no hereda el plazo ni el span de quien la inició: cada
+consulta espera el resultado con su propio plazo, y el plazo corto de una no
+hace fallar a las demás.
+"""
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from .deadline import clear_deadline
+from .tracing import clear_span
+
+T = TypeVar("T")
+
+# Grupos creados en este proceso, por nombre (para /api/stats)
+_registry: Dict[str, "SingleFlight"] = {}
+
+def get_coalescing_stats() -> Dict[str, Dict[str, Any]]:
+    """Estadísticas de todos los grupos single-flight de este proceso"""
+    return {name: group.stats() for name, group in _registry.items()}
+
+def _shared_context() -> contextvars.Context:
+    """Contexto para una llamada compartida: sin el plazo ni el span de ninguna consulta"""
+    context = contextvars.copy_context()
+    context.run(clear_deadline)
+    context.run(clear_span)
+    return context
+
+
+class SingleFlight:
+    """
+    Ejecuta como máximo una llamada en curso por clave.
+
+    La llamada corre en su propia tarea: si uno de los que esperan se cancela
+    (por ejemplo, porque su cliente se desconectó), la petición sigue en curso
+    para el resto. Si se cancelan todos, la petición se cancela también.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        # Corrutinas esperando cada llamada en curso
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.issued = 0
+        self.coalesced = 0
+        self.abandoned = 0
+        _registry[name] = self
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Ejecuta `fn` o se une a la llamada en curso con la misma clave"""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(fn(), context=_shared_context())
+            self._in_flight[key] = task
+            self.issued += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # El plazo de esta consulta (su deadline_scope) cancela solo esta espera
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                # Nadie espera ya el resultado: no seguir con trabajo que se descartaría
+                if not task.done():
+                    # Fuera del mapa ya: quien llegue ahora inicia otra llamada en vez
+                    # de unirse a una tarea que está muriendo
+                    if self._in_flight.get(key) is task:
+                        del self._in_flight[key]
+                    task.cancel()
+                    self.abandoned += 1
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Marcar la excepción como leída aunque todos los que esperaban se hayan ido
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Peticiones emitidas frente a peticiones agrupadas"""
+        total = self.issued + self.coalesced
+        return {
+            "issued": self.issued,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+            "abandoned": self.abandoned,
+            "coalesced_ratio": (self.coalesced / total) if total else 0.0,
+        }
@@ -0,0 +1,103 @@
+"""
+Compactación de resultados de herramientas.
+- select_items: paginación (limit/offset) y proyección de campos de los
+  listados del servidor MCP, antes de serializarlos.
+- compact_blocks: recorre los bloques de texto de un resultado y, cuando
+  superan el presupuesto de tokens, corta y añade un resumen (cuántos elementos
+  faltan y su reparto por estado), sin unir antes el resultado completo.
+"""
+import os
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from pydantic import BaseModel
+from pydantic_core import from_json
+
+# Presupuesto de tokens por resultado que llega al LLM o al cliente (0 = sin límite)
+RESULT_TOKEN_BUDGET = int(os.getenv("RESULT_TOKEN_BUDGET", "4000"))
+# Aproximación de caracteres por token para estimar el tamaño del texto
+CHARS_PER_TOKEN = 4
+
+# ==================== LISTADOS ====================
+
+def select_items(
+    items: Sequence[BaseModel],
+    limit: int = 0,
+    offset: int = 0,
+    fields: Optional[List[str]] = None
+) -> Union[List[BaseModel], List[Dict[str, Any]]]:
+    """
+    Página de un listado, con solo los campos pedidos.
+
+    Args:
+        items: Listado completo (modelos de pydantic)
+        limit: Máximo de elementos a devolver (0 = todos)
+        offset: Elementos a saltar desde el inicio
+        fields: Campos a incluir; `id` se incluye siempre (None = todos)
+
+    Raises:
+        ValueError: Si los parámetros son negativos o algún campo no existe
+    """
+    if limit < 0 or offset < 0:
+        raise ValueError("limit y offset no pueden ser negativos")
+
+    page = items[offset:offset + limit] if limit else items[offset:]
+    if not fields:
+        return list(page)
+
+    if items:
+        known = type(items[0]).model_fields
+        unknown = [field for field in fields if field not in known]
+        if unknown:
+            raise ValueError(f"Campos desconocidos: {', '.join(unknown)} (disponibles: {', '.join(known)})")
+    include = {"id", *fields}
+    return [item.model_dump(include=include, by_alias=True) for item in page]
+
+# ==================== PRESUPUESTO ====================
+
+def summarize_rest(blocks: Iterable[str]) -> str:
+    """Resumen de los bloques omitidos: cuántos son y su reparto por estado"""
+    omitted = 0
+    statuses: Counter = Counter()
+    for block in blocks:
+        omitted += 1
+        try:
+            item = from_json(block)
+        except ValueError:
+            continue
+        if isinstance(item, dict) and isinstance(item.get("status"), str):
+            statuses[item["status"]] += 1
+
+    summary = f"… {omitted} elementos más omitidos por tamaño"
+    if statuses:
+        summary += " (" + ", ".join(f"{status}: {count}" for status, count in statuses.most_common()) + ")"
+    return summary + ". Usa limit/offset o fields para ver el resto."
+
+def compact_blocks(blocks: Iterable[str], budget: Optional[int] = None) -> Iterator[str]:
+    """
+    Emite los bloques mientras quepan en el presupuesto de tokens y, si no
+    caben todos, un bloque final con el resumen de los omitidos.
+
+    El primer bloque se recorta si por sí solo supera el presupuesto (por
+    ejemplo, un único objeto muy grande).
+    """
+    budget = RESULT_TOKEN_BUDGET if budget is None else budget
+    remaining = iter(blocks)
+    if budget <= 0:
+        yield from remaining
+        return
+
+    max_chars = budget * CHARS_PER_TOKEN
+    used = 0
+    for block in remaining:
+        if used + len(block) > max_chars:
+            if used == 0:
+                yield block[:max_chars] + " …"
+                rest = list(remaining)
+            else:
+                rest = [block, *remaining]
+            if rest:
+                yield summarize_rest(rest)
+            return
+        used += len(block) + 1
+        yield block
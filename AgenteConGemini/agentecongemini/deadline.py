@@ -0,0 +1,221 @@
+"""
+Plazo (deadline) de extremo a extremo de cada consulta.
+La API fija el plazo al recibir la petición (cabecera X-Request-Timeout o
+REQUEST_DEADLINE) y viaja con la consulta: acota la espera por una sesión MCP,
+va en el `_meta` de `tools/call` (el servidor MCP abre su propio plazo con el
+tiempo restante) y se comprueba antes de cada intento de llamada a Gemini o
+petición httpx al API Gateway. Ninguna fase empieza si el plazo ya pasó, y el
+trabajo en curso se cancela en cuanto vence o el cliente se desconecta.
+
+Las cancelaciones se cuentan por motivo (deadline, disconnect) y por la fase
+que interrumpieron, para que el trabajo desperdiciado sea visible.
+"""
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Mapping, Optional, TypeVar
+
+from .metrics import CANCELLATIONS_TOTAL
+
+T = TypeVar("T")
+
+# ==================== CONFIGURACIÓN ====================
+
+# Plazo por defecto de una consulta en segundos (0 = sin plazo)
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "120"))
+# Plazo máximo que puede pedir un cliente con la cabecera
+REQUEST_DEADLINE_MAX = float(os.getenv("REQUEST_DEADLINE_MAX", "600"))
+
+# Segundos que el cliente está dispuesto a esperar
+DEADLINE_HEADER = "X-Request-Timeout"
+# Clave del `_meta` de `tools/call` con los segundos restantes
+DEADLINE_META_KEY = "deadline_seconds"
+
+REASON_DEADLINE = "deadline"
+REASON_DISCONNECT = "disconnect"
+
+# ==================== PLAZO ====================
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """El plazo de la consulta venció antes de terminar"""
+
+    def __init__(self, seconds: float):
+        super().__init__(f"La consulta superó el plazo de {seconds:g}s")
+        self.seconds = seconds
+
+
+class Deadline:
+    """
+    Plazo de una consulta (`seconds=None`: sin plazo, pero con seguimiento de
+    cancelaciones). Se comparte por referencia con las tareas que crea la
+    consulta, de modo que todas ven el mismo instante límite y el mismo
+    motivo de cancelación.
+    """
+
+    def __init__(self, seconds: Optional[float]):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds is not None else math.inf
+        # Motivo y fase de la primera cancelación (se cuenta una vez)
+        self.reason: Optional[str] = None
+        self.phase: Optional[str] = None
+        # Última fase que empezó y sigue en curso (también en tareas compartidas)
+        self.active_phase: Optional[str] = None
+        self._recorded = False
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def enter(self, phase: str) -> Optional[str]:
+        """Anota que empieza una fase; devuelve la anterior para restaurarla"""
+        previous, self.active_phase = self.active_phase, phase
+        return previous
+
+    def cancel(self, reason: str):
+        """Anota por qué se cancela la consulta (antes de cancelar su tarea)"""
+        if self.reason is None:
+            self.reason = reason
+
+    def interrupted(self, phase: str):
+        """Anota la fase más interna que estaba en curso al cancelarse"""
+        if self.phase is None:
+            self.phase = phase
+            if self.reason is None and self.expired:
+                self.reason = REASON_DEADLINE
+
+    def record(self):
+        """Cuenta la cancelación (una vez por consulta)"""
+        if self.reason is not None and not self._recorded:
+            self._recorded = True
+            phase = self.phase or self.active_phase or "agent"
+            CANCELLATIONS_TOTAL.inc(reason=self.reason, phase=phase)
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("agent_deadline", default=None)
+
+def current_deadline() -> Optional[Deadline]:
+    """Plazo de la consulta en curso (None si no tiene)"""
+    return _current.get()
+
+def clear_deadline():
+    """Quita el plazo del contexto actual (trabajo compartido por varias consultas)"""
+    _current.set(None)
+
+def parse_deadline(value: Optional[str], default: float = REQUEST_DEADLINE) -> Optional[float]:
+    """
+    Segundos de plazo a partir de la cabecera X-Request-Timeout (o el
+    default), acotados a REQUEST_DEADLINE_MAX. None = sin plazo.
+    """
+    seconds = default
+    if value:
+        try:
+            seconds = float(value)
+        except ValueError:
+            pass
+    if not math.isfinite(seconds) or seconds <= 0:
+        return None
+    return min(seconds, REQUEST_DEADLINE_MAX) if REQUEST_DEADLINE_MAX > 0 else seconds
+
+@asynccontextmanager
+async def deadline_scope(seconds: Optional[float]) -> AsyncIterator[Deadline]:
+    """
+    Ejecuta el bloque con un plazo (None = sin plazo): lo publica para las
+    fases internas y cancela el bloque cuando vence.
+
+    Raises:
+        DeadlineExceeded: Si el plazo vence dentro del bloque
+    """
+    deadline = Deadline(seconds)
+    token = _current.set(deadline)
+    timeout = asyncio.timeout(seconds)
+    try:
+        async with timeout:
+            yield deadline
+    except TimeoutError as e:
+        # Otros timeouts del bloque (p. ej. el de una fase) no son el plazo
+        if not timeout.expired() and not isinstance(e, DeadlineExceeded):
+            raise
+        deadline.cancel(REASON_DEADLINE)
+        deadline.record()
+        raise DeadlineExceeded(deadline.seconds or 0) from None
+    finally:
+        _current.reset(token)
+
+async def run_with_deadline(seconds: Optional[float], fn: Callable[[], Awaitable[T]]) -> T:
+    """
+    Ejecuta `fn` dentro de `deadline_scope`. Si la cancelan desde fuera (el
+    cliente se desconectó o canceló la consulta) se cuenta como `disconnect`
+    con la fase que estaba en curso.
+
+    Raises:
+        DeadlineExceeded: Si el plazo vence antes de terminar
+    """
+    deadline: Optional[Deadline] = None
+    try:
+        async with deadline_scope(seconds) as deadline:
+            return await fn()
+    except asyncio.CancelledError:
+        if deadline is not None:
+            deadline.cancel(REASON_DISCONNECT)
+            deadline.record()
+        raise
+
+# ==================== FASES ====================
+
+def time_left(phase: str, default: Optional[float] = None) -> Optional[float]:
+    """
+    Timeout para una fase que va a empezar: el menor entre `default` y lo que
+    queda del plazo (None = sin límite).
+
+    Raises:
+        DeadlineExceeded: Si el plazo ya venció (la fase no llega a empezar)
+    """
+    deadline = _current.get()
+    if deadline is None or deadline.seconds is None:
+        return default
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        deadline.cancel(REASON_DEADLINE)
+        deadline.interrupted(phase)
+        deadline.record()
+        raise DeadlineExceeded(deadline.seconds)
+    return remaining if default is None else min(default, remaining)
+
+@contextmanager
+def in_phase(phase: str) -> Iterator[None]:
+    """Anota en el plazo de la consulta la fase en curso, por si se cancela"""
+    deadline = _current.get()
+    if deadline is None:
+        yield
+        return
+    previous = deadline.enter(phase)
+    try:
+        yield
+    except asyncio.CancelledError:
+        # La fase activa puede ser más interna y estar en otra tarea (lectura compartida)
+        deadline.interrupted(deadline.active_phase or phase)
+        raise
+    finally:
+        deadline.active_phase = previous
+
+def deadline_meta() -> Optional[Dict[str, Any]]:
+    """Segundos restantes para el `_meta` de una petición MCP"""
+    deadline = _current.get()
+    if deadline is None or deadline.seconds is None:
+        return None
+    return {DEADLINE_META_KEY: max(0.0, round(deadline.remaining(), 3))}
+
+def meta_deadline(meta: Optional[Mapping[str, Any]]) -> Optional[float]:
+    """Segundos restantes que envió el cliente MCP en `_meta` (None si no hay)"""
+    if not meta or DEADLINE_META_KEY not in meta:
+        return None
+    try:
+        return max(0.001, float(meta[DEADLINE_META_KEY]))
+    except (TypeError, ValueError):
+        return None
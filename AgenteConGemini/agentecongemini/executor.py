@@ -0,0 +1,189 @@
+"""
+Ejecución de herramientas del servidor MCP.
+Permite elegir el transporte usado por la API REST: subproceso stdio (protocolo
+MCP completo) o en proceso, llamando directamente a las funciones `@mcp.tool()`
+de server.py dentro del mismo event loop.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from mcp.client.session import ClientSession
+from mcp.client.stdio import stdio_client
+from mcp.types import (
+    CallToolRequest, CallToolRequestParams, CallToolResult, CancelledNotification, CancelledNotificationParams,
+    ClientNotification, ClientRequest, RequestParams, TextContent
+)
+
+from .deadline import DeadlineExceeded, current_deadline, deadline_meta, in_phase, time_left
+from .metrics import PHASE_DURATION, TOOL_CALLS, TOOL_DURATION, track_phase
+from .tracing import start_span, trace_meta
+from .pool import get_server_parameters, get_session_pool, start_session_pool, stop_session_pool
+
+# ==================== CONFIGURACIÓN ====================
+
+TRANSPORT_STDIO = "stdio"
+TRANSPORT_INPROCESS = "inprocess"
+TRANSPORTS = (TRANSPORT_STDIO, TRANSPORT_INPROCESS)
+
+# Transporte de herramientas para la API REST (la CLI siempre usa MCP stdio)
+AGENT_TOOL_TRANSPORT = os.getenv("AGENT_TOOL_TRANSPORT", TRANSPORT_STDIO).lower()
+
+# ==================== TRANSPORTES ====================
+
+async def session_call_tool(session: ClientSession, tool_name: str, tool_args: Dict[str, Any]) -> CallToolResult:
+    """
+    `tools/call` con el contexto de traza y el tiempo que le queda a la
+    consulta en `_meta`, para que el servidor MCP continúe la misma traza y
+    corte la herramienta cuando vence el plazo. Se arma la petición a mano
+    porque `call_tool` no acepta `_meta` en todas las versiones del SDK.
+
+    Si la consulta se cancela antes de que venza el plazo (el cliente se
+    desconectó) se avisa al servidor con `notifications/cancelled` para que no
+    siga trabajando; si venció el plazo, el servidor ya corta por su cuenta.
+    """
+    meta = {**(trace_meta() or {}), **(deadline_meta() or {})}
+    # ID que el SDK asignará a la petición
+    request_id = getattr(session, "_request_id", None)
+    try:
+        if not meta:
+            return await session.call_tool(tool_name, tool_args)
+
+        request = ClientRequest(
+            CallToolRequest(
+                method="tools/call",
+                params=CallToolRequestParams(name=tool_name, arguments=tool_args, _meta=RequestParams.Meta(**meta))
+            )
+        )
+        return await session.send_request(request, CallToolResult)
+    except asyncio.CancelledError:
+        deadline = current_deadline()
+        if request_id is not None and not (deadline is not None and deadline.expired):
+            await notify_cancelled(session, request_id)
+        raise
+
+async def notify_cancelled(session: ClientSession, request_id: int):
+    """Avisa al servidor MCP de que ya nadie espera la respuesta (best-effort)"""
+    notification = ClientNotification(
+        CancelledNotification(
+            method="notifications/cancelled",
+            params=CancelledNotificationParams(requestId=request_id, reason="La consulta se canceló")
+        )
+    )
+    try:
+        await session.send_notification(notification)
+    except Exception:
+        pass
+
+async def call_tool_stdio(tool_name: str, tool_args: Dict[str, Any]) -> CallToolResult:
+    """Ejecuta la herramienta a través de una sesión MCP sobre stdio"""
+    # Usar una sesión pre-calentada del pool si la API lo inició
+    pool = get_session_pool()
+    if pool is not None:
+        async with pool.session() as session:
+            return await session_call_tool(session, tool_name, tool_args)
+
+    # Sin pool: lanzar el servidor MCP para esta consulta
+    started = time.perf_counter()
+    async with stdio_client(get_server_parameters()) as (read, write):
+        PHASE_DURATION.observe(time.perf_counter() - started, phase="mcp_spawn")
+        async with ClientSession(read, write) as session:
+            with track_phase("mcp_initialize"):
+                await session.initialize()
+            return await session_call_tool(session, tool_name, tool_args)
+
+async def call_tool_inprocess(tool_name: str, tool_args: Dict[str, Any]) -> CallToolResult:
+    """
+    Ejecuta la herramienta llamando directamente al servidor FastMCP en este proceso.
+
+    Usa la misma validación de argumentos que el servidor MCP y normaliza el
+    resultado igual que el manejador `tools/call`, de modo que el llamador
+    recibe el mismo `CallToolResult` que devolvería `session.call_tool`.
+    """
+    # Importación diferida: solo se carga el servidor si se usa este modo
+    from .server import mcp
+
+    try:
+        results = await mcp.call_tool(tool_name, tool_args)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        # FastMCP envuelve en ToolError lo que lanza la herramienta: un plazo
+        # vencido sigue siendo un plazo vencido, como en modo stdio
+        if isinstance(e.__cause__, DeadlineExceeded):
+            raise e.__cause__ from None
+        return CallToolResult(
+            content=[TextContent(type="text", text=str(e))],
+            isError=True
+        )
+
+    if isinstance(results, tuple) and len(results) == 2:
+        content, structured = results
+    elif isinstance(results, dict):
+        structured = results
+        content = [TextContent(type="text", text=json.dumps(results, indent=2))]
+    else:
+        content, structured = results, None
+
+    return CallToolResult(
+        content=list(content),
+        structuredContent=structured,
+        isError=False
+    )
+
+async def call_tool(
+    tool_name: str,
+    tool_args: Dict[str, Any],
+    transport: Optional[str] = None
+) -> CallToolResult:
+    """
+    Ejecuta una herramienta del servidor MCP con el transporte configurado.
+
+    Args:
+        tool_name: Nombre de la herramienta registrada con `@mcp.tool()`
+        tool_args: Argumentos de la herramienta
+        transport: "stdio" o "inprocess" (default: AGENT_TOOL_TRANSPORT)
+
+    Returns:
+        CallToolResult con el contenido de la herramienta
+
+    Raises:
+        DeadlineExceeded: Si el plazo de la consulta ya venció (no se llega a
+            lanzar ni pedir una sesión MCP)
+    """
+    time_left("mcp")
+    transport = (transport or AGENT_TOOL_TRANSPORT).lower()
+    if transport == TRANSPORT_INPROCESS:
+        call = call_tool_inprocess
+    elif transport == TRANSPORT_STDIO:
+        call = call_tool_stdio
+    else:
+        raise ValueError(f"Transporte de herramientas desconocido: {transport}")
+
+    outcome = "error"
+    try:
+        with TOOL_DURATION.time(tool=tool_name), start_span(f"tool {tool_name}", transport=transport) as span:
+            with in_phase("mcp_call"):
+                result = await call(tool_name, tool_args)
+            if result.isError:
+                span.status = "error"
+            else:
+                outcome = "success"
+        return result
+    finally:
+        TOOL_CALLS.inc(tool=tool_name, outcome=outcome)
+
+# ==================== CICLO DE VIDA ====================
+
+async def start_tool_transport():
+    """Prepara el transporte configurado (arranca el pool MCP en modo stdio)"""
+    if AGENT_TOOL_TRANSPORT not in TRANSPORTS:
+        raise ValueError(f"AGENT_TOOL_TRANSPORT inválido: {AGENT_TOOL_TRANSPORT}")
+    if AGENT_TOOL_TRANSPORT == TRANSPORT_STDIO:
+        await start_session_pool()
+
+async def stop_tool_transport():
+    """Libera los recursos del transporte configurado"""
+    await stop_session_pool()
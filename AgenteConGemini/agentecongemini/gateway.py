@@ -0,0 +1,168 @@
+"""
+Cliente HTTP compartido para el API Gateway.
+Un único pool de conexiones configurable para las llamadas de autenticación y
+de herramientas, con límites explícitos, keep-alive, timeouts, HTTP/2 opcional
+y métricas de uso del pool.
+"""
+import asyncio
+import os
+import sys
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+# ==================== CONFIGURACIÓN ====================
+
+API_GATEWAY_URL = os.getenv("API_GATEWAY_URL", "http://api-gateway:4000")
+
+GATEWAY_MAX_CONNECTIONS = int(os.getenv("GATEWAY_MAX_CONNECTIONS", "100"))
+GATEWAY_MAX_KEEPALIVE = int(os.getenv("GATEWAY_MAX_KEEPALIVE", "20"))
+GATEWAY_KEEPALIVE_EXPIRY = float(os.getenv("GATEWAY_KEEPALIVE_EXPIRY", "30"))
+GATEWAY_CONNECT_TIMEOUT = float(os.getenv("GATEWAY_CONNECT_TIMEOUT", "5"))
+GATEWAY_READ_TIMEOUT = float(os.getenv("GATEWAY_READ_TIMEOUT", "30"))
+GATEWAY_WRITE_TIMEOUT = float(os.getenv("GATEWAY_WRITE_TIMEOUT", "30"))
+GATEWAY_POOL_TIMEOUT = float(os.getenv("GATEWAY_POOL_TIMEOUT", "5"))
+GATEWAY_HTTP2 = os.getenv("GATEWAY_HTTP2", "false").lower() in ("1", "true", "yes")
+
+def _http2_available() -> bool:
+    """HTTP/2 requiere el paquete opcional `h2` (httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+# ==================== TRANSPORTE INSTRUMENTADO ====================
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Cuerpo de respuesta que avisa cuando se termina de leer o se cierra"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """
+    Transporte httpx que cuenta peticiones en curso y expone el estado del pool.
+    Una petición se considera en curso hasta que su respuesta se cierra.
+    """
+
+    def __init__(self, limits: httpx.Limits, **kwargs: Any):
+        super().__init__(limits=limits, **kwargs)
+        self.max_connections = limits.max_connections
+        self.max_keepalive_connections = limits.max_keepalive_connections
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests_total = 0
+        self.errors_total = 0
+
+    def _release(self):
+        self.in_flight -= 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests_total += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            self.errors_total += 1
+            self._release()
+            raise
+        response.stream = _TrackedStream(response.stream, self._release)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Uso actual del pool de conexiones"""
+        connections = self._pool.connections
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "connections_open": len(connections),
+            "connections_idle": idle,
+            "connections_active": len(connections) - idle,
+            "requests_in_flight": self.in_flight,
+            "requests_in_flight_peak": self.peak_in_flight,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "utilization": (self.in_flight / self.max_connections) if self.max_connections else 0.0,
+        }
+
+# ==================== FÁBRICA DE CLIENTES ====================
+
+def create_gateway_transport() -> InstrumentedTransport:
+    """Crea el transporte con los límites de pool y keep-alive configurados"""
+    http2 = GATEWAY_HTTP2 and _http2_available()
+    if GATEWAY_HTTP2 and not http2:
+        # stderr: en el servidor MCP stdout es el canal JSON-RPC
+        print("⚠️  GATEWAY_HTTP2 activo pero falta el paquete 'h2'; se usará HTTP/1.1", file=sys.stderr)
+
+    limits = httpx.Limits(
+        max_connections=GATEWAY_MAX_CONNECTIONS,
+        max_keepalive_connections=GATEWAY_MAX_KEEPALIVE,
+        keepalive_expiry=GATEWAY_KEEPALIVE_EXPIRY
+    )
+    return InstrumentedTransport(limits=limits, http2=http2)
+
+def create_gateway_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """
+    Crea un cliente HTTP configurado para el API Gateway.
+
+    Args:
+        transport: Transporte alternativo (default: create_gateway_transport())
+    """
+    timeout = httpx.Timeout(
+        connect=GATEWAY_CONNECT_TIMEOUT,
+        read=GATEWAY_READ_TIMEOUT,
+        write=GATEWAY_WRITE_TIMEOUT,
+        pool=GATEWAY_POOL_TIMEOUT
+    )
+    return httpx.AsyncClient(
+        timeout=timeout,
+        transport=transport or create_gateway_transport()
+    )
+
+# Cliente global, su transporte y el event loop al que pertenece
+_client: Optional[httpx.AsyncClient] = None
+_transport: Optional[httpx.AsyncBaseTransport] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def get_gateway_client() -> httpx.AsyncClient:
+    """Obtiene el cliente global del API Gateway (uno por event loop)"""
+    global _client, _transport, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _transport = create_gateway_transport()
+        _client = create_gateway_client(_transport)
+        _client_loop = loop
+    return _client
+
+async def close_gateway_client():
+    """Cierra el cliente global y sus conexiones abiertas"""
+    global _client, _transport, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _transport = None
+    _client_loop = None
+
+def get_gateway_pool_stats() -> Optional[Dict[str, Any]]:
+    """Métricas del pool del cliente global (None si aún no se creó)"""
+    if isinstance(_transport, InstrumentedTransport):
+        return _transport.stats()
+    return None
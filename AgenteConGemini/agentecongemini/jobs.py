@@ -0,0 +1,283 @@
+"""
+Trabajos asíncronos del agente.
+`POST /api/jobs` encola la consulta y responde con un ID al momento; un pool
+acotado de workers la procesa en segundo plano con el mismo pipeline que
+/api/chat. El progreso (los eventos de `stream_query`) y el resultado se
+consultan por ID o se siguen en streaming, y el trabajo se puede cancelar.
+
+Los trabajos terminados se guardan en un TTLCache (LRU, expiración y límite de
+memoria aproximado), así que los resultados que nadie recoge acaban
+desalojándose solos.
+"""
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from .cache import TTLCache
+from .client import execute_agent_query, stream_query
+from .deadline import run_with_deadline
+from .metrics import JOBS_TOTAL
+from .sessions import Session, get_session
+
+# ==================== CONFIGURACIÓN ====================
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "100"))
+# Tiempo máximo de ejecución de un trabajo
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "300"))
+# Segundos que se conserva un trabajo terminado
+JOB_TTL = float(os.getenv("JOB_TTL", "900"))
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "1000"))
+JOB_MAX_BYTES = int(os.getenv("JOB_MAX_BYTES", str(32 * 1024 * 1024)))
+# Eventos de progreso que se conservan por trabajo (los más recientes)
+JOB_MAX_EVENTS = int(os.getenv("JOB_MAX_EVENTS", "200"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# ==================== TRABAJO ====================
+
+class JobRejected(Exception):
+    """La cola de trabajos está llena"""
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Job:
+    """Una consulta en segundo plano, con su progreso y su resultado"""
+
+    def __init__(self, message: str, multi_step: bool, session: Session):
+        self.id = uuid.uuid4().hex
+        self.message = message
+        self.multi_step = multi_step
+        # Una sesión nueva no está guardada hasta su primer turno: el worker usa este objeto
+        self.session: Optional[Session] = session
+        self.session_id = session.id
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.response: Optional[str] = None
+        self.success: Optional[bool] = None
+        self.error: Optional[str] = None
+        # Eventos de progreso numerados (seq) para que los lectores retomen donde iban
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=JOB_MAX_EVENTS)
+        self.seq = 0
+        self.task: Optional["asyncio.Task[None]"] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def emit(self, event: Dict[str, Any]):
+        """Añade un evento de progreso y despierta a quien siga el trabajo"""
+        self.seq += 1
+        self.events.append({**event, "seq": self.seq})
+        self._notify()
+
+    def finish(self, status: str, response: Optional[str] = None, success: bool = False, error: Optional[str] = None):
+        self.status = status
+        self.finished_at = time.time()
+        self.response = response
+        self.success = success
+        self.error = error
+        JOBS_TOTAL.inc(status=status)
+        self.emit({"event": "job", **self.summary()})
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def follow(self, after: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Eventos de progreso con `seq` mayor que `after`, hasta que el trabajo
+        termina. El último es siempre el evento `job` con el estado final.
+        """
+        while True:
+            changed = self._changed
+            for event in list(self.events):
+                if event["seq"] > after:
+                    after = event["seq"]
+                    yield event
+            if self.finished:
+                return
+            await changed.wait()
+
+    def summary(self) -> Dict[str, Any]:
+        """Estado del trabajo sin los eventos"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "session_id": self.session_id,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "response": self.response,
+            "success": self.success,
+            "error": self.error,
+        }
+
+    def size(self) -> int:
+        """Tamaño aproximado en bytes (para el límite de memoria del almacén)"""
+        texts = [self.message, self.response or "", self.error or ""]
+        texts.extend(str(event.get("text") or event.get("response") or "") for event in self.events)
+        return sum(len(text.encode()) for text in texts) + 512
+
+# ==================== COLA Y WORKERS ====================
+
+class JobManager:
+    """
+    Cola acotada de trabajos atendida por `workers` tareas en segundo plano.
+    Los trabajos en cola o en curso se guardan aparte de los terminados para
+    que el límite del almacén nunca desaloje uno vivo.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queue: int = JOB_MAX_QUEUE):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.active: Dict[str, Job] = {}
+        self.finished = TTLCache("jobs", ttl=JOB_TTL, max_entries=JOB_MAX_FINISHED, max_bytes=JOB_MAX_BYTES)
+        self._queue: Optional["asyncio.Queue[Job]"] = None
+        self._workers: List["asyncio.Task[None]"] = []
+        self.submitted = 0
+        self.rejected = 0
+        self._avg_run_time = 5.0
+
+    def start(self):
+        """Arranca los workers (en el lifespan de la API)"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancela los trabajos pendientes y detiene los workers"""
+        for job in list(self.active.values()):
+            self.cancel(job.id)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for job in self.active.values() if job.status == QUEUED)
+
+    def submit(self, message: str, multi_step: bool = False, session_id: Optional[str] = None) -> Job:
+        """
+        Encola una consulta y devuelve el trabajo sin esperar a que se procese.
+
+        Raises:
+            JobRejected: Si ya hay JOB_MAX_QUEUE trabajos esperando
+            RuntimeError: Si los workers no están arrancados
+        """
+        if self._queue is None:
+            raise RuntimeError("El pool de trabajos no está iniciado")
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            retry_after = max(1, round(self._avg_run_time * (self.queued + 1) / self.workers))
+            raise JobRejected("La cola de trabajos está llena, intenta de nuevo más tarde", retry_after)
+
+        # La sesión se resuelve ya para devolver su ID con el trabajo
+        job = Job(message, multi_step, get_session(session_id))
+        self.active[job.id] = job
+        self.submitted += 1
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.active.get(job_id) or self.finished.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancela un trabajo en cola (no llega a ejecutarse) o en curso (se
+        interrumpe la llamada al LLM o a la herramienta). Un trabajo ya
+        terminado se devuelve sin cambios.
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job.task is None:
+            self._finish(job, CANCELLED, error="Cancelado antes de empezar")
+        else:
+            job.task.cancel()
+            self._finish(job, CANCELLED, error="Cancelado por el usuario")
+        return job
+
+    def _finish(self, job: Job, status: str, **outcome: Any):
+        job.finish(status, **outcome)
+        job.session = None
+        self.active.pop(job.id, None)
+        self.finished.set(job.id, job, size=job.size())
+
+    async def _worker(self):
+        assert self._queue is not None
+        while True:
+            job = await self._queue.get()
+            if job.finished:  # cancelado mientras esperaba
+                continue
+            job.status = RUNNING
+            job.started_at = time.time()
+            job.emit({"event": "running"})
+            job.task = asyncio.create_task(self._run(job))
+            # `wait` no propaga la cancelación del trabajo al worker
+            await asyncio.wait({job.task})
+            self._avg_run_time = 0.9 * self._avg_run_time + 0.1 * (time.time() - job.started_at)
+
+    async def _run(self, job: Job):
+        try:
+            # Con plazo: las fases internas (Gemini, MCP, gateway) no lo sobrepasan
+            response, success, error = await run_with_deadline(JOB_TIMEOUT, lambda: self._execute(job))
+        except asyncio.TimeoutError:
+            self._finish(job, FAILED, error=f"El trabajo superó {JOB_TIMEOUT}s")
+        except Exception as e:
+            self._finish(job, FAILED, error=f"Error procesando consulta: {str(e)}")
+        else:
+            if error is not None:
+                self._finish(job, FAILED, error=error)
+            else:
+                self._finish(job, SUCCEEDED, response=response, success=success)
+
+    async def _execute(self, job: Job):
+        """Ejecuta la consulta emitiendo su progreso; devuelve (respuesta, éxito, error)"""
+        session = job.session
+        assert session is not None
+        if job.multi_step:
+            response = await execute_agent_query(job.message, session)
+            return response or "Operación completada exitosamente", True, None
+
+        async for event in stream_query(job.message, session):
+            if event["event"] == "done":
+                return event["response"], event["success"], None
+            if event["event"] == "error":
+                return None, False, event["error"]
+            job.emit(event)
+        return None, False, "La consulta terminó sin respuesta"
+
+    def stats(self) -> Dict[str, Any]:
+        """Ocupación de la cola y los workers"""
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self.queued,
+            "running": sum(1 for job in self.active.values() if job.status == RUNNING),
+            "finished_stored": len(self.finished),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "avg_run_seconds": self._avg_run_time,
+        }
+
+
+jobs = JobManager()
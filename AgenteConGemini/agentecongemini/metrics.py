@@ -0,0 +1,255 @@
+"""
+Métricas del agente en formato de texto de Prometheus.
+Implementación mínima sin dependencias (contadores, gauges e histogramas con
+etiquetas) que se expone en `GET /metrics` de la API.
+
+Las métricas son por proceso: en modo stdio, lo que ocurre dentro de los
+subprocesos del servidor MCP (peticiones HTTP de las herramientas) no aparece
+aquí; sí aparece la duración de cada llamada de herramienta vista desde la API.
+"""
+import math
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Buckets de latencia en segundos (de llamadas locales a llamadas al LLM)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+# Métricas y colectores registrados en este proceso
+_registry: List["_Metric"] = []
+_collectors: List[Callable[[], Iterator[str]]] = []
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+        yield from self._samples()
+
+    @abstractmethod
+    def _samples(self) -> Iterator[str]:
+        """Líneas de muestra en formato de exposición de Prometheus"""
+
+
+class Counter(_Metric):
+    """Contador monotónico"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja (p. ej. peticiones en curso)"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels: str) -> Iterator[None]:
+        """Incrementa el gauge mientras dura el bloque"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Histograma acumulativo con buckets fijos"""
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * len(self.buckets)
+            self._sums[key] = 0.0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observa la duración del bloque en segundos"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> Iterator[str]:
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(self._sums[key])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def gauge_lines(name: str, documentation: str, samples: Sequence[Tuple[Dict[str, str], float]]) -> Iterator[str]:
+    """Líneas de un gauge calculado al exportar, a partir de (etiquetas, valor)"""
+    yield f"# HELP {name} {documentation}"
+    yield f"# TYPE {name} gauge"
+    for labels, value in samples:
+        yield f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}"
+
+def register_collector(collector: Callable[[], Iterator[str]]):
+    """
+    Registra una función que genera líneas de métricas al exportar
+    (para valores que ya se calculan en otro sitio, como el estado de los pools).
+    """
+    _collectors.append(collector)
+
+def render_metrics() -> str:
+    """Todas las métricas del proceso en formato de texto de Prometheus"""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+# ==================== MÉTRICAS DEL AGENTE ====================
+
+REQUESTS_TOTAL = Counter(
+    "agent_http_requests_total",
+    "Peticiones HTTP atendidas por la API",
+    ("endpoint", "status")
+)
+REQUEST_DURATION = Histogram(
+    "agent_http_request_duration_seconds",
+    "Duración de las peticiones HTTP de la API (hasta enviar la cabecera de respuesta)",
+    ("endpoint",)
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "agent_http_requests_in_flight",
+    "Peticiones HTTP en curso",
+    ("endpoint",)
+)
+MESSAGES_TOTAL = Counter(
+    "agent_chat_messages_total",
+    "Mensajes de /api/chat por resultado (success, error) y tipo de error",
+    ("outcome", "error_type")
+)
+JOBS_TOTAL = Counter(
+    "agent_jobs_total",
+    "Trabajos asíncronos terminados por estado (succeeded, failed, cancelled)",
+    ("status",)
+)
+CANCELLATIONS_TOTAL = Counter(
+    "agent_cancellations_total",
+    "Consultas cortadas por plazo vencido o cliente desconectado, por la fase que interrumpieron",
+    ("reason", "phase")
+)
+PHASE_DURATION = Histogram(
+    "agent_phase_duration_seconds",
+    "Duración de cada fase de una consulta (gemini, mcp_spawn, mcp_initialize, token_login, gateway_http...)",
+    ("phase",)
+)
+PHASE_ERRORS = Counter(
+    "agent_phase_errors_total",
+    "Errores por fase y tipo de excepción",
+    ("phase", "type")
+)
+TOOL_DURATION = Histogram(
+    "agent_tool_duration_seconds",
+    "Duración de las llamadas de herramientas MCP",
+    ("tool",)
+)
+TOOL_CALLS = Counter(
+    "agent_tool_calls_total",
+    "Llamadas de herramientas MCP por resultado (success, error)",
+    ("tool", "outcome")
+)
+
+@contextmanager
+def track_phase(phase: str) -> Iterator[None]:
+    """
+    Mide la duración de una fase y cuenta sus errores por tipo de excepción.
+    También anota la fase en el plazo de la consulta, para saber qué trabajo
+    se interrumpe si se cancela.
+    """
+    # Importación diferida: deadline.py importa este módulo
+    from .deadline import in_phase
+    started = time.perf_counter()
+    try:
+        with in_phase(phase):
+            yield
+    except Exception as e:
+        PHASE_ERRORS.inc(phase=phase, type=type(e).__name__)
+        raise
+    finally:
+        PHASE_DURATION.observe(time.perf_counter() - started, phase=phase)
@@ -0,0 +1,162 @@
+"""
+Índice local de nombres de proyectos y tareas.
+Permite que las herramientas reciban un nombre ("proyecto Web", "tarea diseño
+del login") donde esperan un ID de Mongo: el nombre se resuelve en memoria,
+sin otra vuelta al LLM ni un listado completo por consulta.
+
+El índice se llena con los listados que ya hace el servidor MCP, se actualiza
+con cada creación, edición o borrado, y la comparación ignora mayúsculas,
+acentos y puntuación, con coincidencia aproximada como último recurso.
+"""
+import difflib
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .cache import normalize_query
+
+# Segundos mínimos entre recargas de un listado por un nombre desconocido
+NAME_INDEX_REFRESH_INTERVAL = float(os.getenv("NAME_INDEX_REFRESH_INTERVAL", "10"))
+# Similitud mínima (0-1) para aceptar una coincidencia aproximada
+NAME_INDEX_SIMILARITY = float(os.getenv("NAME_INDEX_SIMILARITY", "0.8"))
+
+OBJECT_ID = re.compile(r"[0-9a-f]{24}")
+
+def is_object_id(value: str) -> bool:
+    return OBJECT_ID.fullmatch(value) is not None
+
+
+class AmbiguousNameError(ValueError):
+    """El nombre coincide con varias entidades distintas"""
+
+    def __init__(self, kind: str, name: str, matches: List[Tuple[str, str]]):
+        options = ", ".join(f"'{label}' ({entity_id})" for entity_id, label in matches[:5])
+        super().__init__(f"El nombre '{name}' coincide con varios {kind}: {options}. Indica el ID o un nombre más preciso")
+
+
+class _Scope:
+    """Nombres de un listado (todos los proyectos, o las tareas de un proyecto)"""
+    __slots__ = ("names", "loaded_at")
+
+    def __init__(self):
+        # ID → (nombre original, nombre normalizado)
+        self.names: Dict[str, Tuple[str, str]] = {}
+        # Momento de la última carga completa (0 = nunca)
+        self.loaded_at = 0.0
+
+    def put(self, entity_id: str, name: str):
+        self.names[entity_id] = (name, normalize_query(name))
+
+    def replace(self, entities: Iterable[Any]):
+        self.names = {}
+        for entity in entities:
+            self.put(entity.id, entity.name)
+        self.loaded_at = time.monotonic()
+
+    def stale(self) -> bool:
+        return time.monotonic() - self.loaded_at >= NAME_INDEX_REFRESH_INTERVAL
+
+    def match(self, name: str, exact: bool = False) -> List[Tuple[str, str]]:
+        """
+        Entidades que coinciden con el nombre, de la regla más estricta a la más laxa:
+        igual tras normalizar, contiene todas las palabras, o parecido.
+        Con `exact` solo se acepta la primera regla.
+        """
+        wanted = normalize_query(name)
+        normalized = [(entity_id, label, key) for entity_id, (label, key) in self.names.items()]
+
+        equal = [(entity_id, label) for entity_id, label, key in normalized if key == wanted]
+        if equal or exact:
+            return equal
+
+        words = wanted.split()
+        containing = [
+            (entity_id, label) for entity_id, label, key in normalized
+            if words and all(word in key.split() for word in words)
+        ]
+        if containing:
+            return containing
+
+        close = difflib.get_close_matches(wanted, [key for _, _, key in normalized], n=5, cutoff=NAME_INDEX_SIMILARITY)
+        return [(entity_id, label) for entity_id, label, key in normalized if key in close]
+
+
+class NameIndex:
+    """Índice nombre → ID de proyectos y de las tareas de cada proyecto"""
+
+    def __init__(self):
+        self.projects = _Scope()
+        self.tasks: Dict[str, _Scope] = {}
+        self.resolved = 0
+        self.refreshes = 0
+
+    # ---------- Carga y mantenimiento ----------
+
+    def set_projects(self, projects: Iterable[Any]):
+        """Reemplaza los proyectos con un listado completo"""
+        self.projects.replace(projects)
+        # Las tareas de proyectos que ya no existen sobran
+        for project_id in [p for p in self.tasks if p not in self.projects.names]:
+            del self.tasks[project_id]
+
+    def set_tasks(self, project_id: str, tasks: Iterable[Any]):
+        """Reemplaza las tareas de un proyecto con un listado completo"""
+        self.tasks.setdefault(project_id, _Scope()).replace(tasks)
+
+    def put_project(self, project: Any):
+        self.projects.put(project.id, project.name)
+
+    def put_task(self, task: Any):
+        self.tasks.setdefault(task.projectId, _Scope()).put(task.id, task.name)
+
+    def remove_project(self, project_id: str):
+        self.projects.names.pop(project_id, None)
+        self.tasks.pop(project_id, None)
+
+    def remove_task(self, project_id: str, task_id: str):
+        scope = self.tasks.get(project_id)
+        if scope is not None:
+            scope.names.pop(task_id, None)
+
+    # ---------- Resolución ----------
+
+    def lookup_project(self, name: str, exact: bool = False) -> Optional[str]:
+        return self._lookup(self.projects, "proyectos", name, exact)
+
+    def lookup_task(self, project_id: str, name: str, exact: bool = False) -> Optional[str]:
+        scope = self.tasks.get(project_id)
+        return self._lookup(scope, "tareas", name, exact) if scope is not None else None
+
+    def projects_stale(self) -> bool:
+        return self.projects.stale()
+
+    def tasks_stale(self, project_id: str) -> bool:
+        scope = self.tasks.get(project_id)
+        return scope is None or scope.stale()
+
+    def _lookup(self, scope: _Scope, kind: str, name: str, exact: bool) -> Optional[str]:
+        """
+        ID de la entidad con ese nombre, o None si no hay ninguna.
+
+        Raises:
+            AmbiguousNameError: Si el nombre coincide con varias entidades
+        """
+        matches = scope.match(name, exact)
+        if len(matches) > 1:
+            raise AmbiguousNameError(kind, name, matches)
+        if not matches:
+            return None
+        self.resolved += 1
+        return matches[0][0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "projects": len(self.projects.names),
+            "projects_with_tasks": len(self.tasks),
+            "tasks": sum(len(scope.names) for scope in self.tasks.values()),
+            "resolved": self.resolved,
+            "refreshes": self.refreshes,
+        }
+
+name_index = NameIndex()
@@ -0,0 +1,259 @@
+"""
+Pool de sesiones MCP persistentes.
+Mantiene procesos `agentecongemini.server` pre-calentados para que la API REST
+no lance un intérprete nuevo ni repita `session.initialize()` en cada consulta.
+"""
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from mcp.client.session import ClientSession
+from mcp.client.stdio import StdioServerParameters, stdio_client
+from mcp.shared.exceptions import McpError
+
+from .deadline import time_left
+from .metrics import PHASE_DURATION, track_phase
+
+# ==================== CONFIGURACIÓN ====================
+
+# Número de subprocesos del servidor MCP (0 desactiva el pool)
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+# Tiempo máximo esperando una sesión libre
+MCP_POOL_ACQUIRE_TIMEOUT = float(os.getenv("MCP_POOL_ACQUIRE_TIMEOUT", "30"))
+# Cada cuánto se hace ping a las sesiones para detectar procesos caídos
+MCP_POOL_HEALTHCHECK_INTERVAL = float(os.getenv("MCP_POOL_HEALTHCHECK_INTERVAL", "30"))
+# Tiempo máximo esperando a que el pool arranque al iniciar la API
+MCP_POOL_STARTUP_TIMEOUT = float(os.getenv("MCP_POOL_STARTUP_TIMEOUT", "20"))
+
+PING_TIMEOUT = 5.0
+MAX_RESTART_BACKOFF = 30.0
+
+
+def get_server_parameters() -> StdioServerParameters:
+    """
+    Parámetros para lanzar el servidor MCP como subproceso.
+    Se pasa el entorno completo: sin él, el SDK solo hereda unas pocas variables
+    (PATH, HOME...) y el servidor ignoraría API_GATEWAY_URL y el resto de la configuración.
+    """
+    return StdioServerParameters(
+        command=sys.executable,
+        args=["-m", "agentecongemini.server"],
+        env=dict(os.environ)
+    )
+
+# ==================== POOL ====================
+
+class _PooledSession:
+    """Sesión MCP viva junto con su estado dentro del pool"""
+
+    def __init__(self, index: int, session: ClientSession):
+        self.index = index
+        self.session = session
+        self.alive = True
+        self.broken = asyncio.Event()
+
+    def mark_broken(self):
+        """Marca la sesión como inservible para que su worker la reinicie"""
+        self.alive = False
+        self.broken.set()
+
+
+class MCPSessionPool:
+    """
+    Pool de sesiones `ClientSession` conectadas a subprocesos del servidor MCP.
+
+    Cada sesión vive dentro de su propia tarea (worker), que abre el transporte
+    stdio, inicializa la sesión, la publica en la cola de disponibles y la
+    supervisa con pings periódicos. Si el proceso hijo muere o la sesión falla,
+    el worker la descarta y lanza un proceso nuevo con backoff exponencial.
+    """
+
+    def __init__(
+        self,
+        size: int = MCP_POOL_SIZE,
+        acquire_timeout: float = MCP_POOL_ACQUIRE_TIMEOUT,
+        healthcheck_interval: float = MCP_POOL_HEALTHCHECK_INTERVAL
+    ):
+        self.size = max(1, size)
+        self.acquire_timeout = acquire_timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._available: asyncio.Queue[_PooledSession] = asyncio.Queue()
+        self._sessions: Set[_PooledSession] = set()
+        self._workers: List[asyncio.Task] = []
+        self._ready: List[asyncio.Event] = []
+        self._closing = False
+        self._in_use = 0
+        self.restarts = 0
+        self.checkouts = 0
+
+    async def start(self, startup_timeout: float = MCP_POOL_STARTUP_TIMEOUT):
+        """Lanza los workers y espera (con límite) a que las sesiones estén listas"""
+        for index in range(self.size):
+            self._ready.append(asyncio.Event())
+            self._workers.append(
+                asyncio.create_task(self._run_worker(index), name=f"mcp-pool-{index}")
+            )
+
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(event.wait() for event in self._ready)),
+                timeout=startup_timeout
+            )
+        except asyncio.TimeoutError:
+            ready = sum(1 for event in self._ready if event.is_set())
+            print(f"⚠️  Pool MCP iniciado parcialmente: {ready}/{self.size} sesiones listas")
+
+    async def close(self, timeout: float = 5.0):
+        """Cierra todas las sesiones y termina los subprocesos"""
+        self._closing = True
+        for pooled in list(self._sessions):
+            pooled.mark_broken()
+
+        if not self._workers:
+            return
+
+        done, pending = await asyncio.wait(self._workers, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[ClientSession]:
+        """
+        Toma prestada una sesión del pool y la devuelve al terminar.
+
+        Si durante el uso se produce un error de transporte, la sesión se
+        descarta y su worker arranca un proceso nuevo. Los errores de protocolo
+        MCP (McpError) no invalidan la sesión.
+        """
+        with track_phase("mcp_acquire"):
+            pooled = await self._checkout()
+        self._in_use += 1
+        try:
+            yield pooled.session
+        except McpError:
+            self._checkin(pooled)
+            raise
+        except Exception:
+            pooled.mark_broken()
+            raise
+        except BaseException:
+            # Cancelaciones: la sesión sigue siendo válida
+            self._checkin(pooled)
+            raise
+        else:
+            self._checkin(pooled)
+        finally:
+            self._in_use -= 1
+
+    def stats(self) -> Dict[str, int]:
+        """Estado actual del pool"""
+        alive = sum(1 for pooled in self._sessions if pooled.alive)
+        return {
+            "size": self.size,
+            "alive": alive,
+            "in_use": self._in_use,
+            "available": max(0, alive - self._in_use),
+            "checkouts": self.checkouts,
+            "restarts": self.restarts,
+        }
+
+    async def _checkout(self) -> _PooledSession:
+        if self._closing:
+            raise RuntimeError("El pool de sesiones MCP está cerrado")
+
+        # La espera tampoco pasa del plazo de la consulta
+        timeout = time_left("mcp_acquire", self.acquire_timeout)
+        try:
+            async with asyncio.timeout(timeout):
+                while True:
+                    pooled = await self._available.get()
+                    # Las sesiones caídas mientras esperaban en la cola se ignoran
+                    if pooled.alive:
+                        self.checkouts += 1
+                        return pooled
+        except TimeoutError:
+            # Si lo que se agotó fue el plazo, se informa como tal
+            time_left("mcp_acquire")
+            raise TimeoutError(
+                f"No hay sesiones MCP disponibles tras {self.acquire_timeout}s"
+            ) from None
+
+    def _checkin(self, pooled: _PooledSession):
+        if pooled.alive and not self._closing:
+            self._available.put_nowait(pooled)
+
+    async def _run_worker(self, index: int):
+        """Mantiene viva una sesión MCP, reiniciando el subproceso si cae"""
+        backoff = 1.0
+        while not self._closing:
+            try:
+                started = time.perf_counter()
+                async with stdio_client(get_server_parameters()) as (read, write):
+                    PHASE_DURATION.observe(time.perf_counter() - started, phase="mcp_spawn")
+                    async with ClientSession(read, write) as session:
+                        with track_phase("mcp_initialize"):
+                            await session.initialize()
+                        pooled = _PooledSession(index, session)
+                        self._sessions.add(pooled)
+                        self._available.put_nowait(pooled)
+                        self._ready[index].set()
+                        backoff = 1.0
+                        try:
+                            await self._supervise(pooled)
+                        finally:
+                            pooled.alive = False
+                            self._sessions.discard(pooled)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Sesión MCP #{index} caída: {type(e).__name__}: {e}")
+
+            if self._closing:
+                break
+
+            self.restarts += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_RESTART_BACKOFF)
+
+    async def _supervise(self, pooled: _PooledSession):
+        """Espera hasta que la sesión se marque como rota o deje de responder al ping"""
+        while not self._closing:
+            try:
+                await asyncio.wait_for(pooled.broken.wait(), timeout=self.healthcheck_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await asyncio.wait_for(pooled.session.send_ping(), timeout=PING_TIMEOUT)
+            except Exception:
+                pooled.mark_broken()
+                return
+
+# ==================== INSTANCIA GLOBAL ====================
+
+_pool_instance: Optional[MCPSessionPool] = None
+
+def get_session_pool() -> Optional[MCPSessionPool]:
+    """Obtiene el pool global si está iniciado (None si no hay pool)"""
+    return _pool_instance
+
+async def start_session_pool() -> Optional[MCPSessionPool]:
+    """Inicia el pool global según MCP_POOL_SIZE"""
+    global _pool_instance
+    if _pool_instance is None and MCP_POOL_SIZE > 0:
+        _pool_instance = MCPSessionPool()
+        await _pool_instance.start()
+    return _pool_instance
+
+async def stop_session_pool():
+    """Detiene el pool global"""
+    global _pool_instance
+    if _pool_instance is not None:
+        await _pool_instance.close()
+        _pool_instance = None
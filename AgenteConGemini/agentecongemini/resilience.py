@@ -0,0 +1,255 @@
+"""
+Capa de resiliencia para las llamadas a servicios externos (API Gateway y Gemini).
+- Reintentos con backoff exponencial y jitter para las llamadas idempotentes.
+- Timeout por llamada, y ningún intento empieza si el plazo de la consulta
+  ya venció (deadline.py).
+- Circuit breakers por servicio: tras varios fallos seguidos se rechazan las
+  llamadas de inmediato durante un tiempo, en lugar de esperar a que expiren.
+
+Cada proceso tiene sus propios breakers (la API y cada subproceso MCP).
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+
+from .deadline import time_left
+from .metrics import track_phase
+from .tracing import start_span
+
+T = TypeVar("T")
+
+# ==================== CONFIGURACIÓN ====================
+
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.2"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "2"))
+
+GATEWAY_RETRY_ATTEMPTS = int(os.getenv("GATEWAY_RETRY_ATTEMPTS", "3"))
+GEMINI_RETRY_ATTEMPTS = int(os.getenv("GEMINI_RETRY_ATTEMPTS", "2"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+# Respuestas del gateway que indican un problema transitorio
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# ==================== CIRCUIT BREAKER ====================
+
+# Breakers creados en este proceso, por nombre (para /api/stats)
+_registry: Dict[str, "CircuitBreaker"] = {}
+
+def get_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """Estado de todos los circuit breakers de este proceso"""
+    return {name: breaker.stats() for name, breaker in _registry.items()}
+
+
+class CircuitOpenError(Exception):
+    """El servicio está degradado y el circuito rechaza la llamada sin intentarla"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            f"El servicio '{name}' no está disponible temporalmente; "
+            f"reintenta en {max(1, round(retry_after))}s"
+        )
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker con tres estados:
+    - closed: las llamadas pasan; `failure_threshold` fallos seguidos lo abren
+    - open: las llamadas fallan con CircuitOpenError durante `reset_timeout` segundos
+    - half_open: pasa una sola llamada de prueba; si funciona se cierra, si no se reabre
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        _registry[name] = self
+
+    def before_call(self):
+        """
+        Comprueba si la llamada puede intentarse.
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto
+        """
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.reset_timeout - elapsed)
+            self.state = self.HALF_OPEN
+
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.reset_timeout)
+            self._trial_in_flight = True
+
+    def record_success(self):
+        self._trial_in_flight = False
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self._trial_in_flight = False
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+                # stderr: en el servidor MCP stdout es el canal JSON-RPC
+                print(f"⚠️  Circuito '{self.name}' abierto tras {self.consecutive_failures} fallos", file=sys.stderr)
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def record_ignored(self):
+        """La llamada terminó sin indicar nada sobre la salud del servicio (p. ej. cancelada)"""
+        self._trial_in_flight = False
+
+    @asynccontextmanager
+    async def guard(self, is_failure: Callable[[BaseException], bool]) -> AsyncIterator[None]:
+        """
+        Protege un bloque con el breaker. Las excepciones para las que
+        `is_failure` es True cuentan como fallo del servicio; el resto (por
+        ejemplo un 404) cuenta como respuesta correcta del servicio.
+        """
+        self.before_call()
+        try:
+            yield
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            self.record_ignored()
+            raise
+        else:
+            self.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado y contadores del breaker"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
+
+# ==================== REINTENTOS ====================
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, maximum: float = RETRY_MAX_DELAY) -> float:
+    """Espera antes del reintento `attempt` (1, 2, ...): backoff exponencial con jitter completo"""
+    return random.uniform(0, min(maximum, base * 2 ** (attempt - 1)))
+
+async def call_with_retry(
+    fn: Callable[[], Awaitable[T]],
+    *,
+    breaker: CircuitBreaker,
+    attempts: int = 1,
+    timeout: Optional[float] = None,
+    retryable: Callable[[BaseException], bool],
+    is_failure: Optional[Callable[[BaseException], bool]] = None,
+    phase: str = "call"
+) -> T:
+    """
+    Ejecuta `fn` a través del breaker, con timeout por intento y reintentos.
+
+    Args:
+        fn: Crea y ejecuta la llamada (se invoca de nuevo en cada intento)
+        breaker: Circuit breaker del servicio
+        attempts: Intentos totales (1 = sin reintentos)
+        timeout: Segundos máximos por intento (None = sin límite propio)
+        retryable: Indica si una excepción permite reintentar
+        is_failure: Indica si una excepción cuenta como fallo del servicio
+            (default: las mismas que `retryable`)
+        phase: Fase para el contador de cancelaciones si el plazo vence
+
+    Raises:
+        CircuitOpenError: Si el circuito está abierto
+        DeadlineExceeded: Si el plazo de la consulta vence antes de un intento
+        La última excepción de `fn` si se agotan los intentos
+    """
+    is_failure = is_failure or retryable
+    attempts = max(1, attempts)
+    for attempt in range(1, attempts + 1):
+        # Fuera del breaker: un plazo vencido no es un fallo del servicio.
+        # Si vence durante el intento, la cancelación llega desde deadline_scope
+        time_left(phase)
+        try:
+            async with breaker.guard(is_failure):
+                if timeout:
+                    return await asyncio.wait_for(fn(), timeout=timeout)
+                return await fn()
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            if attempt >= attempts or not retryable(e):
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+    raise AssertionError("unreachable")
+
+# ==================== CLASIFICACIÓN DE ERRORES ====================
+
+def is_gateway_failure(exc: BaseException) -> bool:
+    """Errores que indican que el gateway está caído o degradado"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    return isinstance(exc, (httpx.TransportError, asyncio.TimeoutError))
+
+def is_unsent_request_error(exc: BaseException) -> bool:
+    """Errores en los que la petición seguro que no llegó al gateway"""
+    return isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+def is_gemini_failure(exc: BaseException) -> bool:
+    """Errores transitorios de Gemini: timeouts, red, cuota (429) y errores 5xx"""
+    if isinstance(exc, (asyncio.TimeoutError, httpx.TransportError, ConnectionError)):
+        return True
+    status = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return isinstance(status, int) and status in RETRYABLE_STATUS
+
+# Breakers de los servicios externos
+gateway_breaker = CircuitBreaker("gateway")
+gemini_breaker = CircuitBreaker("gemini")
+
+async def call_gemini(fn: Callable[[], Awaitable[T]], timeout: float = GEMINI_TIMEOUT) -> T:
+    """Llamada a Gemini con timeout, reintentos y circuit breaker"""
+    with track_phase("gemini"), start_span("gemini"):
+        return await call_with_retry(
+            fn,
+            breaker=gemini_breaker,
+            attempts=GEMINI_RETRY_ATTEMPTS,
+            timeout=timeout,
+            retryable=is_gemini_failure,
+            phase="gemini"
+        )
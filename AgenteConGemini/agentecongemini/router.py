@@ -0,0 +1,273 @@
+"""
+Router determinista de intenciones.
+Reconoce comandos simples con reglas locales (expresiones regulares sobre la
+consulta normalizada) y los asigna directamente a una herramienta, sin llamar
+a Gemini. Si ninguna regla coincide con seguridad, la consulta sigue al LLM.
+
+Las lecturas aceptan IDs que lo parezcan (ObjectId de Mongo o palabras con
+dígitos); un nombre libre como "proyecto web" se deja al LLM. Las reglas que
+modifican datos (borrar, cambiar estado) solo aceptan ObjectIds: un nombre
+como "web-2024" o "tarea 3" también va al LLM.
+"""
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+
+from .cache import normalize_query
+
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# ==================== GRAMÁTICA ====================
+
+def _id(name: str) -> str:
+    return rf"(?P<{name}>[0-9a-f]{{24}}|[\w-]*\d[\w-]*)"
+
+def _object_id(name: str) -> str:
+    return rf"(?P<{name}>[0-9a-f]{{24}})"
+
+PROJECT_ID = _id("project_id")
+TASK_ID = _id("task_id")
+OF_PROJECT = rf"\s+del?\s+proyecto\s+{PROJECT_ID}"
+OF_TASK = rf"\s+de\s+la\s+tarea\s+{TASK_ID}"
+
+# Solo ObjectIds en las reglas que modifican datos
+STRICT_PROJECT_ID = _object_id("project_id")
+STRICT_TASK_ID = _object_id("task_id")
+STRICT_NOTE_ID = _object_id("note_id")
+OF_STRICT_PROJECT = rf"\s+del?\s+proyecto\s+{STRICT_PROJECT_ID}"
+OF_STRICT_TASK = rf"\s+de\s+la\s+tarea\s+{STRICT_TASK_ID}"
+
+# Verbos de consulta y artículos opcionales al inicio
+VIEW = (
+    r"(?:(?:lista(?:r|me)?|muestra(?:me)?|mostrar|ver|dame|ensename|obten(?:er)?"
+    r"|trae(?:me)?|consulta(?:r)?|cuales\s+son|que)\s+)?"
+    r"(?:(?:todos|todas)\s+)?(?:(?:los|las|mis|el|la)\s+)?"
+)
+DELETE = r"(?:elimina(?:r)?|borra(?:r)?|quita(?:r)?)\s+(?:(?:el|la)\s+)?"
+SET_STATUS = r"(?:(?:cambia|actualiza|pon|mueve|establece)(?:r)?\s+)?(?:el\s+)?estado\s+de\s+la\s+tarea\s+"
+MARK = r"(?:marca|pon|mueve|pasa)(?:r)?\s+(?:la\s+)?tarea\s+"
+TO = r"\s+(?:a|en|como)\s+"
+
+STATUS = (
+    r"(?P<status>pendiente|pending|en\s+espera|on\s*hold|en\s+pausa|en\s+progreso|en\s+curso"
+    r"|in\s*progress|en\s+revision|under\s*review|completada|completado|terminada|terminado"
+    r"|finalizada|finalizado|hecha|hecho|completed)"
+)
+
+STATUS_ALIASES = {
+    "pendiente": "pending",
+    "pending": "pending",
+    "enespera": "onHold",
+    "onhold": "onHold",
+    "enpausa": "onHold",
+    "enprogreso": "inProgress",
+    "encurso": "inProgress",
+    "inprogress": "inProgress",
+    "enrevision": "underReview",
+    "underreview": "underReview",
+}
+
+def _status(value: str) -> str:
+    key = re.sub(r"\s+", "", value.lower())
+    return STATUS_ALIASES.get(key, "completed")
+
+# ==================== REGLAS ====================
+
+class Rule:
+    """Regla del router: patrón sobre la consulta normalizada → herramienta"""
+
+    def __init__(
+        self,
+        name: str,
+        pattern: str,
+        tool_class: str,
+        build: Optional[Callable[[Dict[str, str]], Dict[str, Any]]] = None
+    ):
+        self.name = name
+        self.pattern: Pattern[str] = re.compile(rf"^{pattern}$", re.IGNORECASE)
+        self.tool_class = tool_class
+        self.build = build or (lambda groups: groups)
+
+    def match(self, text: str) -> Optional[Dict[str, Any]]:
+        match = self.pattern.match(text)
+        if match is None:
+            return None
+        return self.build({k: v for k, v in match.groupdict().items() if v is not None})
+
+def _with_status(groups: Dict[str, str]) -> Dict[str, Any]:
+    return {**groups, "status": _status(groups["status"])}
+
+RULES: List[Rule] = [
+    Rule("list_projects", rf"{VIEW}proyectos", "GetAllProjectsTool"),
+    Rule("project_by_id", rf"{VIEW}(?:(?:detalles?|info(?:rmacion)?)\s+del?\s+)?proyecto\s+{PROJECT_ID}", "GetProjectByIdTool"),
+    Rule("tasks_by_project", rf"{VIEW}tareas{OF_PROJECT}", "GetTasksByProjectTool"),
+    Rule("task_by_id", rf"{VIEW}tarea\s+{TASK_ID}{OF_PROJECT}", "GetTaskByIdTool"),
+    Rule("notes_by_task", rf"{VIEW}notas{OF_TASK}{OF_PROJECT}", "GetNotesByTaskTool"),
+    Rule("set_task_status", rf"{SET_STATUS}{STRICT_TASK_ID}{OF_STRICT_PROJECT}{TO}{STATUS}", "UpdateTaskStatusTool", _with_status),
+    Rule("mark_task", rf"{MARK}{STRICT_TASK_ID}{OF_STRICT_PROJECT}{TO}{STATUS}", "UpdateTaskStatusTool", _with_status),
+    Rule("delete_project", rf"{DELETE}proyecto\s+{STRICT_PROJECT_ID}", "DeleteProjectTool"),
+    Rule("delete_task", rf"{DELETE}tarea\s+{STRICT_TASK_ID}{OF_STRICT_PROJECT}", "DeleteTaskTool"),
+    Rule("delete_note", rf"{DELETE}nota\s+{STRICT_NOTE_ID}{OF_STRICT_TASK}{OF_STRICT_PROJECT}", "DeleteNoteTool"),
+]
+
+def route_query(query: str) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Intenta resolver la consulta con las reglas locales.
+
+    Returns:
+        (nombre_regla, clase_herramienta, argumentos) o None si ninguna regla
+        coincide y la consulta debe ir al LLM
+    """
+    if not FAST_ROUTER_ENABLED:
+        return None
+
+    # Se conservan mayúsculas para no alterar los IDs
+    text = normalize_query(query, lowercase=False)
+    for rule in RULES:
+        args = rule.match(text)
+        if args is not None:
+            return rule.name, rule.tool_class, args
+    return None
+
+# Verbos que indican que la consulta modifica datos
+MUTATION_VERBS = re.compile(
+    r"\b(?:crea(?:r|me)?|agrega(?:r)?|anad(?:e|ir)|actualiza(?:r)?|cambia(?:r)?|marca(?:r)?"
+    r"|elimina(?:r)?|borra(?:r)?|quita(?:r)?|mueve|mover|pon|poner|renombra(?:r)?|asigna(?:r)?"
+    r"|edita(?:r)?|modifica(?:r)?|pasa(?:r)?|anota(?:r)?|escribe)\b"
+)
+
+def is_mutating_query(query: str) -> bool:
+    """
+    Estimación rápida (antes de llamar al LLM) de si la consulta modifica datos.
+    Se usa para elegir el carril de admisión, no para decidir la herramienta.
+    """
+    return MUTATION_VERBS.search(normalize_query(query)) is not None
+
+# ==================== GRUPOS DE HERRAMIENTAS ====================
+
+TOOL_GROUPS_ENABLED = os.getenv("TOOL_GROUPS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Grupo → herramientas que se envían a Gemini cuando la consulta trata de esa entidad
+TOOL_GROUPS: Dict[str, Tuple[str, ...]] = {
+    "projects": (
+        "GetAllProjectsTool", "GetProjectByIdTool", "CreateProjectTool", "UpdateProjectTool",
+        "DeleteProjectTool", "GetTasksForProjectsTool",
+    ),
+    "tasks": (
+        "GetTasksByProjectTool", "GetTaskByIdTool", "CreateTaskTool", "UpdateTaskTool",
+        "UpdateTaskStatusTool", "DeleteTaskTool", "CreateTasksTool", "UpdateTaskStatusesTool",
+        "GetTasksForProjectsTool",
+    ),
+    "notes": ("GetNotesByTaskTool", "CreateNoteTool", "DeleteNoteTool", "GetNotesForTasksTool"),
+}
+
+GROUP_KEYWORDS: Dict[str, Pattern[str]] = {
+    "projects": re.compile(r"\b(?:proyectos?|clientes?)\b"),
+    "tasks": re.compile(
+        r"\b(?:tareas?|pendientes?|completad[oa]s?|terminad[oa]s?|finalizad[oa]s?"
+        r"|en\s+progreso|en\s+curso|en\s+revision|en\s+espera|en\s+pausa|estados?)\b"
+    ),
+    "notes": re.compile(r"\b(?:notas?|comentarios?|anota(?:r|cion|ciones)?)\b"),
+}
+
+# Referencias a la entidad padre ("del proyecto X", "de la tarea Y"): dicen dónde
+# actúa la consulta, no sobre qué entidad
+PARENT_REFERENCE = re.compile(
+    r"\b(?:del|de\s+(?:la|los|las)|al|a\s+(?:la|los|las)|en\s+(?:el|la)|para\s+(?:el|la))"
+    r"\s+(?P<entity>proyecto|tarea)s?\b"
+)
+
+def classify_tool_group(query: str) -> Optional[str]:
+    """
+    Grupo de herramientas (projects, tasks, notes o una combinación como
+    "projects+tasks") que necesita la consulta, por las entidades que nombra.
+
+    Returns:
+        Nombre del grupo, o None si no se reconoce ninguna entidad o las nombra
+        todas (entonces se envían todas las herramientas)
+    """
+    if not TOOL_GROUPS_ENABLED:
+        return None
+
+    text = normalize_query(query)
+    groups = _mentioned_groups(PARENT_REFERENCE.sub(" ", text))
+    if not groups:
+        # Solo hay referencias ("los detalles del proyecto X"): la más específica
+        parents = {match.group("entity") for match in PARENT_REFERENCE.finditer(text)}
+        groups = ["tasks"] if "tarea" in parents else ["projects"] if parents else []
+    if not groups or len(groups) == len(TOOL_GROUPS):
+        return None
+    return "+".join(groups)
+
+def _mentioned_groups(text: str) -> List[str]:
+    return [group for group, pattern in GROUP_KEYWORDS.items() if pattern.search(text)]
+
+def tool_group_classes(group: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Clases de herramientas de un grupo (None = todas)"""
+    if group is None:
+        return None
+    names = set()
+    for part in group.split("+"):
+        names.update(TOOL_GROUPS[part])
+    return tuple(sorted(names))
+
+# ==================== ESTADÍSTICAS ====================
+
+class RouteStats:
+    """
+    Cuenta cuántas consultas resuelve cada ruta (reglas del router, caché o LLM)
+    y su latencia acumulada, para estimar el tiempo de LLM ahorrado.
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        # Llamadas a Gemini por grupo de herramientas enviado
+        self.group_counts: Dict[str, int] = {}
+        self.group_seconds: Dict[str, float] = {}
+        # Tokens de esquemas enviados, y los que se habrían enviado con todas las herramientas
+        self.schema_tokens_sent = 0
+        self.schema_tokens_baseline = 0
+
+    def record(self, route: str, seconds: float):
+        self.counts[route] = self.counts.get(route, 0) + 1
+        self.seconds[route] = self.seconds.get(route, 0.0) + seconds
+
+    def record_tool_group(self, group: Optional[str], seconds: float, tokens_sent: int, tokens_baseline: int):
+        """
+        Registra una llamada a Gemini con un subconjunto de herramientas (None = todas).
+        `tokens_baseline` se cuenta una vez por consulta (0 en el reintento con todas).
+        """
+        group = group or "all"
+        self.group_counts[group] = self.group_counts.get(group, 0) + 1
+        self.group_seconds[group] = self.group_seconds.get(group, 0.0) + seconds
+        self.schema_tokens_sent += tokens_sent
+        self.schema_tokens_baseline += tokens_baseline
+
+    def stats(self) -> Dict[str, Any]:
+        routes = {
+            route: {
+                "count": count,
+                "avg_ms": 1000 * self.seconds[route] / count,
+            }
+            for route, count in self.counts.items()
+        }
+        llm_count = self.counts.get("llm", 0)
+        avg_llm = self.seconds.get("llm", 0.0) / llm_count if llm_count else 0.0
+        skipped = sum(count for route, count in self.counts.items() if route != "llm")
+        return {
+            "routes": routes,
+            "llm_calls_skipped": skipped,
+            "estimated_llm_seconds_saved": skipped * avg_llm,
+            "tool_groups": {
+                group: {
+                    "count": count,
+                    "avg_ms": 1000 * self.group_seconds[group] / count,
+                }
+                for group, count in self.group_counts.items()
+            },
+            "tool_schema_tokens_sent": self.schema_tokens_sent,
+            "tool_schema_tokens_saved": self.schema_tokens_baseline - self.schema_tokens_sent,
+        }
+
+route_stats = RouteStats()
@@ -1,13 +1,33 @@
 import asyncio
+import hashlib
 import os
-from contextlib import asynccontextmanager
-from typing import Any, Dict, List, Optional, Annotated
+import tempfile
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar, Union, Annotated
 import httpx
 from mcp.server import Server
 from mcp.server.fastmcp import FastMCP
 from mcp.types import Tool
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter
 from .auth import get_auth
+from .cache import SharedInvalidation, TTLCache
+from .coalesce import SingleFlight
+from .compaction import select_items
+from .deadline import deadline_scope, in_phase, meta_deadline
+from .names import is_object_id, name_index
+from .metrics import track_phase
+from .tracing import extract_context, inject_headers, shutdown_tracing, start_span
+from .gateway import API_GATEWAY_URL, close_gateway_client, get_gateway_client
+from .resilience import (
+    GATEWAY_RETRY_ATTEMPTS,
+    RETRYABLE_STATUS,
+    call_with_retry,
+    gateway_breaker,
+    is_gateway_failure,
+    is_unsent_request_error,
+)
+
+T = TypeVar("T")
 
 # Modelos corregidos según tus schemas reales
 class CompletedBy(BaseModel):
@@ -49,17 +69,61 @@ class Project(BaseModel):
     createdAt: str
     updatedAt: str
 
-# ✅ Cliente HTTP compartido
-http_client: Optional[httpx.AsyncClient] = None
-# Usar API Gateway en lugar de task-service directo
-API_GATEWAY_URL = os.getenv("API_GATEWAY_URL", "http://api-gateway:4000")
+class TaskInput(BaseModel):
+    """Datos de una tarea a crear en lote"""
+    name: str
+    description: str = ""
+
+class BatchItemResult(BaseModel):
+    """Resultado de un elemento de una operación en lote"""
+    item: str
+    success: bool
+    result: Optional[Any] = None
+    error: Optional[str] = None
 
+class BatchResult(BaseModel):
+    """Resultado de una operación en lote, con el detalle por elemento"""
+    total: int
+    succeeded: int
+    failed: int
+    items: List[BatchItemResult]
+
+# Validadores de listados, construidos una vez: parsean los bytes de la
+# respuesta directamente a modelos, sin pasar por dicts intermedios
+PROJECT_LIST = TypeAdapter(List[Project])
+TASK_LIST = TypeAdapter(List[Task])
+NOTE_LIST = TypeAdapter(List[Note])
+
+# ✅ Cliente HTTP compartido (pool configurado en gateway.py)
 async def get_http_client() -> httpx.AsyncClient:
     """Obtiene el cliente HTTP global"""
-    global http_client
-    if http_client is None:
-        http_client = httpx.AsyncClient()
-    return http_client
+    return get_gateway_client()
+
+# Operaciones en lote: peticiones simultáneas al gateway y tamaño máximo
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "5"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+
+# Caché de lecturas del gateway, con clave = ruta (incluye los IDs)
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", "30"))
+READ_CACHE_MAX_ENTRIES = int(os.getenv("READ_CACHE_MAX_ENTRIES", "512"))
+READ_CACHE_MAX_BYTES = int(os.getenv("READ_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Marca compartida con la que cada proceso MCP ve las escrituras de los demás
+READ_CACHE_SYNC_PATH = os.getenv(
+    "READ_CACHE_SYNC_PATH",
+    os.path.join(tempfile.gettempdir(), "agentecongemini-read-cache.stamp")
+)
+
+read_cache = TTLCache(
+    "gateway_reads",
+    ttl=READ_CACHE_TTL,
+    max_entries=READ_CACHE_MAX_ENTRIES,
+    max_bytes=READ_CACHE_MAX_BYTES
+)
+read_cache_sync = SharedInvalidation(READ_CACHE_SYNC_PATH if read_cache.enabled else "")
+
+# Agrupación de GETs idénticos en curso
+gateway_reads = SingleFlight("gateway_reads")
 
 async def get_auth_headers() -> dict:
     """Obtiene headers de autenticación con JWT válido"""
@@ -67,50 +131,299 @@ async def get_auth_headers() -> dict:
     token = await auth.get_token()
     return {"Authorization": f"Bearer {token}"}
 
-mcp = FastMCP("Task Management Agent")
+# Métodos que se pueden repetir sin efectos duplicados
+IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE"}
+
+async def gateway_request(method: str, path: str, headers: Optional[dict] = None, **kwargs: Any) -> httpx.Response:
+    """
+    Petición al API Gateway con circuit breaker y reintentos.
+
+    - GET/PUT/DELETE se reintentan ante errores de red y respuestas 429/5xx;
+      POST solo si la petición no llegó a enviarse.
+    - Si el gateway responde 401, se renueva el token y se repite una vez.
+
+    Raises:
+        httpx.HTTPStatusError: Si la respuesta final no es 2xx
+        CircuitOpenError: Si el gateway está marcado como degradado
+    """
+    url = f"{API_GATEWAY_URL}{path}"
+    headers = headers or await get_auth_headers()
+    retryable = is_gateway_failure if method in IDEMPOTENT_METHODS else is_unsent_request_error
+
+    async def send(headers: dict) -> httpx.Response:
+        async def attempt() -> httpx.Response:
+            client = await get_http_client()
+            response = await client.request(method, url, headers=inject_headers(headers), **kwargs)
+            span.set_attribute("http.status_code", response.status_code)
+            if response.status_code in RETRYABLE_STATUS:
+                response.raise_for_status()
+            return response
+
+        with track_phase("gateway_http"), start_span(f"gateway {method}", path=path) as span:
+            return await call_with_retry(
+                attempt,
+                breaker=gateway_breaker,
+                attempts=GATEWAY_RETRY_ATTEMPTS,
+                retryable=retryable,
+                is_failure=is_gateway_failure,
+                phase="gateway_http"
+            )
+
+    response = await send(headers)
+    if response.status_code == 401:
+        rejected = headers["Authorization"].removeprefix("Bearer ")
+        token = await get_auth().renew_rejected_token(rejected)
+        response = await send({**headers, "Authorization": f"Bearer {token}"})
+    response.raise_for_status()
+    return response
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Cierra el pool HTTP y la renovación del token al apagar el servidor"""
+    try:
+        yield
+    finally:
+        await get_auth().close()
+        await close_gateway_client()
+        await shutdown_tracing()
+
+class TracedFastMCP(FastMCP):
+    """
+    FastMCP que abre un span por llamada de herramienta, continuando la traza
+    del cliente si la petición `tools/call` trae contexto en `_meta`. Si el
+    `_meta` trae el tiempo que le queda a la consulta, la herramienta (y sus
+    peticiones al gateway) se cancela cuando vence.
+
+    La lista de herramientas (con sus esquemas JSON) se construye una sola vez
+    y se reutiliza en cada `tools/list`; registrar una herramienta la invalida.
+    """
+
+    _tool_list: Optional[List[Tool]] = None
+
+    def add_tool(self, *args: Any, **kwargs: Any) -> None:
+        self._tool_list = None
+        super().add_tool(*args, **kwargs)
+
+    async def list_tools(self) -> List[Tool]:
+        if self._tool_list is None:
+            self._tool_list = await super().list_tools()
+        return self._tool_list
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> Sequence[Any] | Dict[str, Any]:
+        try:
+            meta = self.get_context().request_context.meta
+        except ValueError:
+            # Llamada directa en proceso (sin petición MCP): continúa el span activo
+            meta = None
+        meta_fields = meta.model_dump(exclude_none=True) if meta is not None else None
+        parent = extract_context(meta_fields)
+        # En proceso ya rige el plazo de la API; por stdio llega en `_meta`
+        seconds = meta_deadline(meta_fields)
+        async with deadline_scope(seconds) if seconds is not None else nullcontext():
+            with start_span(f"mcp.tool {name}", parent=parent, tool=name):
+                # Solo las lecturas (get_*) aceptan nombres aproximados: un nombre
+                # parecido pero equivocado no debe escribir en otra entidad
+                arguments = await resolve_names(arguments, exact=not name.startswith("get_"))
+                return await super().call_tool(name, arguments)
+
+mcp = TracedFastMCP("Task Management Agent", lifespan=lifespan)
+
+def auth_identity(headers: Dict[str, str]) -> str:
+    """Identidad de las credenciales (hash del token) para separar lecturas por usuario"""
+    authorization = headers.get("Authorization", "")
+    return hashlib.sha256(authorization.encode()).hexdigest()[:16]
+
+async def cached_get(path: str, parse: Callable[[bytes], T]) -> T:
+    """
+    GET de lectura a través de la caché TTL.
+    `parse` convierte el cuerpo JSON (bytes) de la respuesta en los modelos a devolver.
+    Las lecturas idénticas simultáneas comparten una sola petición al gateway.
+    """
+    # Otro proceso (otra sesión del pool MCP) escribió: lo cacheado puede estar obsoleto
+    if read_cache_sync.changed():
+        read_cache.clear()
+    cached = read_cache.get(path)
+    if cached is not None:
+        return cached
+
+    headers = await get_auth_headers()
+    url = f"{API_GATEWAY_URL}{path}"
+    # Una lectura posterior a una escritura no se une a un GET iniciado antes
+    generation = read_cache.generation
+
+    async def fetch() -> T:
+        response = await gateway_request("GET", path, headers=headers)
+        result = parse(response.content)
+        read_cache.set(path, result, size=len(response.content), generation=generation)
+        return result
+
+    key = ("GET", url, auth_identity(headers), generation)
+    # La lectura compartida no lleva el plazo de esta consulta: si vence
+    # mientras espera, la cancelación se atribuye a la fase del gateway
+    with in_phase("gateway_http"):
+        return await gateway_reads.do(key, fetch)
+
+def invalidate_project_list():
+    """Invalida el listado de proyectos (tras crear uno)"""
+    read_cache.invalidate("/api/projects")
+    read_cache_sync.publish()
+
+def invalidate_project(project_id: str, deleted: bool = False):
+    """Invalida el listado de proyectos y el proyecto (y todo lo que cuelga de él si se borró)"""
+    read_cache.invalidate("/api/projects", f"/api/projects/{project_id}")
+    if deleted:
+        read_cache.invalidate_prefix(f"/api/projects/{project_id}/")
+    read_cache_sync.publish()
+
+def invalidate_task(project_id: str, task_id: Optional[str] = None, deleted: bool = False):
+    """Invalida el listado de tareas del proyecto y la tarea indicada"""
+    keys = [f"/api/projects/{project_id}/tasks"]
+    if task_id:
+        keys.append(f"/api/projects/{project_id}/tasks/{task_id}")
+    read_cache.invalidate(*keys)
+    if task_id and deleted:
+        read_cache.invalidate_prefix(f"/api/projects/{project_id}/tasks/{task_id}/")
+    read_cache_sync.publish()
+
+def invalidate_notes(project_id: str, task_id: str):
+    """Invalida el listado de notas de una tarea"""
+    read_cache.invalidate(f"/api/projects/{project_id}/tasks/{task_id}/notes")
+    read_cache_sync.publish()
+
+# ==================== NOMBRES ====================
+
+def index_project(project: Project) -> Project:
+    """Registra el nombre del proyecto en el índice local"""
+    name_index.put_project(project)
+    return project
+
+def index_task(task: Task) -> Task:
+    """Registra el nombre de la tarea en el índice local"""
+    name_index.put_task(task)
+    return task
+
+async def resolve_project_id(project: str, exact: bool = False) -> str:
+    """
+    ID del proyecto a partir de su ID o de su nombre. Si el nombre no está en
+    el índice se recarga el listado (como mucho cada NAME_INDEX_REFRESH_INTERVAL
+    segundos); si sigue sin aparecer se deja tal cual.
+    """
+    if not project or is_object_id(project):
+        return project
+    project_id = name_index.lookup_project(project, exact)
+    if project_id is None and name_index.projects_stale():
+        name_index.refreshes += 1
+        read_cache.invalidate("/api/projects")
+        await get_all_projects()
+        project_id = name_index.lookup_project(project, exact)
+    return project_id or project
+
+async def resolve_task_id(project_id: str, task: str, exact: bool = False) -> str:
+    """ID de la tarea del proyecto a partir de su ID o de su nombre"""
+    if not task or is_object_id(task):
+        return task
+    task_id = name_index.lookup_task(project_id, task, exact)
+    if task_id is None and name_index.tasks_stale(project_id):
+        name_index.refreshes += 1
+        read_cache.invalidate(f"/api/projects/{project_id}/tasks")
+        await get_tasks_by_project(project_id)
+        task_id = name_index.lookup_task(project_id, task, exact)
+    return task_id or task
+
+async def resolve_names(arguments: Dict[str, Any], exact: bool = False) -> Dict[str, Any]:
+    """
+    Sustituye nombres de proyectos y tareas por sus IDs en los argumentos de
+    una herramienta (`project_id`, `project_ids`, `task_id`, `task_ids`).
+    Con `exact` no se aceptan coincidencias aproximadas.
+
+    Raises:
+        AmbiguousNameError: Si un nombre coincide con varios proyectos o tareas
+    """
+    arguments = dict(arguments)
+    if isinstance(arguments.get("project_id"), str):
+        arguments["project_id"] = await resolve_project_id(arguments["project_id"], exact)
+    if isinstance(arguments.get("project_ids"), list):
+        arguments["project_ids"] = [await resolve_project_id(p, exact) for p in arguments["project_ids"]]
+
+    project_id = arguments.get("project_id")
+    if project_id and isinstance(arguments.get("task_id"), str):
+        arguments["task_id"] = await resolve_task_id(project_id, arguments["task_id"], exact)
+    if project_id and isinstance(arguments.get("task_ids"), list):
+        arguments["task_ids"] = [await resolve_task_id(project_id, t, exact) for t in arguments["task_ids"]]
+    return arguments
+
+async def run_batch(items: List[Any], key: Callable[[Any], str], operation: Callable[[Any], Awaitable[Any]]) -> BatchResult:
+    """
+    Ejecuta `operation` sobre cada elemento con concurrencia acotada
+    (BATCH_CONCURRENCY) y reporta éxito o error por elemento.
+    """
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f"Demasiados elementos en el lote: {len(items)} (máximo {BATCH_MAX_ITEMS})")
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run_one(item: Any) -> BatchItemResult:
+        async with semaphore:
+            try:
+                result = await operation(item)
+                return BatchItemResult(item=key(item), success=True, result=result)
+            except Exception as e:
+                return BatchItemResult(item=key(item), success=False, error=str(e))
+
+    results = await asyncio.gather(*(run_one(item) for item in items))
+    succeeded = sum(1 for result in results if result.success)
+    return BatchResult(
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        items=list(results)
+    )
 
 # ==================== PROJECT ENDPOINTS ====================
 
 @mcp.tool()
-async def get_all_projects() -> List[Project]:
-    """Obtiene todos los proyectos"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
-    response = await client.get(f"{API_GATEWAY_URL}/api/projects", headers=headers)
-    response.raise_for_status()
-    projects_data = response.json()
-    return [Project(**project) for project in projects_data]
+async def get_all_projects(
+    limit: int = 0,
+    offset: int = 0,
+    fields: Optional[List[str]] = None
+) -> Union[List[Project], List[Dict[str, Any]]]:
+    """
+    Obtiene todos los proyectos.
+    Con `limit`/`offset` devuelve solo una página y con `fields` solo esos campos (más `id`).
+    """
+    def parse(body: bytes) -> List[Project]:
+        projects = PROJECT_LIST.validate_json(body)
+        name_index.set_projects(projects)
+        return projects
+
+    projects = await cached_get("/api/projects", parse)
+    return select_items(projects, limit, offset, fields)
 
 @mcp.tool()
 async def get_project_by_id(project_id: str) -> Project:
     """Obtiene un proyecto específico por ID"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
-    response = await client.get(f"{API_GATEWAY_URL}/api/projects/{project_id}", headers=headers)
-    response.raise_for_status()
-    project_data = response.json()
-    return Project(**project_data)
+    return await cached_get(
+        f"/api/projects/{project_id}",
+        lambda body: index_project(Project.model_validate_json(body))
+    )
 
 @mcp.tool()
 async def create_project(name: str, description: str, client_name: str = "") -> Project:
     """Crea un nuevo proyecto"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
     payload = {
         "name": name,
         "description": description,
         "clientName": client_name
     }
-    response = await client.post(f"{API_GATEWAY_URL}/api/projects", json=payload, headers=headers)
-    response.raise_for_status()
-    project_data = response.json()
-    return Project(**project_data)
+    try:
+        response = await gateway_request("POST", "/api/projects", json=payload)
+    finally:
+        invalidate_project_list()
+    return index_project(Project.model_validate_json(response.content))
 
 @mcp.tool()
 async def update_project(project_id: str, name: str = "", description: str = "", client_name: str = "") -> Project:
     """Actualiza un proyecto existente"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
     payload = {}
     if name:
         payload["name"] = name
@@ -119,123 +432,175 @@ async def update_project(project_id: str, name: str = "", description: str = "",
     if client_name:
         payload["clientName"] = client_name
     
-    response = await client.put(f"{API_GATEWAY_URL}/api/projects/{project_id}", json=payload, headers=headers)
-    response.raise_for_status()
-    project_data = response.json()
-    return Project(**project_data)
+    try:
+        response = await gateway_request("PUT", f"/api/projects/{project_id}", json=payload)
+    finally:
+        invalidate_project(project_id)
+    return index_project(Project.model_validate_json(response.content))
 
 @mcp.tool()
 async def delete_project(project_id: str) -> Dict[str, str]:
     """Elimina un proyecto"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
-    response = await client.delete(f"{API_GATEWAY_URL}/api/projects/{project_id}", headers=headers)
-    response.raise_for_status()
+    try:
+        await gateway_request("DELETE", f"/api/projects/{project_id}")
+    finally:
+        invalidate_project(project_id, deleted=True)
+    name_index.remove_project(project_id)
     return {"message": "Project deleted successfully"}
 
 # ==================== TASK ENDPOINTS ====================
 
 @mcp.tool()
-async def get_tasks_by_project(project_id: str) -> List[Task]:
-    """Obtiene todas las tareas de un proyecto"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
-    response = await client.get(f"{API_GATEWAY_URL}/api/projects/{project_id}/tasks", headers=headers)
-    response.raise_for_status()
-    tasks_data = response.json()
-    return [Task(**task) for task in tasks_data]
+async def get_tasks_by_project(
+    project_id: str,
+    limit: int = 0,
+    offset: int = 0,
+    fields: Optional[List[str]] = None
+) -> Union[List[Task], List[Dict[str, Any]]]:
+    """
+    Obtiene todas las tareas de un proyecto.
+    Con `limit`/`offset` devuelve solo una página y con `fields` solo esos campos (más `id`).
+    """
+    def parse(body: bytes) -> List[Task]:
+        tasks = TASK_LIST.validate_json(body)
+        name_index.set_tasks(project_id, tasks)
+        return tasks
+
+    tasks = await cached_get(f"/api/projects/{project_id}/tasks", parse)
+    return select_items(tasks, limit, offset, fields)
 
 @mcp.tool()
 async def get_task_by_id(project_id: str, task_id: str) -> Task:
     """Obtiene una tarea específica por ID"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
-    response = await client.get(f"{API_GATEWAY_URL}/api/projects/{project_id}/tasks/{task_id}", headers=headers)
-    response.raise_for_status()
-    task_data = response.json()
-    return Task(**task_data)
+    return await cached_get(
+        f"/api/projects/{project_id}/tasks/{task_id}",
+        lambda body: index_task(Task.model_validate_json(body))
+    )
 
 @mcp.tool()
 async def create_task(project_id: str, name: str, description: str = "") -> Task:
     """Crea una nueva tarea en un proyecto"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
     payload = {
         "name": name,
         "description": description
     }
-    response = await client.post(f"{API_GATEWAY_URL}/api/projects/{project_id}/tasks", json=payload, headers=headers)
-    response.raise_for_status()
-    task_data = response.json()
-    return Task(**task_data)
+    try:
+        response = await gateway_request("POST", f"/api/projects/{project_id}/tasks", json=payload)
+    finally:
+        invalidate_task(project_id)
+    return index_task(Task.model_validate_json(response.content))
 
 @mcp.tool()
 async def update_task(project_id: str, task_id: str, name: str = "", description: str = "") -> Task:
     """Actualiza una tarea existente"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
     payload = {}
     if name:
         payload["name"] = name
     if description:
         payload["description"] = description
     
-    response = await client.put(f"{API_GATEWAY_URL}/api/projects/{project_id}/tasks/{task_id}", json=payload, headers=headers)
-    response.raise_for_status()
-    task_data = response.json()
-    return Task(**task_data)
+    try:
+        response = await gateway_request("PUT", f"/api/projects/{project_id}/tasks/{task_id}", json=payload)
+    finally:
+        invalidate_task(project_id, task_id)
+    return index_task(Task.model_validate_json(response.content))
 
 @mcp.tool()
 async def update_task_status(project_id: str, task_id: str, status: str) -> Task:
     """Actualiza el estado de una tarea"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
     payload = {"status": status}
-    response = await client.post(f"{API_GATEWAY_URL}/api/projects/{project_id}/tasks/{task_id}/status", json=payload, headers=headers)
-    response.raise_for_status()
-    task_data = response.json()
-    return Task(**task_data)
+    try:
+        response = await gateway_request("POST", f"/api/projects/{project_id}/tasks/{task_id}/status", json=payload)
+    finally:
+        invalidate_task(project_id, task_id)
+    return index_task(Task.model_validate_json(response.content))
 
 @mcp.tool()
 async def delete_task(project_id: str, task_id: str) -> Dict[str, str]:
     """Elimina una tarea"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
-    response = await client.delete(f"{API_GATEWAY_URL}/api/projects/{project_id}/tasks/{task_id}", headers=headers)
-    response.raise_for_status()
+    try:
+        await gateway_request("DELETE", f"/api/projects/{project_id}/tasks/{task_id}")
+    finally:
+        invalidate_task(project_id, task_id, deleted=True)
+    name_index.remove_task(project_id, task_id)
     return {"message": "Task deleted successfully"}
 
 # ==================== NOTE ENDPOINTS ====================
 
 @mcp.tool()
-async def get_notes_by_task(project_id: str, task_id: str) -> List[Note]:
-    """Obtiene todas las notas de una tarea"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
-    response = await client.get(f"{API_GATEWAY_URL}/api/projects/{project_id}/tasks/{task_id}/notes", headers=headers)
-    response.raise_for_status()
-    notes_data = response.json()
-    return [Note(**note) for note in notes_data]
+async def get_notes_by_task(
+    project_id: str,
+    task_id: str,
+    limit: int = 0,
+    offset: int = 0,
+    fields: Optional[List[str]] = None
+) -> Union[List[Note], List[Dict[str, Any]]]:
+    """
+    Obtiene todas las notas de una tarea.
+    Con `limit`/`offset` devuelve solo una página y con `fields` solo esos campos (más `id`).
+    """
+    notes = await cached_get(
+        f"/api/projects/{project_id}/tasks/{task_id}/notes",
+        NOTE_LIST.validate_json
+    )
+    return select_items(notes, limit, offset, fields)
 
 @mcp.tool()
 async def create_note(project_id: str, task_id: str, content: str) -> Note:
     """Crea una nueva nota en una tarea"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
     payload = {"content": content}
-    response = await client.post(f"{API_GATEWAY_URL}/api/projects/{project_id}/tasks/{task_id}/notes", json=payload, headers=headers)
-    response.raise_for_status()
-    note_data = response.json()
-    return Note(**note_data)
+    try:
+        response = await gateway_request("POST", f"/api/projects/{project_id}/tasks/{task_id}/notes", json=payload)
+    finally:
+        invalidate_notes(project_id, task_id)
+    return Note.model_validate_json(response.content)
 
 @mcp.tool()
 async def delete_note(project_id: str, task_id: str, note_id: str) -> Dict[str, str]:
     """Elimina una nota"""
-    client = await get_http_client()
-    headers = await get_auth_headers()
-    response = await client.delete(f"{API_GATEWAY_URL}/api/projects/{project_id}/tasks/{task_id}/notes/{note_id}", headers=headers)
-    response.raise_for_status()
+    try:
+        await gateway_request("DELETE", f"/api/projects/{project_id}/tasks/{task_id}/notes/{note_id}")
+    finally:
+        invalidate_notes(project_id, task_id)
     return {"message": "Note deleted successfully"}
 
+# ==================== BATCH ENDPOINTS ====================
+
+@mcp.tool()
+async def create_tasks(project_id: str, tasks: List[TaskInput]) -> BatchResult:
+    """Crea varias tareas en un proyecto"""
+    return await run_batch(
+        tasks,
+        lambda task: task.name,
+        lambda task: create_task(project_id, task.name, task.description)
+    )
+
+@mcp.tool()
+async def update_task_statuses(project_id: str, task_ids: List[str], status: str) -> BatchResult:
+    """Actualiza el estado de varias tareas de un proyecto"""
+    return await run_batch(
+        task_ids,
+        lambda task_id: task_id,
+        lambda task_id: update_task_status(project_id, task_id, status)
+    )
+
+@mcp.tool()
+async def get_tasks_for_projects(project_ids: List[str]) -> BatchResult:
+    """Obtiene las tareas de varios proyectos"""
+    return await run_batch(
+        project_ids,
+        lambda project_id: project_id,
+        get_tasks_by_project
+    )
+
+@mcp.tool()
+async def get_notes_for_tasks(project_id: str, task_ids: List[str]) -> BatchResult:
+    """Obtiene las notas de varias tareas de un proyecto"""
+    return await run_batch(
+        task_ids,
+        lambda task_id: task_id,
+        lambda task_id: get_notes_by_task(project_id, task_id)
+    )
+
 if __name__ == "__main__":
     mcp.run()
\ No newline at end of file
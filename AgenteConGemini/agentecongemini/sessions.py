@@ -0,0 +1,170 @@
+"""
+Sesiones de conversación del agente.
+Cada sesión guarda un historial compacto: un resumen acumulado de los turnos
+antiguos, los últimos turnos completos y los IDs de las entidades mencionadas,
+de modo que las consultas de seguimiento ("y ahora márcala como completada")
+se resuelven con un prompt de tamaño acotado.
+
+Las sesiones viven en un TTLCache (LRU, expiración por inactividad y límite de
+memoria aproximado), así que una sesión olvidada acaba desalojándose sola.
+"""
+import os
+import re
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+
+from .cache import TTLCache
+
+# ==================== CONFIGURACIÓN ====================
+
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(8 * 1024 * 1024)))
+# Turnos que se conservan completos; los anteriores pasan al resumen
+SESSION_RECENT_TURNS = int(os.getenv("SESSION_RECENT_TURNS", "4"))
+# Tamaño máximo (caracteres) del contexto que se envía al LLM por sesión
+SESSION_MAX_CHARS = int(os.getenv("SESSION_MAX_CHARS", "4000"))
+SESSION_MAX_ENTITIES = int(os.getenv("SESSION_MAX_ENTITIES", "12"))
+
+# Caracteres que se guardan de cada mensaje y de cada línea del resumen
+TURN_MAX_CHARS = 400
+SUMMARY_LINE_MAX_CHARS = 160
+
+OBJECT_ID = re.compile(r"\b[0-9a-f]{24}\b")
+# `_id` de los elementos en el JSON de un resultado de herramienta
+RESULT_ID = re.compile(r'"_id":\s*"([0-9a-f]{24})"')
+
+# Argumento de herramienta → tipo de entidad
+ENTITY_KINDS = {"project_id": "proyecto", "task_id": "tarea", "note_id": "nota"}
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def _result_kind(tool_name: Optional[str]) -> str:
+    """Tipo de las entidades que devuelve una herramienta, por su nombre"""
+    if not tool_name:
+        return "id"
+    if "note" in tool_name:
+        return "nota"
+    if "task" in tool_name:
+        return "tarea"
+    return "proyecto"
+
+# ==================== SESIÓN ====================
+
+class Turn:
+    __slots__ = ("user", "assistant", "tool")
+
+    def __init__(self, user: str, assistant: str, tool: Optional[str]):
+        self.user = user
+        self.assistant = assistant
+        self.tool = tool
+
+    def render(self) -> str:
+        tool = f" [{self.tool}]" if self.tool else ""
+        return f"Usuario: {self.user}\nAgente{tool}: {self.assistant}"
+
+    def summary_line(self) -> str:
+        outcome = f"se usó {self.tool}" if self.tool else _clip(self.assistant, 60)
+        return _clip(f"- {self.user} → {outcome}", SUMMARY_LINE_MAX_CHARS)
+
+
+class Session:
+    """Historial compacto de una conversación"""
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.turns = 0
+        self.summary: Deque[str] = deque()
+        self.recent: Deque[Turn] = deque()
+        # ID → tipo, de la mención más antigua a la más reciente
+        self.entities: "OrderedDict[str, str]" = OrderedDict()
+
+    @property
+    def empty(self) -> bool:
+        return self.turns == 0
+
+    def add_turn(
+        self,
+        user: str,
+        assistant: str,
+        tool_name: Optional[str] = None,
+        tool_args: Optional[Dict[str, Any]] = None
+    ):
+        """Registra un turno y compacta el historial para respetar los límites"""
+        self.turns += 1
+        for arg, value in (tool_args or {}).items():
+            if arg in ENTITY_KINDS and isinstance(value, str) and value:
+                self._remember(value, ENTITY_KINDS[arg])
+        # IDs del resultado (p. ej. el `_id` de lo que se acaba de crear), los primeros
+        found = RESULT_ID.findall(assistant) if tool_name else OBJECT_ID.findall(assistant)
+        for entity_id in found[:3]:
+            self._remember(entity_id, _result_kind(tool_name))
+
+        self.recent.append(Turn(_clip(user, TURN_MAX_CHARS), _clip(assistant, TURN_MAX_CHARS), tool_name))
+        while len(self.recent) > SESSION_RECENT_TURNS:
+            self.summary.append(self.recent.popleft().summary_line())
+        self._shrink()
+
+    def _remember(self, entity_id: str, kind: str):
+        if entity_id in self.entities:
+            self.entities.move_to_end(entity_id)
+            # Conservar el tipo ya conocido; solo se completa si era un ID genérico
+            if self.entities[entity_id] != "id":
+                return
+        self.entities[entity_id] = kind
+        while len(self.entities) > SESSION_MAX_ENTITIES:
+            self.entities.popitem(last=False)
+
+    def _shrink(self):
+        """Descarta primero las líneas de resumen más antiguas y luego turnos recientes"""
+        while self.summary and len(self.context()) > SESSION_MAX_CHARS:
+            self.summary.popleft()
+        while len(self.recent) > 1 and len(self.context()) > SESSION_MAX_CHARS:
+            self.recent.popleft()
+
+    def context(self) -> str:
+        """Contexto de la conversación para el prompt ("" si no hay historial)"""
+        if self.empty:
+            return ""
+        parts = []
+        if self.summary:
+            parts.append("Resumen de turnos anteriores:\n" + "\n".join(self.summary))
+        if self.entities:
+            mentioned = ", ".join(f"{kind} {entity_id}" for entity_id, kind in reversed(self.entities.items()))
+            parts.append(f"Entidades mencionadas (la más reciente primero): {mentioned}")
+        if self.recent:
+            parts.append("Turnos recientes:\n" + "\n".join(turn.render() for turn in self.recent))
+        return "\n\n".join(parts)
+
+    def size(self) -> int:
+        """Tamaño aproximado en bytes (para el límite de memoria del almacén)"""
+        return len(self.context().encode()) + 256
+
+# ==================== ALMACÉN ====================
+
+sessions = TTLCache(
+    "sessions",
+    ttl=SESSION_TTL,
+    max_entries=SESSION_MAX_SESSIONS,
+    max_bytes=SESSION_MAX_BYTES
+)
+
+def get_session(session_id: Optional[str] = None) -> Session:
+    """
+    Sesión con ese ID, o una nueva si no existe, expiró o no se indicó ID.
+    Las sesiones nuevas reciben siempre un ID generado aquí (nunca el que envía
+    el cliente), así que quien llama debe devolver `session.id`.
+    La sesión se guarda (y su TTL se renueva) con `save_session`.
+    """
+    if session_id:
+        session = sessions.get(session_id)
+        if session is not None:
+            return session
+    return Session(uuid.uuid4().hex)
+
+def save_session(session: Session):
+    """Guarda la sesión tras un turno, renovando su expiración"""
+    sessions.set(session.id, session, size=session.size())
@@ -0,0 +1,368 @@
+"""
+Trazas de extremo a extremo de las consultas del agente.
+Cada mensaje de chat abre una traza con un request ID que viaja por todos los
+saltos: API → cliente del agente → sesión MCP (en el `_meta` de la llamada
+`tools/call`) → herramientas del servidor → API Gateway (cabeceras
+`traceparent` y `X-Request-ID`).
+
+Los spans terminados se envían al exportador configurado:
+- file: una línea JSON por span en TRACE_FILE (default; compartido por la API
+  y los subprocesos MCP), escrita en lotes fuera del event loop y rotada al
+  superar TRACE_FILE_MAX_BYTES
+- console: una línea JSON por span en stderr (stdout es el canal MCP del servidor)
+- otlp: OTLP/HTTP en JSON a TRACE_OTLP_ENDPOINT (Jaeger, Tempo, OTel Collector...)
+- none: desactivado
+
+Se puede conectar otro exportador con `set_exporter()`.
+"""
+import asyncio
+import json
+import os
+import re
+import secrets
+import sys
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+
+import httpx
+
+# ==================== CONFIGURACIÓN ====================
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(tempfile.gettempdir(), "agentecongemini-traces.jsonl"))
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACE_FILE_FLUSH_INTERVAL = float(os.getenv("TRACE_FILE_FLUSH_INTERVAL", "1"))
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318")
+TRACE_OTLP_FLUSH_INTERVAL = float(os.getenv("TRACE_OTLP_FLUSH_INTERVAL", "2"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "agentecongemini")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+TRACEPARENT_HEADER = "traceparent"
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+# ==================== SPANS ====================
+
+class SpanContext:
+    """Identidad de un span remoto (la parte que cruza procesos)"""
+
+    def __init__(self, trace_id: str, span_id: Optional[str], request_id: Optional[str] = None):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.request_id = request_id or trace_id
+
+
+class Span:
+    """Operación medida dentro de una traza"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], request_id: str,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.request_id = request_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        """Cabecera W3C Trace Context para propagar este span"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        end_time = self.end_time or time.time()
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "request_id": self.request_id,
+            "service": TRACE_SERVICE_NAME,
+            "pid": os.getpid(),
+            "start": self.start_time,
+            "duration_ms": round((end_time - self.start_time) * 1000, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("agent_current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    """Span activo en el contexto actual"""
+    return _current_span.get()
+
+def clear_span():
+    """Quita el span activo del contexto actual (trabajo compartido por varias trazas)"""
+    _current_span.set(None)
+
+def current_request_id() -> Optional[str]:
+    """Request ID de la traza activa"""
+    span = _current_span.get()
+    return span.request_id if span else None
+
+@contextmanager
+def start_span(name: str, parent: Optional[SpanContext] = None, request_id: Optional[str] = None,
+               **attributes: Any) -> Iterator[Span]:
+    """
+    Abre un span hijo del span activo (o de `parent` si viene de otro proceso).
+    Sin padre, empieza una traza nueva con `request_id` (o un ID generado).
+    """
+    active = _current_span.get()
+    if parent is not None:
+        span = Span(name, parent.trace_id, parent.span_id, request_id or parent.request_id, attributes)
+    elif active is not None:
+        span = Span(name, active.trace_id, active.span_id, active.request_id, attributes)
+    else:
+        trace_id = secrets.token_hex(16)
+        span = Span(name, trace_id, None, request_id or trace_id, attributes)
+
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Cerrado desde otro contexto (p. ej. un generador finalizado por el GC)
+            pass
+        span.end_time = time.time()
+        _export(span)
+
+# ==================== PROPAGACIÓN ====================
+
+def inject_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """Añade las cabeceras de traza del span activo a una petición saliente"""
+    span = _current_span.get()
+    if span is None:
+        return headers
+    return {**headers, TRACEPARENT_HEADER: span.traceparent, REQUEST_ID_HEADER: span.request_id}
+
+def trace_meta() -> Optional[Dict[str, str]]:
+    """Contexto del span activo para el `_meta` de una petición MCP"""
+    span = _current_span.get()
+    if span is None:
+        return None
+    return {TRACEPARENT_HEADER: span.traceparent, "request_id": span.request_id}
+
+def extract_context(carrier: Optional[Mapping[str, Any]]) -> Optional[SpanContext]:
+    """
+    Lee el contexto de traza de cabeceras HTTP o del `_meta` MCP.
+    Un `X-Request-ID` sin `traceparent` abre una traza nueva con ese request ID.
+    """
+    if not carrier:
+        return None
+    lowered = {str(k).lower(): v for k, v in carrier.items()}
+    request_id = lowered.get(REQUEST_ID_HEADER.lower()) or lowered.get("request_id")
+    match = _TRACEPARENT.match(str(lowered.get(TRACEPARENT_HEADER, "")))
+    if match is None:
+        return None if not request_id else SpanContext(secrets.token_hex(16), None, str(request_id))
+    return SpanContext(match.group(1), match.group(2), str(request_id) if request_id else None)
+
+# ==================== EXPORTADORES ====================
+
+class SpanExporter(ABC):
+    """Destino de los spans terminados"""
+
+    @abstractmethod
+    def export(self, span: Dict[str, Any]):
+        """Recibe un span terminado (no debe bloquear el event loop)"""
+
+    async def shutdown(self):
+        pass
+
+
+class ConsoleExporter(SpanExporter):
+    """Una línea JSON por span en stderr"""
+
+    def export(self, span: Dict[str, Any]):
+        print(json.dumps(span, ensure_ascii=False, default=str), file=sys.stderr, flush=True)
+
+
+class JsonFileExporter(SpanExporter):
+    """
+    Una línea JSON por span en un archivo (en modo append, seguro entre procesos).
+    Las líneas se acumulan y se escriben en lote cada TRACE_FILE_FLUSH_INTERVAL
+    segundos en un hilo, sin bloquear el event loop. Al superar `max_bytes` el
+    archivo pasa a `<path>.1` (se conserva una sola generación anterior).
+    """
+
+    def __init__(self, path: str = TRACE_FILE, max_bytes: int = TRACE_FILE_MAX_BYTES,
+                 flush_interval: float = TRACE_FILE_FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._buffer: List[str] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def export(self, span: Dict[str, Any]):
+        self._buffer.append(json.dumps(span, ensure_ascii=False, default=str) + "\n")
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Sin event loop no hay nada que bloquear: se escribe ya
+                self._write(self._take())
+                return
+            self._flush_task = loop.create_task(self._flush_later())
+
+    def _take(self) -> str:
+        lines, self._buffer = self._buffer, []
+        return "".join(lines)
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        data = self._take()
+        if data:
+            await asyncio.to_thread(self._write, data)
+
+    def _write(self, data: str):
+        try:
+            if self.max_bytes > 0:
+                try:
+                    if os.path.getsize(self.path) + len(data) > self.max_bytes:
+                        os.replace(self.path, self.path + ".1")
+                except FileNotFoundError:
+                    pass
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+        except OSError as e:
+            print(f"⚠️  No se pudo escribir la traza en {self.path}: {e}", file=sys.stderr)
+
+    async def shutdown(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+
+
+class OTLPHttpExporter(SpanExporter):
+    """
+    Envía los spans por OTLP/HTTP con codificación JSON (`/v1/traces`), en lotes
+    cada TRACE_OTLP_FLUSH_INTERVAL segundos. No requiere el SDK de OpenTelemetry.
+    """
+
+    def __init__(self, endpoint: str = TRACE_OTLP_ENDPOINT, flush_interval: float = TRACE_OTLP_FLUSH_INTERVAL):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.flush_interval = flush_interval
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def export(self, span: Dict[str, Any]):
+        self._buffer.append(span)
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        spans, self._buffer = self._buffer, []
+        if not spans:
+            return
+        try:
+            async with httpx.AsyncClient(timeout=5.0) as client:
+                response = await client.post(self.url, json=self._encode(spans))
+                response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"⚠️  No se pudieron enviar {len(spans)} spans a {self.url}: {e}", file=sys.stderr)
+
+    async def shutdown(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _encode(self, spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+        otlp_spans = []
+        for span in spans:
+            start_ns = int(span["start"] * 1e9)
+            attributes = {**span["attributes"], "request.id": span["request_id"], "process.pid": span["pid"]}
+            otlp_span = {
+                "traceId": span["trace_id"],
+                "spanId": span["span_id"],
+                "name": span["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(start_ns + int(span["duration_ms"] * 1e6)),
+                "attributes": [self._attribute(k, v) for k, v in attributes.items() if v is not None],
+                # 1 = OK, 2 = ERROR
+                "status": {"code": 2, "message": span["error"]} if span["status"] == "error" else {"code": 1},
+            }
+            if span["parent_id"]:
+                otlp_span["parentSpanId"] = span["parent_id"]
+            otlp_spans.append(otlp_span)
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [self._attribute("service.name", TRACE_SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "agentecongemini.tracing"}, "spans": otlp_spans}],
+            }]
+        }
+
+
+def create_exporter(kind: str = TRACE_EXPORTER) -> Optional[SpanExporter]:
+    """Crea el exportador indicado por TRACE_EXPORTER (None = trazas desactivadas)"""
+    if kind == "file":
+        return JsonFileExporter()
+    if kind == "console":
+        return ConsoleExporter()
+    if kind == "otlp":
+        return OTLPHttpExporter()
+    if kind not in ("none", ""):
+        print(f"⚠️  TRACE_EXPORTER desconocido: {kind}; trazas desactivadas", file=sys.stderr)
+    return None
+
+_exporter: Optional[SpanExporter] = create_exporter()
+
+def set_exporter(exporter: Optional[SpanExporter]):
+    """Reemplaza el exportador de spans (None desactiva la exportación)"""
+    global _exporter
+    _exporter = exporter
+
+async def shutdown_tracing():
+    """Envía los spans pendientes (exportadores con buffer)"""
+    if _exporter is not None:
+        await _exporter.shutdown()
+
+def _export(span: Span):
+    if _exporter is None:
+        return
+    try:
+        _exporter.export(span.to_dict())
+    except Exception as e:
+        print(f"⚠️  Error exportando span {span.name}: {e}", file=sys.stderr)
@@ -0,0 +1,5 @@
+"""
+Benchmarks offline del agente.
+Ejecutan `agentecongemini.api:app` contra un API Gateway falso y un Gemini
+determinista, sin red externa ni API key. Ver `python -m benchmarks.run --help`.
+"""
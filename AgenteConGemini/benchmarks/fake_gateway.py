@@ -0,0 +1,183 @@
+"""
+API Gateway falso para benchmarks.
+Implementa los endpoints que usan las herramientas de `server.py` (auth,
+proyectos, tareas y notas) sobre datos en memoria, con los mismos esquemas que
+los modelos Project, Task y Note, y una latencia artificial configurable.
+"""
+import asyncio
+import base64
+import itertools
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, HTTPException, Request
+
+STATUSES = ["pending", "onHold", "inProgress", "underReview", "completed"]
+
+def object_id(prefix: int, n: int) -> str:
+    """ID de 24 caracteres hexadecimales, estable entre ejecuciones"""
+    return f"{prefix:08x}{n:016x}"
+
+def fake_token(lifetime: int = 3600) -> str:
+    """JWT sin firma válida pero con claim `exp`, suficiente para el agente"""
+    def encode(data: Dict[str, Any]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+    return f"{encode({'alg': 'none'})}.{encode({'sub': 'admin', 'exp': int(time.time()) + lifetime})}.bench"
+
+
+class FakeStore:
+    """Proyectos, tareas y notas en memoria"""
+
+    def __init__(self, projects: int = 20, tasks_per_project: int = 50, notes_per_task: int = 3):
+        self.now = datetime.now(timezone.utc).isoformat()
+        self.projects: Dict[str, Dict[str, Any]] = {}
+        self.tasks: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.notes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._ids = itertools.count(1_000_000)
+
+        for p in range(projects):
+            project_id = object_id(1, p)
+            self.projects[project_id] = self.project(project_id, f"Proyecto {p}", f"Descripción del proyecto {p}")
+            self.tasks[project_id] = {}
+            for t in range(tasks_per_project):
+                task_id = object_id(2, p * tasks_per_project + t)
+                self.tasks[project_id][task_id] = self.task(
+                    task_id, project_id, f"Tarea {t} del proyecto {p}", "Descripción de la tarea " * 4, STATUSES[t % len(STATUSES)]
+                )
+                self.notes[task_id] = {}
+                for n in range(notes_per_task):
+                    note_id = object_id(3, (p * tasks_per_project + t) * notes_per_task + n)
+                    self.notes[task_id][note_id] = self.note(note_id, task_id, f"Nota {n} de la tarea {t}")
+
+    def new_id(self) -> str:
+        return object_id(9, next(self._ids))
+
+    def project(self, project_id: str, name: str, description: str, client_name: str = "") -> Dict[str, Any]:
+        return {
+            "_id": project_id, "name": name, "description": description, "userId": object_id(0, 1),
+            "clientName": client_name, "isActive": True, "createdAt": self.now, "updatedAt": self.now,
+        }
+
+    def task(self, task_id: str, project_id: str, name: str, description: str, status: str = "pending") -> Dict[str, Any]:
+        return {
+            "_id": task_id, "name": name, "description": description, "projectId": project_id,
+            "status": status, "completedBy": [], "createdAt": self.now, "updatedAt": self.now,
+        }
+
+    def note(self, note_id: str, task_id: str, content: str) -> Dict[str, Any]:
+        return {
+            "_id": note_id, "content": content, "createdBy": object_id(0, 1), "taskId": task_id,
+            "createdAt": self.now, "updatedAt": self.now,
+        }
+
+    def get_project(self, project_id: str) -> Dict[str, Any]:
+        if project_id not in self.projects:
+            raise HTTPException(status_code=404, detail="Proyecto no encontrado")
+        return self.projects[project_id]
+
+    def get_task(self, project_id: str, task_id: str) -> Dict[str, Any]:
+        task = self.tasks.get(project_id, {}).get(task_id)
+        if task is None:
+            raise HTTPException(status_code=404, detail="Tarea no encontrada")
+        return task
+
+
+def create_app(
+    projects: int = 20,
+    tasks_per_project: int = 50,
+    notes_per_task: int = 3,
+    latency: float = 0.0
+) -> FastAPI:
+    """
+    Crea el gateway falso.
+
+    Los DELETE no borran los datos sembrados, para que un escenario de borrado
+    se pueda repetir tantas veces como peticiones tenga el benchmark.
+    """
+    app = FastAPI(title="Fake API Gateway")
+    store = FakeStore(projects, tasks_per_project, notes_per_task)
+    app.state.store = store
+
+    @app.middleware("http")
+    async def simulate_latency(request: Request, call_next):
+        if latency > 0:
+            await asyncio.sleep(latency)
+        return await call_next(request)
+
+    @app.post("/api/auth/login")
+    async def login() -> Dict[str, str]:
+        return {"token": fake_token()}
+
+    # Proyectos
+    @app.get("/api/projects")
+    async def list_projects() -> List[Dict[str, Any]]:
+        return list(store.projects.values())
+
+    @app.post("/api/projects", status_code=201)
+    async def create_project(body: Dict[str, Any]) -> Dict[str, Any]:
+        return store.project(store.new_id(), body["name"], body["description"], body.get("clientName", ""))
+
+    @app.get("/api/projects/{project_id}")
+    async def get_project(project_id: str) -> Dict[str, Any]:
+        return store.get_project(project_id)
+
+    @app.put("/api/projects/{project_id}")
+    async def update_project(project_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        return {**store.get_project(project_id), **body}
+
+    @app.delete("/api/projects/{project_id}")
+    async def delete_project(project_id: str) -> Dict[str, str]:
+        store.get_project(project_id)
+        return {"message": "Proyecto eliminado"}
+
+    # Tareas
+    @app.get("/api/projects/{project_id}/tasks")
+    async def list_tasks(project_id: str) -> List[Dict[str, Any]]:
+        store.get_project(project_id)
+        return list(store.tasks[project_id].values())
+
+    @app.post("/api/projects/{project_id}/tasks", status_code=201)
+    async def create_task(project_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        store.get_project(project_id)
+        return store.task(store.new_id(), project_id, body["name"], body.get("description", ""))
+
+    @app.get("/api/projects/{project_id}/tasks/{task_id}")
+    async def get_task(project_id: str, task_id: str) -> Dict[str, Any]:
+        return store.get_task(project_id, task_id)
+
+    @app.put("/api/projects/{project_id}/tasks/{task_id}")
+    async def update_task(project_id: str, task_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        return {**store.get_task(project_id, task_id), **body}
+
+    @app.post("/api/projects/{project_id}/tasks/{task_id}/status")
+    async def update_task_status(project_id: str, task_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        if body.get("status") not in STATUSES:
+            raise HTTPException(status_code=400, detail="Estado inválido")
+        return {**store.get_task(project_id, task_id), "status": body["status"]}
+
+    @app.delete("/api/projects/{project_id}/tasks/{task_id}")
+    async def delete_task(project_id: str, task_id: str) -> Dict[str, str]:
+        store.get_task(project_id, task_id)
+        return {"message": "Tarea eliminada"}
+
+    # Notas
+    @app.get("/api/projects/{project_id}/tasks/{task_id}/notes")
+    async def list_notes(project_id: str, task_id: str) -> List[Dict[str, Any]]:
+        store.get_task(project_id, task_id)
+        return list(store.notes[task_id].values())
+
+    @app.post("/api/projects/{project_id}/tasks/{task_id}/notes", status_code=201)
+    async def create_note(project_id: str, task_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        store.get_task(project_id, task_id)
+        return store.note(store.new_id(), task_id, body["content"])
+
+    @app.delete("/api/projects/{project_id}/tasks/{task_id}/notes/{note_id}")
+    async def delete_note(project_id: str, task_id: str, note_id: str) -> Dict[str, str]:
+        store.get_task(project_id, task_id)
+        if note_id not in store.notes[task_id]:
+            raise HTTPException(status_code=404, detail="Nota no encontrada")
+        return {"message": "Nota eliminada"}
+
+    return app
@@ -0,0 +1,53 @@
+"""
+Sustituto determinista de `analyze_query` (Gemini) para benchmarks.
+
+El mensaje del benchmark indica la herramienta y sus argumentos:
+    "bench <ClaseHerramienta> <argumentos JSON>"
+Cualquier otro mensaje se responde como texto, sin herramienta, igual que
+cuando la herramienta pedida no está entre las del grupo enviado.
+"""
+import asyncio
+import json
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from agentecongemini.router import tool_group_classes
+
+BENCH_PREFIX = "bench "
+
+def bench_message(tool_class: str, args: Dict[str, Any]) -> str:
+    """Mensaje de chat que el LLM falso resuelve con `tool_class(**args)`"""
+    return f"{BENCH_PREFIX}{tool_class} {json.dumps(args, ensure_ascii=False)}"
+
+
+class FakeLLMResponse:
+    """Lo que usa el agente de la respuesta de mirascope: `tool` y `content`"""
+
+    def __init__(self, tool: Optional[BaseModel] = None, content: str = ""):
+        self.tool = tool
+        self.content = content
+
+
+def make_fake_analyze_query(tool_classes: Dict[str, Type[BaseModel]], latency: float = 0.0):
+    """
+    Crea un `analyze_query` falso con latencia fija.
+
+    Args:
+        tool_classes: Clases de herramientas por nombre (client.TOOL_CLASSES)
+        latency: Segundos que tarda cada "llamada a Gemini"
+    """
+    async def analyze_query(query: str, context: str = "", group: Optional[str] = None) -> FakeLLMResponse:
+        if latency > 0:
+            await asyncio.sleep(latency)
+        if not query.startswith(BENCH_PREFIX):
+            return FakeLLMResponse(content=f"Respuesta simulada para: {query}")
+
+        tool_class, _, raw_args = query[len(BENCH_PREFIX):].partition(" ")
+        allowed = tool_group_classes(group)
+        if allowed is not None and tool_class not in allowed:
+            return FakeLLMResponse(content=f"Ninguna herramienta del grupo {group} sirve para: {query}")
+        args = json.loads(raw_args) if raw_args else {}
+        return FakeLLMResponse(tool=tool_classes[tool_class].model_validate(args))
+
+    return analyze_query
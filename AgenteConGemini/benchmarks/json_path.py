@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark del camino JSON.
+
+Compara, sobre listados sintéticos de proyectos y tareas del tamaño indicado:
+- Parseo de la respuesta del gateway: `json.loads` + `Task(**t)` por elemento
+  (camino anterior) frente a `TypeAdapter(List[Task]).validate_json` sobre los
+  bytes (server.py).
+- Serialización de la respuesta de `/api/chat`: `json.dumps` (JSONResponse de
+  FastAPI) frente a `FastJSONResponse`.
+
+Uso:
+    python -m benchmarks.json_path
+    python -m benchmarks.json_path --sizes 100,1000,20000 --repeat 20
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Any, Callable, List, Optional
+
+from .fake_gateway import FakeStore
+
+# ==================== MEDICIÓN ====================
+
+def best_of(fn: Callable[[], Any], repeat: int) -> float:
+    """Mejor tiempo (s) de `repeat` ejecuciones, para aislar el ruido del sistema"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def report(label: str, size: int, payload_bytes: int, baseline: float, fast: float):
+    print(f"  {label:<22} n={size:<7} {payload_bytes / 1024:>9.1f} KiB  "
+          f"antes {baseline * 1000:>9.2f} ms  ahora {fast * 1000:>9.2f} ms  ×{baseline / fast:>5.1f}")
+
+def bench_size(size: int, repeat: int):
+    from agentecongemini.api import ChatResponse, FastJSONResponse
+    from agentecongemini.server import PROJECT_LIST, TASK_LIST, Project, Task
+
+    store = FakeStore(projects=size, tasks_per_project=0, notes_per_task=0)
+    projects = list(store.projects.values())
+    project_id = next(iter(store.projects))
+    tasks = [
+        store.task(f"{n:024x}", project_id, f"Tarea {n}", "Descripción de la tarea " * 4)
+        for n in range(size)
+    ]
+
+    for label, items, model, adapter in (
+        ("parse projects", projects, Project, PROJECT_LIST),
+        ("parse tasks", tasks, Task, TASK_LIST),
+    ):
+        body = json.dumps(items).encode()
+        baseline = best_of(lambda: [model(**item) for item in json.loads(body)], repeat)
+        fast = best_of(lambda: adapter.validate_json(body), repeat)
+        report(label, size, len(body), baseline, fast)
+
+    # /api/chat devuelve el JSON de la herramienta como texto dentro de ChatResponse
+    text = "\n".join(json.dumps(task, ensure_ascii=False) for task in tasks)
+    content = ChatResponse(response=text, success=True).model_dump()
+    encoded = FastJSONResponse(content).body
+    baseline = best_of(
+        lambda: json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode(),
+        repeat
+    )
+    fast = best_of(lambda: FastJSONResponse(content), repeat)
+    report("serialize chat", size, len(encoded), baseline, fast)
+
+# ==================== CLI ====================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Microbenchmark del camino JSON (parseo y serialización)")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Número de elementos por listado, separados por comas")
+    parser.add_argument("--repeat", type=int, default=10, help="Repeticiones por caso (se toma la mejor)")
+    args = parser.parse_args(argv)
+    args.sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    print(f"🚀 Camino JSON: tamaños {args.sizes}, mejor de {args.repeat}")
+    for size in args.sizes:
+        bench_size(size, args.repeat)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
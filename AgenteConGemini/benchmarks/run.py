@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline de la API del agente.
+
+Levanta un API Gateway falso (uvicorn en un hilo, datos en memoria), sustituye
+Gemini por un `analyze_query` determinista y lanza peticiones a `/api/chat`
+dentro del mismo proceso, por herramienta y por nivel de concurrencia.
+Mide throughput, latencias p50/p95/p99 y memoria, guarda un informe JSON y,
+opcionalmente, lo compara con un informe anterior para detectar regresiones.
+
+Uso:
+    python -m benchmarks.run
+    python -m benchmarks.run --concurrency 1,16,64 --requests 500 --output base.json
+    python -m benchmarks.run --compare base.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .fake_gateway import create_app, object_id
+from .fake_llm import bench_message, make_fake_analyze_query
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# ==================== ESCENARIOS ====================
+
+P0 = object_id(1, 0)
+P1 = object_id(1, 1)
+T0 = object_id(2, 0)
+T1 = object_id(2, 1)
+N0 = object_id(3, 0)
+
+# Escenario → (clase de herramienta, argumentos) sobre los datos sembrados
+SCENARIOS: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {
+    "get_all_projects": ("GetAllProjectsTool", {}),
+    "get_project_by_id": ("GetProjectByIdTool", {"project_id": P0}),
+    "create_project": ("CreateProjectTool", {"name": "Bench", "description": "Proyecto de benchmark"}),
+    "update_project": ("UpdateProjectTool", {"project_id": P0, "name": "Bench"}),
+    "delete_project": ("DeleteProjectTool", {"project_id": P1}),
+    "get_tasks_by_project": ("GetTasksByProjectTool", {"project_id": P0}),
+    "get_task_by_id": ("GetTaskByIdTool", {"project_id": P0, "task_id": T0}),
+    "create_task": ("CreateTaskTool", {"project_id": P0, "name": "Bench"}),
+    "update_task": ("UpdateTaskTool", {"project_id": P0, "task_id": T0, "name": "Bench"}),
+    "update_task_status": ("UpdateTaskStatusTool", {"project_id": P0, "task_id": T0, "status": "completed"}),
+    "delete_task": ("DeleteTaskTool", {"project_id": P0, "task_id": T1}),
+    "get_notes_by_task": ("GetNotesByTaskTool", {"project_id": P0, "task_id": T0}),
+    "create_note": ("CreateNoteTool", {"project_id": P0, "task_id": T0, "content": "Nota de benchmark"}),
+    "delete_note": ("DeleteNoteTool", {"project_id": P0, "task_id": T0, "note_id": N0}),
+    "create_tasks": ("CreateTasksTool", {"project_id": P0, "tasks": [{"name": f"Bench {i}"} for i in range(5)]}),
+    "update_task_statuses": ("UpdateTaskStatusesTool", {"project_id": P0, "task_ids": [T0, T1], "status": "inProgress"}),
+    "get_tasks_for_projects": ("GetTasksForProjectsTool", {"project_ids": [P0, P1]}),
+    "get_notes_for_tasks": ("GetNotesForTasksTool", {"project_id": P0, "task_ids": [T0, T1]}),
+    # Respuesta directa de Gemini, sin herramienta
+    "direct_answer": (None, {}),
+}
+
+def scenario_message(name: str) -> str:
+    tool_class, args = SCENARIOS[name]
+    return bench_message(tool_class, args) if tool_class else f"hola ({name})"
+
+# ==================== ENTORNO ====================
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_fake_gateway(args: argparse.Namespace) -> str:
+    """Arranca el gateway falso en un hilo y retorna su URL"""
+    import uvicorn
+
+    app = create_app(args.projects, args.tasks, args.notes, args.gateway_latency)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, name="fake-gateway", daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("El gateway falso no arrancó")
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+def configure_environment(args: argparse.Namespace, gateway_url: str):
+    """
+    Configura el agente antes de importarlo. Por defecto se desactivan las
+    cachés, el router y las trazas para medir el camino completo; las variables
+    ya definidas en el entorno tienen prioridad.
+    """
+    os.environ["API_GATEWAY_URL"] = gateway_url
+    os.environ["AGENT_TOOL_TRANSPORT"] = args.transport
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    os.environ.setdefault("AGENT_TOKEN_CACHE_PATH", "")
+    os.environ.setdefault("TRACE_EXPORTER", "none")
+    os.environ.setdefault("GEMINI_PRELOAD", "false")
+    os.environ.setdefault("ADMISSION_MAX_CONCURRENCY", str(max(args.concurrency) * 2))
+    os.environ.setdefault("ADMISSION_MAX_QUEUE", str(max(args.concurrency) * 4))
+    if not args.with_caches:
+        os.environ.setdefault("READ_CACHE_TTL", "0")
+        os.environ.setdefault("QUERY_CACHE_TTL", "0")
+        os.environ.setdefault("FAST_ROUTER_ENABLED", "false")
+
+def rss_mb() -> float:
+    """Memoria residente actual del proceso en MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# ==================== MEDICIÓN ====================
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+async def run_scenario(
+    client: Any,
+    message: str,
+    concurrency: int,
+    requests: int,
+    trace_memory: bool
+) -> Dict[str, Any]:
+    """Lanza `requests` peticiones con `concurrency` en paralelo y resume los tiempos"""
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.post("/api/chat", json={"message": message})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                key = f"http_{response.status_code}"
+                errors[key] = errors.get(key, 0) + 1
+            elif not response.json().get("success"):
+                errors["agent_error"] = errors.get("agent_error", 0) + 1
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    py_peak = None
+    if trace_memory:
+        py_peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "wall_s": round(wall, 4),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "rss_mb": round(rss_mb(), 1),
+        "py_peak_mb": round(py_peak, 2) if py_peak is not None else None,
+    }
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+    from agentecongemini import api, client as agent_client
+
+    # Una línea de log por petición HTTP distorsiona las medidas
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    # Gemini determinista
+    agent_client.analyze_query = make_fake_analyze_query(agent_client.TOOL_CLASSES, args.llm_latency)
+
+    results = []
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.app.router.lifespan_context(api.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name in args.scenarios:
+                message = scenario_message(name)
+                # Calentamiento: login, pool de conexiones y sesiones MCP
+                for _ in range(args.warmup):
+                    await client.post("/api/chat", json={"message": message})
+
+                for concurrency in args.concurrency:
+                    summary = await run_scenario(client, message, concurrency, args.requests, args.tracemalloc)
+                    result = {"scenario": name, "tool": SCENARIOS[name][0], "concurrency": concurrency, **summary}
+                    results.append(result)
+                    print(
+                        f"  {name:<24} c={concurrency:<4} {result['throughput_rps']:>9.1f} req/s  "
+                        f"p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  "
+                        f"p99 {result['p99_ms']:>8.2f} ms  rss {result['rss_mb']:>7.1f} MB"
+                        + (f"  ⚠️ {result['errors']} errores" if result["errors"] else "")
+                    )
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "transport": args.transport,
+            "with_caches": args.with_caches,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency": args.llm_latency,
+            "gateway_latency": args.gateway_latency,
+            "dataset": {"projects": args.projects, "tasks_per_project": args.tasks, "notes_per_task": args.notes},
+        },
+        "results": results,
+    }
+
+# ==================== COMPARACIÓN ====================
+
+# Métrica → (nombre, True si más alto es mejor)
+COMPARED_METRICS = [
+    ("throughput_rps", True),
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("p99_ms", False),
+]
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Imprime la variación de cada métrica respecto al informe base.
+
+    Returns:
+        Descripciones de las regresiones que superan `threshold` (fracción, 0.1 = 10%)
+    """
+    base = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n📊 Comparación con {baseline['meta'].get('git') or 'informe base'} (umbral {threshold:.0%})")
+    for result in current["results"]:
+        previous = base.get((result["scenario"], result["concurrency"]))
+        if previous is None:
+            continue
+        cells = []
+        for metric, higher_is_better in COMPARED_METRICS:
+            old, new = previous[metric], result[metric]
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold:
+                flag = " ❌"
+                regressions.append(f"{result['scenario']} c={result['concurrency']} {metric}: {old} → {new} ({change:+.1%})")
+            elif worse < -threshold:
+                flag = " ✅"
+            cells.append(f"{metric} {change:+7.1%}{flag}")
+        print(f"  {result['scenario']:<24} c={result['concurrency']:<4} " + "  ".join(cells))
+    return regressions
+
+# ==================== CLI ====================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark offline de la API del agente")
+    parser.add_argument("--scenarios", default="all", help=f"Escenarios separados por comas o 'all' ({', '.join(SCENARIOS)})")
+    parser.add_argument("--concurrency", default="1,8,32", help="Niveles de concurrencia separados por comas")
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por escenario y nivel de concurrencia")
+    parser.add_argument("--warmup", type=int, default=5, help="Peticiones de calentamiento por escenario")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Latencia simulada de Gemini (s)")
+    parser.add_argument("--gateway-latency", type=float, default=0.002, help="Latencia simulada del gateway (s)")
+    parser.add_argument("--projects", type=int, default=20, help="Proyectos sembrados en el gateway falso")
+    parser.add_argument("--tasks", type=int, default=50, help="Tareas por proyecto")
+    parser.add_argument("--notes", type=int, default=3, help="Notas por tarea")
+    parser.add_argument("--transport", choices=["inprocess", "stdio"], default="inprocess", help="Transporte de herramientas")
+    parser.add_argument("--with-caches", action="store_true", help="Mantener cachés y router activos")
+    parser.add_argument("--tracemalloc", action="store_true", help="Medir el pico de memoria Python por escenario (más lento)")
+    parser.add_argument("--output", default=str(RESULTS_DIR / "latest.json"), help="Archivo del informe JSON")
+    parser.add_argument("--compare", help="Informe JSON anterior con el que comparar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Variación que cuenta como regresión (0.10 = 10%%)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Salir con código 1 si hay regresiones")
+    args = parser.parse_args(argv)
+
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    args.scenarios = list(SCENARIOS) if args.scenarios == "all" else [s.strip() for s in args.scenarios.split(",")]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"Escenarios desconocidos: {', '.join(unknown)}")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    gateway_url = start_fake_gateway(args)
+    configure_environment(args, gateway_url)
+
+    print(f"🚀 Benchmark: {len(args.scenarios)} escenarios × concurrencia {args.concurrency}, "
+          f"{args.requests} peticiones, transporte {args.transport}")
+    report = asyncio.run(run_benchmark(args))
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"\n💾 Informe guardado en {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare_reports(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regresiones:")
+            for regression in regressions:
+                print(f"   {regression}")
+            if args.fail_on_regression:
+                return 1
+        else:
+            print("\n✅ Sin regresiones")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
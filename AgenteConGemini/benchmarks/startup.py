@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Informe de tiempo de arranque del agente.
+
+Importa `agentecongemini.api` (arranque del contenedor) y
+`agentecongemini.server` (cada subproceso MCP) en intérpretes nuevos con
+`python -X importtime`, y reporta la mediana del tiempo de importación, los
+módulos más costosos y si se cargó algún proveedor pesado que debería ser
+diferido (mirascope, google-genai). Sale con código 1 si se supera el objetivo.
+
+Uso:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --top 25 --output startup.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Módulo → objetivo de arranque (s) en una máquina de desarrollo
+TARGETS: Dict[str, float] = {
+    "agentecongemini.api": 1.5,
+    "agentecongemini.server": 1.2,
+}
+
+# Paquetes que solo deben cargarse en el primer uso
+DEFERRED_PACKAGES = ("mirascope", "google.genai")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+# ==================== MEDICIÓN ====================
+
+def parse_importtime(stderr: str) -> Dict[str, Dict[str, int]]:
+    """Tiempos propio y acumulado (µs) por módulo de la salida de `-X importtime`"""
+    modules: Dict[str, Dict[str, int]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = {"self_us": int(self_us), "cumulative_us": int(cumulative_us)}
+    return modules
+
+def probe(module: str) -> Dict[str, Any]:
+    """Importa `module` en un intérprete nuevo y devuelve tiempos y módulos cargados"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["importtime"] = parse_importtime(completed.stderr)
+    return result
+
+def measure(module: str, runs: int, top: int) -> Dict[str, Any]:
+    """Mediana de `runs` arranques en frío y los `top` módulos con más tiempo propio"""
+    probes = [probe(module) for _ in range(runs)]
+    seconds = [p["seconds"] for p in probes]
+    # Tomar el desglose de la ejecución mediana
+    median_probe = sorted(probes, key=lambda p: p["seconds"])[len(probes) // 2]
+    slowest = sorted(
+        median_probe["importtime"].items(),
+        key=lambda item: item[1]["self_us"],
+        reverse=True
+    )[:top]
+    loaded = set(median_probe["modules"])
+    return {
+        "module": module,
+        "runs": runs,
+        "median_s": round(statistics.median(seconds), 3),
+        "min_s": round(min(seconds), 3),
+        "max_s": round(max(seconds), 3),
+        "modules_loaded": len(loaded),
+        "deferred_loaded": [pkg for pkg in DEFERRED_PACKAGES if pkg in loaded],
+        "slowest": [
+            {"module": name, "self_ms": round(t["self_us"] / 1000, 1), "cumulative_ms": round(t["cumulative_us"] / 1000, 1)}
+            for name, t in slowest
+        ],
+    }
+
+# ==================== CLI ====================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Informe de tiempo de arranque del agente")
+    parser.add_argument("--modules", default=",".join(TARGETS), help="Módulos a medir separados por comas")
+    parser.add_argument("--runs", type=int, default=5, help="Arranques en frío por módulo")
+    parser.add_argument("--top", type=int, default=15, help="Módulos más lentos a mostrar")
+    parser.add_argument("--output", default=str(RESULTS_DIR / "startup.json"), help="Archivo del informe JSON")
+    args = parser.parse_args(argv)
+    args.modules = [m.strip() for m in args.modules.split(",") if m.strip()]
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    failures = []
+    results = []
+    for module in args.modules:
+        result = measure(module, args.runs, args.top)
+        results.append(result)
+        target = TARGETS.get(module)
+        status = "✅" if target is None or result["median_s"] <= target else "❌"
+        print(f"\n{status} {module}: {result['median_s']}s mediana "
+              f"(min {result['min_s']}s, max {result['max_s']}s, objetivo {target or '-'}s, "
+              f"{result['modules_loaded']} módulos)")
+        for entry in result["slowest"]:
+            print(f"   {entry['self_ms']:>8.1f} ms propio  {entry['cumulative_ms']:>8.1f} ms acumulado  {entry['module']}")
+        if target is not None and result["median_s"] > target:
+            failures.append(f"{module}: {result['median_s']}s > {target}s")
+        if result["deferred_loaded"]:
+            print(f"   ⚠️  Cargados al importar (deberían ser diferidos): {', '.join(result['deferred_loaded'])}")
+            failures.append(f"{module}: carga {', '.join(result['deferred_loaded'])}")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"targets": TARGETS, "results": results}, indent=2, ensure_ascii=False))
+    print(f"\n💾 Informe guardado en {output}")
+
+    if failures:
+        print(f"\n❌ {len(failures)} objetivos de arranque incumplidos:")
+        for failure in failures:
+            print(f"   {failure}")
+        return 1
+    print("\n✅ Objetivos de arranque cumplidos")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline del subconjunto de herramientas por consulta.
+
+Clasifica un corpus de consultas de ejemplo con `router.classify_tool_group`
+y reporta, por consulta y en total:
+- Los esquemas que se enviarían a Gemini (tokens aproximados) frente al
+  conjunto completo, con el tamaño real de las declaraciones de Gemini si
+  mirascope está instalado.
+- Si la herramienta esperada está en el subconjunto; si no, la consulta
+  pagaría una segunda llamada con todas las herramientas (fallback).
+- El coste del clasificador local.
+
+Opcionalmente (`--llm-latency`) simula la latencia de Gemini proporcional a
+los tokens de entrada, para estimar la latencia ahorrada.
+
+Uso:
+    python -m benchmarks.tool_groups
+    python -m benchmarks.tool_groups --llm-latency 0.4 --ms-per-1k-tokens 60
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Consulta → herramienta que debería elegir Gemini (None = respuesta directa)
+CORPUS: List[Tuple[str, Optional[str]]] = [
+    ("lista los proyectos", "GetAllProjectsTool"),
+    ("muéstrame los detalles del proyecto Web", "GetProjectByIdTool"),
+    ("crea un proyecto llamado App móvil para el cliente ACME", "CreateProjectTool"),
+    ("renombra el proyecto Web a Portal", "UpdateProjectTool"),
+    ("elimina el proyecto Pruebas", "DeleteProjectTool"),
+    ("qué tareas tiene el proyecto Web", "GetTasksByProjectTool"),
+    ("dame las 10 primeras tareas pendientes del proyecto Web", "GetTasksByProjectTool"),
+    ("muestra la tarea diseño del login del proyecto Web", "GetTaskByIdTool"),
+    ("crea una tarea revisar contrato en el proyecto Web", "CreateTaskTool"),
+    ("cambia la descripción de la tarea login del proyecto Web", "UpdateTaskTool"),
+    ("marca como completada la tarea login del proyecto Web", "UpdateTaskStatusTool"),
+    ("borra la tarea login del proyecto Web", "DeleteTaskTool"),
+    ("crea las tareas diseño, desarrollo y pruebas en el proyecto Web", "CreateTasksTool"),
+    ("pon en progreso las tareas login y registro del proyecto Web", "UpdateTaskStatusesTool"),
+    ("tareas de los proyectos Web y App", "GetTasksForProjectsTool"),
+    ("notas de la tarea login del proyecto Web", "GetNotesByTaskTool"),
+    ("añade una nota a la tarea login del proyecto Web: falta el logo", "CreateNoteTool"),
+    ("elimina la nota n1 de la tarea login del proyecto Web", "DeleteNoteTool"),
+    ("comentarios de las tareas login y registro del proyecto Web", "GetNotesForTasksTool"),
+    ("hola, ¿qué puedes hacer?", None),
+    ("y ahora márcala como completada", "UpdateTaskStatusTool"),
+]
+
+# ==================== MEDICIÓN ====================
+
+def gemini_schema_tokens(names: List[str]) -> Optional[int]:
+    """Tokens aproximados de las declaraciones reales de Gemini (None sin mirascope)"""
+    try:
+        from mirascope.core.google import GoogleTool
+    except ImportError:
+        return None
+    from agentecongemini.client import get_llm_tools
+    from agentecongemini.compaction import CHARS_PER_TOKEN
+
+    tools = get_llm_tools()
+    chars = 0
+    for name in names:
+        schema = GoogleTool.type_from_base_type(tools[name]).tool_schema()
+        chars += len(schema.model_dump_json(exclude_none=True))
+    return chars // CHARS_PER_TOKEN
+
+def classifier_cost_us(queries: List[str], repeat: int = 200) -> float:
+    """Coste medio (µs) de clasificar una consulta"""
+    from agentecongemini.router import classify_tool_group
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            classify_tool_group(query)
+    return (time.perf_counter() - started) * 1e6 / (repeat * len(queries))
+
+def run(args: argparse.Namespace) -> Dict[str, float]:
+    from agentecongemini.client import group_tool_names, tool_schema_tokens
+    from agentecongemini.router import classify_tool_group
+
+    full_tokens = tool_schema_tokens()
+    gemini_cache: Dict[Optional[str], Optional[int]] = {}
+
+    def gemini_tokens(group: Optional[str]) -> Optional[int]:
+        if group not in gemini_cache:
+            gemini_cache[group] = gemini_schema_tokens(group_tool_names(group))
+        return gemini_cache[group]
+
+    def latency(tokens: int) -> float:
+        return args.llm_latency + tokens / 1000 * args.ms_per_1k_tokens / 1000
+
+    sent_total = 0
+    gemini_sent_total = 0
+    fallbacks = 0
+    latency_before = 0.0
+    latency_after = 0.0
+    print(f"{'grupo':<16} {'tools':>5} {'tokens':>7} {'gemini':>7}  consulta")
+    for query, expected in CORPUS:
+        group = classify_tool_group(query)
+        names = group_tool_names(group)
+        tokens = tool_schema_tokens(group)
+        real = gemini_tokens(group)
+        # Sin la herramienta esperada (o sin herramienta) se repite con todas
+        fallback = group is not None and (expected is None or expected not in names)
+        if fallback:
+            fallbacks += 1
+            tokens += full_tokens
+            real = real + gemini_tokens(None) if real is not None else None
+        sent_total += tokens
+        gemini_sent_total += real or 0
+        latency_before += latency(full_tokens)
+        latency_after += latency(tool_schema_tokens(group)) + (latency(full_tokens) if fallback else 0)
+        marker = "  ↩ fallback" if fallback else ""
+        print(f"{group or 'all':<16} {len(names):>5} {tokens:>7} {real if real is not None else '-':>7}  {query}{marker}")
+
+    queries = len(CORPUS)
+    baseline = full_tokens * queries
+    summary = {
+        "queries": queries,
+        "schema_tokens_full": full_tokens,
+        "schema_tokens_sent": sent_total,
+        "schema_tokens_saved_pct": round(100 * (1 - sent_total / baseline), 1),
+        "fallbacks": fallbacks,
+        "classifier_us": round(classifier_cost_us([q for q, _ in CORPUS]), 1),
+    }
+    full_real = gemini_tokens(None)
+    if full_real is not None:
+        summary["gemini_schema_tokens_full"] = full_real
+        summary["gemini_schema_tokens_saved_pct"] = round(100 * (1 - gemini_sent_total / (full_real * queries)), 1)
+    if args.llm_latency or args.ms_per_1k_tokens:
+        summary["simulated_llm_seconds_before"] = round(latency_before, 3)
+        summary["simulated_llm_seconds_after"] = round(latency_after, 3)
+    return summary
+
+# ==================== CLI ====================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Tokens y latencia ahorrados por el subconjunto de herramientas")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Latencia fija simulada de Gemini (s)")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=0.0, help="Latencia simulada por cada 1000 tokens de entrada (ms)")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    summary = run(args)
+    print("\n" + json.dumps(summary, indent=2, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())